@@ -0,0 +1,145 @@
+"""
+Nacitanie modelu ulozeneho pipeline. Model je adresar s boosterom v nativnom formate XGBoost, manifestom a encoderom.
+Pred pouzitim sa overi checksum, aby sa poskodeny alebo neuplny model nikdy nedostal do servingu.
+"""
+import os
+import json
+import pickle
+import hashlib
+
+from encoder import FeatureEncoder
+from forest import TreeEnsemble
+from grid import PriceGrid
+from comparables import ComparablesIndex
+
+BOOSTER_FILE = 'booster.json'
+MANIFEST_FILE = 'manifest.json'
+ENCODER_FILE = 'encoder.json'
+TREES_FILE = 'trees.npz'
+GRID_FILE = 'grid.npz'
+COMPARABLES_FILE = 'comparables.npz'
+
+BACKEND_XGBOOST = 'xgboost'
+BACKEND_NUMPY = 'numpy'
+
+
+def file_checksum(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class BoosterPredictor:
+    """Raw XGBoost booster"""
+
+    def __init__(self, booster, feature_names, dmatrix):
+        self.booster = booster
+        self.feature_names = feature_names
+        self.dmatrix = dmatrix
+
+    def predict(self, matrix):
+        return self.booster.predict(self.dmatrix(matrix, feature_names=self.feature_names))
+
+
+class ModelArtifact:
+    """Predictor together with its encoder and manifest, swapped as one object"""
+
+    def __init__(self, path, predictor, encoder, manifest, comparables=None):
+        self.path = path
+        self.predictor = predictor
+        self.encoder = encoder
+        self.manifest = manifest
+        # index porovnatelnych inzeratov, starsie modely ho nemaju
+        self.comparables = comparables
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def predict(self, matrix):
+        return self.predictor.predict(matrix)
+
+
+def load_artifact(path, backend=BACKEND_XGBOOST):
+    "Load and validate model pointed to by path, raises ValueError for broken model"
+    path = os.path.realpath(path)
+
+    if not os.path.isdir(path):
+        if backend != BACKEND_XGBOOST:
+            raise ValueError('Legacy model {} supports only xgboost backend'.format(path))
+        return load_legacy_artifact(path)
+
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if backend == BACKEND_NUMPY:
+        predictor = load_trees(path, manifest)
+    else:
+        predictor = load_booster(path, manifest)
+
+    encoder = FeatureEncoder.load(os.path.join(path, ENCODER_FILE))
+    if encoder.columns != manifest['feature_names']:
+        raise ValueError('Encoder columns do not match model features for {}'.format(path))
+    if encoder.grid_features:
+        encoder.grid = load_grid(path, manifest)
+
+    comparables = None
+    if 'comparables_checksum' in manifest:
+        comparables = load_comparables(path, manifest)
+
+    return ModelArtifact(path, predictor, encoder, manifest, comparables)
+
+
+def load_booster(path, manifest):
+    # xgboost sa importuje az tu, numpy backend ho vobec nenacita
+    import xgboost as xgb
+
+    booster_path = os.path.join(path, BOOSTER_FILE)
+    if file_checksum(booster_path) != manifest['checksum']:
+        raise ValueError('Checksum mismatch for {}'.format(booster_path))
+
+    try:
+        booster = xgb.Booster(model_file=booster_path)
+    except xgb.core.XGBoostError as e:
+        raise ValueError('Cannot load booster {}: {}'.format(booster_path, e))
+
+    booster.feature_names = manifest['feature_names']
+    return BoosterPredictor(booster, manifest['feature_names'], xgb.DMatrix)
+
+
+def load_trees(path, manifest):
+    trees_path = os.path.join(path, TREES_FILE)
+    if 'trees_checksum' not in manifest:
+        raise ValueError('Model {} has no exported trees'.format(path))
+    if file_checksum(trees_path) != manifest['trees_checksum']:
+        raise ValueError('Checksum mismatch for {}'.format(trees_path))
+
+    return TreeEnsemble.load(trees_path)
+
+
+def load_grid(path, manifest):
+    grid_path = os.path.join(path, GRID_FILE)
+    if file_checksum(grid_path) != manifest.get('grid_checksum'):
+        raise ValueError('Checksum mismatch for {}'.format(grid_path))
+
+    return PriceGrid.load(grid_path)
+
+
+def load_comparables(path, manifest):
+    comparables_path = os.path.join(path, COMPARABLES_FILE)
+    if file_checksum(comparables_path) != manifest['comparables_checksum']:
+        raise ValueError('Checksum mismatch for {}'.format(comparables_path))
+
+    return ComparablesIndex.load(comparables_path)
+
+
+def load_legacy_artifact(path):
+    "Pickled XGBRegressor from older pipeline runs"
+    import xgboost as xgb
+
+    booster = pickle.load(open(path, 'rb')).get_booster()
+    encoder = FeatureEncoder.from_feature_names(booster.feature_names)
+    manifest = {'feature_names': booster.feature_names}
+    return ModelArtifact(path, BoosterPredictor(booster, booster.feature_names, xgb.DMatrix), encoder, manifest)
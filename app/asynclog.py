@@ -0,0 +1,76 @@
+"""
+Asynchronne logovanie. Request vlakno iba vlozi zaznam do ohranicenej fronty, na disk ho zapisuje vlakno
+QueueListener. Zaznamy su kompaktne JSON lines. Do suboru pisu vsetky gunicorn workery naraz, preto ho nerotuju samy,
+ale logrotate (debian/app-logrotate) s volbou create: subor sa premenuje a zalozi novy, WatchedFileHandler pri dalsom
+zapise uvidi zmenu inode a otvori novy subor. S copytruncate sa nic znova neotvara, zapisy v rezime pripajania
+pokracuju na konci skrateneho suboru, ale zaznamy zapisane pocas kopirovania sa stratia. delaycompress necha starsi
+subor nekomprimovany, kym do neho workery este mozu dopisat. Ked je fronta plna, zaznam sa zahodi a zapocita,
+request na disk nikdy neciaka.
+"""
+import os
+import json
+import queue
+import logging
+
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+# atributy LogRecord, ktore nie su extra polia zaznamu
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, extra fields passed to the log call are kept as they are"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'pid': record.process,
+            'src': '{}:{}'.format(record.filename, record.lineno),
+            'msg': record.getMessage(),
+        }
+        for k, v in vars(record).items():
+            if k not in RECORD_ATTRIBUTES:
+                entry[k] = v
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller, records over queue capacity are dropped and counted"""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLog:
+    """Queue handler for loggers and background thread appending JSON lines to file rotated by logrotate"""
+
+    def __init__(self, path, queue_size):
+        self.queue = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+
+        file_handler = WatchedFileHandler(path, delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, file_handler, respect_handler_level=True)
+        self.pid = None
+
+    def start(self):
+        "Start writer thread, again in forked worker where the master's thread does not exist"
+        if self.pid == os.getpid():
+            return
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def stop(self):
+        "Write out queued records, called when worker exits"
+        if self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
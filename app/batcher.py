@@ -0,0 +1,112 @@
+"""
+Micro-batching predikcii. Single-row requesty z viacerych vlakien sa zbieraju do fronty a predikuju sa spolu jednym
+volanim modelu, ked sa nazbiera max_batch_size riadkov alebo uplynie max_wait_ms od prveho riadku v davke. Davky
+vznikaju iba zo sucasnych requestov, gunicorn worker preto potrebuje viac vlakien (GUNICORN_THREADS) a davka nemoze
+mat viac riadkov, ako ma worker vlakien.
+"""
+import time
+import queue
+import threading
+
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchStats:
+    """Counters of achieved batch size and queueing delay, used for tuning batch size and wait time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    def record(self, batch_size, delays):
+        with self.lock:
+            self.batches += 1
+            self.rows += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.queue_delay += sum(delays)
+            self.max_queue_delay = max([self.max_queue_delay] + delays)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'mean_queue_delay_ms': 1000 * self.queue_delay / self.rows if self.rows else 0,
+                'max_queue_delay_ms': 1000 * self.max_queue_delay,
+            }
+
+
+class MicroBatcher:
+    """Collects single rows from concurrent requests and predicts them together"""
+
+    def __init__(self, max_batch_size, max_wait_ms):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.stats = BatchStats()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        # vlakno sa startuje az v gunicorn workeri, fork by ho nezdedil
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='micro-batcher', daemon=True)
+                self.thread.start()
+
+    def submit(self, model, row):
+        "Queue one encoded row for prediction with model and wait for the result"
+        if self.thread is None:
+            self.start()
+        future = Future()
+        self.queue.put((time.monotonic(), model, row, future))
+        return future.result()
+
+    def collect(self):
+        first = self.queue.get()
+        batch = [first]
+        deadline = first[0] + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def run(self):
+        while True:
+            self.flush(self.collect())
+
+    def flush(self, batch):
+        now = time.monotonic()
+        self.stats.record(len(batch), [now - enqueued for enqueued, _, _, _ in batch])
+
+        # pocas update-model moze davka obsahovat riadky encodovane pre rozne modely
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[1]), []).append(item)
+
+        for items in groups.values():
+            model = items[0][1]
+            try:
+                preds = model.predict(np.vstack([row for _, _, row, _ in items]))
+            except Exception as e:
+                for _, _, _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, _, _, future) in enumerate(items):
+                future.set_result(preds[i:i + 1])
@@ -0,0 +1,250 @@
+"""
+Benchmarky predikcnej sluzby, spusta sa z adresara app (rovnako ako gunicorn, model je v ./model/best).
+
+micro  - meria kroky make_prediction (decode, normalize, encode, predict) na realistickych vstupoch, ake posiela
+         formular z static/main.js
+load   - zatazi /predict pri roznej concurrency a zmeria throughput a p50/p95/p99 latenciu, bez --url in-process cez
+         Flask test client, s --url proti beziacemu gunicornu
+all    - micro aj load
+
+Vysledky sa ulozia do JSON suboru (--out), compare porovna dva taketo subory, napr. pred a po zmene alebo dva
+kandidatne modely. S --url sa ulozi aj sucet RSS workerov z /metrics, porovnanie serving modov:
+
+    gunicorn -c gunicorn.conf.py zakolko:app                         + python bench.py load --url ... --out sync.json
+    SERVING_MODE=threaded gunicorn -c gunicorn.conf.py zakolko:app   + python bench.py load --url ... --out threaded.json
+    python bench.py compare sync.json threaded.json
+
+Pouzitie:
+    python bench.py micro --out before.json
+    python bench.py load --url http://127.0.0.1:5000/predict --concurrency 1,4,16 --duration 10 --out after.json
+    python bench.py compare before.json after.json
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+
+from datetime import datetime
+
+import numpy as np
+
+import zakolko
+
+# ciselne polia formulara a realisticke rozsahy hodnot
+FORM_NUMBERS = {
+    'uzit_plocha': (25, 120),
+    'rok_vystavby': (1950, 2023),
+    'pocet_nadz_podlazi': (2, 15),
+    'pocet_izieb': (1, 5),
+    'podlazie': (0, 12),
+}
+FORM_GPS = {
+    'latitude': (48.10, 48.22),
+    'longitude': (17.02, 17.20),
+}
+# nepovinne polia, formular posle prazdny retazec
+OPTIONAL = ['kurenie', 'energ_cert', 'pocet_nadz_podlazi', 'rok_vystavby']
+PERCENTILES = (50, 95, 99)
+
+
+def make_inputs(encoder, n, seed=0):
+    "Feature dicts as posted by the web form, only values the model accepts"
+    rng = random.Random(seed)
+    categories = {c: sorted(values) for c, values in encoder.categories.items() if values}
+
+    inputs = []
+    while len(inputs) < n:
+        features = {}
+        for c in ('mesto', 'druh', 'stav', 'kurenie', 'energ_cert'):
+            if c in categories:
+                features[c] = rng.choice(categories[c])
+        for f, (low, high) in FORM_NUMBERS.items():
+            features[f] = str(rng.randint(low, high))
+        for f, (low, high) in FORM_GPS.items():
+            features[f] = str(round(rng.uniform(low, high), 6))
+        for f in OPTIONAL:
+            if rng.random() < 0.2:
+                features[f] = ''
+        # checkbox vytah sa posiela iba zaskrtnuty
+        if 'Ano' in categories.get('vytah', ()) and rng.random() < 0.5:
+            features['vytah'] = 'Ano'
+
+        try:
+            encoder.normalize(features)
+        except ValueError:
+            continue
+        inputs.append(features)
+    return inputs
+
+def summarize(latencies):
+    latencies = np.array(latencies) * 1000
+    summary = {'mean_ms': float(latencies.mean())}
+    for p in PERCENTILES:
+        summary['p{}_ms'.format(p)] = float(np.percentile(latencies, p))
+    return summary
+
+def timed(fn, args):
+    latencies = []
+    for a in args:
+        start = time.perf_counter()
+        fn(a)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+def micro(inputs):
+    current = zakolko.model
+    bodies = [json.dumps(f) for f in inputs]
+    normalized = [current.encoder.normalize(f) for f in inputs]
+    rows = [current.encoder.encode_normalized(n) for n in normalized]
+
+    # cache by pri opakovanych vstupoch merala iba lookup
+    cache, zakolko.cache = zakolko.cache, None
+    try:
+        results = {
+            'decode': timed(json.loads, bodies),
+            'normalize': timed(current.encoder.normalize, inputs),
+            'encode': timed(current.encoder.encode_normalized, normalized),
+            'predict': timed(current.predict, rows),
+            'make_prediction': timed(zakolko.make_prediction, inputs),
+        }
+    finally:
+        zakolko.cache = cache
+
+    matrix = np.vstack(rows)
+    start = time.perf_counter()
+    current.predict(matrix)
+    results['predict_batch'] = {'rows': len(matrix), 'rows_per_s': len(matrix) / (time.perf_counter() - start)}
+    return results
+
+def post_in_process(client):
+    def post(body):
+        return client.post('/predict', data=body, content_type='text/plain').status_code
+    return post
+
+def post_url(url):
+    def post(body):
+        request = urllib.request.Request(url, data=body.encode('utf-8'), headers={'Content-Type': 'text/plain'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return 0
+    return post
+
+def server_rss(url):
+    "Total RSS of all workers reported by /metrics of the server"
+    with urllib.request.urlopen(url.rsplit('/', 1)[0] + '/metrics', timeout=30) as response:
+        lines = response.read().decode('utf-8').splitlines()
+    return sum(float(line.split()[-1]) for line in lines if line.startswith('zakolko_worker_rss_bytes{'))
+
+def load(inputs, concurrency, duration, url=None):
+    "Each of concurrency threads posts inputs in a loop for duration seconds"
+    bodies = [json.dumps(f) for f in inputs]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        post = post_url(url) if url else post_in_process(zakolko.app.test_client())
+        mine, codes = [], {}
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = post(bodies[i % len(bodies)])
+            mine.append(time.perf_counter() - start)
+            codes[status] = codes.get(status, 0) + 1
+            i += concurrency
+        with lock:
+            latencies.extend(mine)
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    # 503 su odmietnute pretazenim, do throughputu sa nerataju
+    ok = statuses.get(200, 0)
+    result = {'concurrency': concurrency, 'requests': len(latencies), 'ok': ok, 'rejected': statuses.get(503, 0),
+              'errors': len(latencies) - ok - statuses.get(503, 0), 'rps': ok / elapsed}
+    result.update(summarize(latencies))
+    return result
+
+def compare(old, new):
+    print('{:<20} {:>12} {:>12} {:>8}'.format('', 'old', 'new', 'new/old'))
+    for op, stats in sorted(old.get('micro', {}).items()):
+        if op in new.get('micro', {}) and 'mean_ms' in stats:
+            a, b = stats['mean_ms'], new['micro'][op]['mean_ms']
+            print('{:<20} {:>10.4f}ms {:>10.4f}ms {:>8.2f}'.format(op, a, b, b / a))
+
+    new_load = {r['concurrency']: r for r in new.get('load', [])}
+    for r in old.get('load', []):
+        other = new_load.get(r['concurrency'])
+        if not other:
+            continue
+        for key in ['rps'] + ['p{}_ms'.format(p) for p in PERCENTILES]:
+            label = 'c={} {}'.format(r['concurrency'], key)
+            print('{:<20} {:>12.2f} {:>12.2f} {:>8.2f}'.format(label, r[key], other[key], other[key] / r[key]))
+
+    if old.get('rss_bytes') and new.get('rss_bytes'):
+        a, b = old['rss_bytes'] / 2 ** 20, new['rss_bytes'] / 2 ** 20
+        print('{:<20} {:>10.1f}MB {:>10.1f}MB {:>8.2f}'.format('server RSS', a, b, b / a))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Prediction service benchmarks')
+    parser.add_argument('command', choices=['micro', 'load', 'all', 'compare'])
+    parser.add_argument('files', nargs='*', help='two result files for compare')
+    parser.add_argument('--inputs', type=int, default=2000, help='number of generated form inputs')
+    parser.add_argument('--url', help='/predict url of running server, in-process when omitted')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per concurrency level')
+    parser.add_argument('--out', help='results file')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        old, new = (json.load(open(f)) for f in args.files)
+        compare(old, new)
+        sys.exit()
+
+    zakolko.load_model()
+    inputs = make_inputs(zakolko.model.encoder, args.inputs)
+
+    results = {
+        'started': datetime.now().isoformat(),
+        'model': zakolko.model.name,
+        'backend': zakolko.SERVING_BACKEND,
+        'url': args.url,
+        'inputs': len(inputs),
+    }
+
+    if args.command in ('micro', 'all'):
+        results['micro'] = micro(inputs)
+        for op, stats in results['micro'].items():
+            print(op, json.dumps(stats))
+
+    if args.command in ('load', 'all'):
+        results['load'] = []
+        for concurrency in map(int, args.concurrency.split(',')):
+            result = load(inputs, concurrency, args.duration, args.url)
+            results['load'].append(result)
+            print(json.dumps(result))
+        if args.url:
+            results['rss_bytes'] = server_rss(args.url)
+            print('server RSS {:.1f} MB'.format(results['rss_bytes'] / 2 ** 20))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,76 @@
+"""
+Ohraniceny LRU cache predikcii s volitelnym TTL. Kluc je kanonicky tvar normalizovanych features, takze rovnaky byt
+poslany formularom znova nejde do modelu. Cache sa vyprazdni pri kazdom nacitani noveho modelu.
+"""
+import time
+import threading
+
+from collections import OrderedDict
+
+
+def make_key(normalized):
+    return tuple(sorted(normalized.items()))
+
+
+class PredictionCache:
+    """Thread safe LRU cache with optional TTL and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        # zvysi sa pri kazdom clear, hodnoty spocitane starym modelom sa potom neulozia
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            value, expires = item
+            if expires and expires < time.monotonic():
+                del self.data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+
+            expires = time.monotonic() + self.ttl if self.ttl else 0
+            self.data[key] = (value, expires)
+            self.data.move_to_end(key)
+
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.generation += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
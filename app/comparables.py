@@ -0,0 +1,62 @@
+"""
+Index porovnatelnych inzeratov ulozeny s modelom (ml/comparables.py). Dotaz spocita vazenu vzdialenost ku vsetkym
+bodom indexu vektorovo po rozmeroch a vyberie k najblizsich, index ma ohraniceny pocet riadkov, takze dotaz trva
+nizke jednotky ms.
+"""
+import numpy as np
+
+
+class ComparablesIndex:
+    """k nearest listings by location, floor area, number of rooms and year of construction"""
+
+    def __init__(self, features, offset, scale, points, values, cena, zdroj_values, zdroj, ids):
+        self.features = features
+        self.offset = offset
+        self.scale = scale
+        # (rozmer, riadok) float32, uz posunute a vydelene mierkou
+        self.points = points
+        self.values = values
+        self.cena = cena
+        self.zdroj_values = zdroj_values
+        self.zdroj = zdroj
+        self.ids = ids
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as index:
+            return cls([str(f) for f in index['features']], index['offset'], index['scale'], index['points'],
+                       index['values'], index['cena'], [str(z) for z in index['zdroj_values']], index['zdroj'],
+                       index['ids'])
+
+    def __len__(self):
+        return self.points.shape[1]
+
+    def query(self, normalized, k):
+        """k listings nearest to normalized features, closest first. Features missing in the query are left out of
+        the distance, at least one has to be present."""
+        dims = [d for d, f in enumerate(self.features) if f in normalized]
+        if not dims:
+            raise ValueError('None of features {} given'.format(', '.join(self.features)))
+
+        distance = np.zeros(len(self), dtype=np.float32)
+        for d in dims:
+            q = np.float32((normalized[self.features[d]] - self.offset[d]) / self.scale[d])
+            distance += np.square(self.points[d] - q)
+
+        k = min(k, len(self))
+        nearest = np.argpartition(distance, k - 1)[:k] if k < len(self) else np.arange(len(self))
+        nearest = nearest[np.argsort(distance[nearest])]
+
+        return [self.listing(i, float(np.sqrt(distance[i]))) for i in nearest]
+
+    def listing(self, i, distance):
+        listing = {
+            'zdroj': self.zdroj_values[self.zdroj[i]],
+            'id': self.ids[i].decode('utf-8'),
+            'cena': float(self.cena[i]),
+            'distance': round(distance, 4),
+        }
+        for d, f in enumerate(self.features):
+            value = float(self.values[d, i])
+            listing[f] = None if np.isnan(value) else value
+        return listing
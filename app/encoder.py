@@ -0,0 +1,239 @@
+"""
+Predkompilovany encoder features pre serving. Pipeline ulozi specifikaciu (poradie stlpcov, mapu kategoria -> index
+stlpca a pravidla pre chybajuce hodnoty) vedla modelu, aby sa one-hot nazvy pri predikcii nerozisli s treningom.
+"""
+import json
+
+import numpy as np
+
+# hodnota, ktora pri numerickych features znamena chybajuci udaj
+MISSING_VALUE = 0
+PREFIX_SEP = '_'
+
+# akcie pravidiel z cistenia dat, hodnota mimo hranic je odmietnuta alebo brana ako chybajuca
+LIMIT_REJECT = 'reject'
+LIMIT_MISSING = 'missing'
+
+# defaulty pre starsie modely, ku ktorym nebol ulozeny encoder
+NUM_FEATURES = ['uzit_plocha', 'rok_vystavby', 'pocet_nadz_podlazi', 'pocet_izieb', 'podlazie']
+GPS_FEATURES = ['latitude', 'longitude']
+CAT_COLUMNS = ['mesto', 'druh', 'stav', 'kurenie', 'energ_cert', 'vytah', 'garaz', 'garazove_statie']
+
+
+class FeatureError(ValueError):
+    """Invalid input feature, feature is reported to the client together with the message"""
+
+    def __init__(self, message, feature):
+        super().__init__(message)
+        self.feature = feature
+
+
+class FeatureEncoder:
+    """Encodes raw feature dicts from the web form straight into float32 rows in the model's column order"""
+
+    def __init__(self, columns, num_features, gps_features, categories, limits=(), grid_features=()):
+        self.columns = list(columns)
+        self.num_features = list(num_features)
+        self.gps_features = list(gps_features)
+
+        index = {name: i for i, name in enumerate(self.columns)}
+
+        self.num_index = [(f, index[f]) for f in self.num_features]
+        self.gps_index = [(f, index[f]) for f in self.gps_features]
+        # {kategoria: {hodnota: index stlpca}}
+        self.categories = {c: dict(values) for c, values in categories.items()}
+        # hranice numerickych features z cistenia treningovych dat
+        self.limits = list(limits)
+        # features z priestorovej mriezky, doplnia sa podla GPS (artifact nastavi grid)
+        self.grid_features = list(grid_features)
+        self.grid_index = [(f, index[f]) for f in self.grid_features]
+        self.grid = None
+
+        # missing numericke hodnoty su NaN, one-hot stlpce 0
+        self.template = np.zeros(len(self.columns), dtype=np.float32)
+        for _, i in self.num_index + self.gps_index + self.grid_index:
+            self.template[i] = np.nan
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec['columns'], spec['num_features'], spec['gps_features'], spec['categories'],
+                   spec.get('limits', ()), spec.get('grid_features', ()))
+
+    @classmethod
+    def from_feature_names(cls, feature_names, num_features=NUM_FEATURES, gps_features=GPS_FEATURES,
+                           cat_columns=CAT_COLUMNS):
+        "Reconstruct encoder from booster feature names, used for models saved without encoder"
+        categories = {c: {} for c in cat_columns}
+        # najdlhsi prefix vyhrava, aby sa garaz_ nepomiesal s garazove_statie_
+        prefixes = sorted(cat_columns, key=len, reverse=True)
+        for i, name in enumerate(feature_names):
+            if name in num_features or name in gps_features:
+                continue
+            for c in prefixes:
+                if name.startswith(c + PREFIX_SEP):
+                    categories[c][name[len(c) + len(PREFIX_SEP):]] = i
+                    break
+        return cls(feature_names, num_features, gps_features, categories)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_spec(json.load(f))
+
+    def to_spec(self):
+        return {
+            'columns': self.columns,
+            'num_features': self.num_features,
+            'gps_features': self.gps_features,
+            'categories': self.categories,
+            'limits': self.limits,
+            'grid_features': self.grid_features,
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_spec(), f)
+
+    def check_features(self, features):
+        "Drop empty values and reject features the model does not know"
+        if not isinstance(features, dict):
+            raise ValueError('Features must be an object')
+
+        features = {k: v for k, v in features.items() if v != ''}
+
+        for k, v in features.items():
+            if k in self.categories:
+                if str(v) not in self.categories[k]:
+                    raise FeatureError('Unknown value {} for feature {}'.format(v, k), k)
+            elif k not in self.num_features and k not in self.gps_features:
+                raise FeatureError('Unknown feature {}'.format(k), k)
+
+        return features
+
+    def bounds(self, limit, group):
+        "Low and high bound of limit for group value (or None), missing bound is infinite"
+        low, high = limit['low'], limit['high']
+        if limit.get('by') and group in limit['groups']:
+            low, high = limit['groups'][group]
+        return -np.inf if low is None else low, np.inf if high is None else high
+
+    def within(self, values, limit, groups):
+        bounds = [self.bounds(limit, g) for g in groups]
+        low = np.array([b[0] for b in bounds])
+        high = np.array([b[1] for b in bounds])
+        with np.errstate(invalid='ignore'):
+            if limit['inclusive']:
+                return (values >= low) & (values <= high)
+            return (values > low) & (values < high)
+
+    def check_limits(self, normalized):
+        for limit in self.limits:
+            f = limit['feature']
+            if f not in normalized:
+                continue
+            if self.within(np.array([normalized[f]]), limit, [normalized.get(limit.get('by'))])[0]:
+                continue
+            if limit['action'] == LIMIT_MISSING:
+                del normalized[f]
+            else:
+                raise FeatureError('Value {} out of range for feature {}'.format(normalized[f], f), f)
+
+    def normalize(self, features):
+        "Checked features with numbers coerced and missing numbers dropped, canonical form used as cache key"
+        features = self.check_features(features)
+
+        normalized = {}
+        for k, v in features.items():
+            if k in self.categories:
+                normalized[k] = str(v)
+                continue
+            try:
+                value = int(v) if k in self.num_features else float(v)
+            except (TypeError, ValueError):
+                raise FeatureError('Invalid value {} for feature {}'.format(v, k), k)
+            if value != MISSING_VALUE:
+                normalized[k] = value
+
+        self.check_limits(normalized)
+
+        return normalized
+
+    def encode(self, features):
+        "Encode single feature dict into 2D float32 array with one row"
+        return self.encode_normalized(self.normalize(features))
+
+    def encode_normalized(self, normalized):
+        row = self.template.copy()
+
+        for f, i in self.num_index + self.gps_index:
+            if f in normalized:
+                row[i] = normalized[f]
+
+        for k, v in normalized.items():
+            if k in self.categories:
+                row[self.categories[k][v]] = 1
+
+        if self.grid_index:
+            lat, lon = (normalized.get(f, np.nan) for f in self.gps_features)
+            values = self.grid.lookup(lat, lon)
+            for f, i in self.grid_index:
+                row[i] = values[f]
+
+        return row.reshape(1, -1)
+
+    def encode_batch(self, rows):
+        """Encode list of feature dicts column by column into one float32 matrix.
+
+        Returns matrix and {row index: error message} for rows which could not be encoded, their matrix rows
+        should not be used for prediction.
+        """
+        matrix = np.tile(self.template, (len(rows), 1))
+        errors = {}
+
+        checked = []
+        for r, features in enumerate(rows):
+            try:
+                checked.append(self.check_features(features))
+            except ValueError as e:
+                errors[r] = str(e)
+                checked.append({})
+
+        numbers = {}
+        for index, cast in ((self.num_index, int), (self.gps_index, float)):
+            for f, i in index:
+                column = np.full(len(rows), np.nan, dtype=np.float32)
+                for r, features in enumerate(checked):
+                    try:
+                        column[r] = cast(features.get(f, MISSING_VALUE))
+                    except (TypeError, ValueError):
+                        errors.setdefault(r, 'Invalid value {} for feature {}'.format(features[f], f))
+                column[column == MISSING_VALUE] = np.nan
+                numbers[f] = column
+
+        for limit in self.limits:
+            column = numbers.get(limit['feature'])
+            if column is None:
+                continue
+            groups = [features.get(limit.get('by')) for features in checked]
+            outside = ~self.within(column, limit, groups) & ~np.isnan(column)
+            if limit['action'] == LIMIT_MISSING:
+                column[outside] = np.nan
+                continue
+            for r in np.flatnonzero(outside).tolist():
+                errors.setdefault(r, 'Value {} out of range for feature {}'.format(checked[r][limit['feature']], limit['feature']))
+
+        for f, i in self.num_index + self.gps_index:
+            matrix[:, i] = numbers[f]
+
+        if self.grid_index:
+            values = self.grid.lookup(*(numbers[f] for f in self.gps_features))
+            for f, i in self.grid_index:
+                matrix[:, i] = values[f]
+
+        for c, values in self.categories.items():
+            hot = [(r, values[str(features[c])]) for r, features in enumerate(checked) if c in features]
+            if hot:
+                hot_rows, hot_columns = zip(*hot)
+                matrix[list(hot_rows), list(hot_columns)] = 1
+
+        return matrix, errors
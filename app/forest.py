@@ -0,0 +1,59 @@
+"""
+Vyhodnocovanie stromov XGBoost modelu iba pomocou NumPy. Pipeline exportuje vsetky stromy do spojitych poli
+(trees.npz), serving potom nepotrebuje importovat xgboost a startuje rychlejsie s mensou pamatou.
+"""
+import numpy as np
+
+# tolerancia zhody s XGBoost, sumy listov vo float32 sa mozu scitat v inom poradi
+PARITY_RTOL = 1e-4
+# riadky sa vyhodnocuju po blokoch, docasne polia (riadky, stromy) tak ostanu male pre lubovolne velky batch
+CHUNK_ROWS = 256
+
+
+class TreeEnsemble:
+    """All trees flattened into node arrays, leaves point to themselves so every row can walk max_depth steps"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, max_depth, base_score):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base_score = np.float32(base_score)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as trees:
+            ensemble = cls(
+                trees['feature'], trees['threshold'], trees['left'], trees['right'], trees['default_left'],
+                trees['value'], trees['roots'], trees['max_depth'], trees['base_score'],
+            )
+            ensemble.check_parity(trees['parity_X'], trees['parity_y'])
+        return ensemble
+
+    def check_parity(self, X, y):
+        "Compare with XGBoost predictions saved by pipeline, raises ValueError when trees were exported wrong"
+        if len(X) and not np.allclose(self.predict(X), y, rtol=PARITY_RTOL):
+            raise ValueError('NumPy tree evaluator does not match XGBoost predictions')
+
+    def predict(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        result = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), CHUNK_ROWS):
+            result[start:start + CHUNK_ROWS] = self.predict_chunk(matrix[start:start + CHUNK_ROWS])
+        return result
+
+    def predict_chunk(self, matrix):
+        rows = np.arange(len(matrix))[:, None]
+
+        # index aktualneho uzla pre kazdy riadok a strom, shape (riadky, stromy)
+        nodes = np.broadcast_to(self.roots, (len(matrix), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = matrix[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].sum(axis=1, dtype=np.float32) + self.base_score
@@ -0,0 +1,36 @@
+"""
+Priestorova mriezka cien ulozena s modelom (ml/grid.py). Features bunky sa citaju priamo z poli podla lat/lon.
+"""
+import numpy as np
+
+
+class PriceGrid:
+    """Lookup of precomputed neighborhood features by GPS position"""
+
+    def __init__(self, lat0, lon0, step_lat, step_lon, values):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step_lat = step_lat
+        self.step_lon = step_lon
+        # {feature: 2D pole buniek}
+        self.values = values
+        self.shape = next(iter(values.values())).shape
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as grid:
+            values = {str(f): grid[str(f)] for f in grid['features']}
+            return cls(float(grid['lat0']), float(grid['lon0']), float(grid['step_lat']), float(grid['step_lon']),
+                       values)
+
+    def lookup(self, lat, lon):
+        "Features for arrays of positions, NaN outside of grid or without GPS"
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            i = np.floor((lat - self.lat0) / self.step_lat)
+            j = np.floor((lon - self.lon0) / self.step_lon)
+            inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & (j < self.shape[1])
+        i = np.where(inside, i, 0).astype(np.int64)
+        j = np.where(inside, j, 0).astype(np.int64)
+        return {f: np.where(inside, v[i, j], np.nan) for f, v in self.values.items()}
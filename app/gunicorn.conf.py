@@ -1,6 +1,66 @@
+import os
+import signal
 import multiprocessing
 
 bind = "127.0.0.1:5000"
 workers = multiprocessing.cpu_count() * 1
+# viac vlakien na workera, micro-batching (MICROBATCH_SIZE) potrebuje aspon 2, davka ma najviac threads riadkov
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# SERVING_MODE=threaded: jeden proces s modelom nacitanym raz obsluhuje vela requestov vo vlaknach, predikcie bezia
+# v obmedzenom executore (PREDICT_WORKERS, PREDICT_QUEUE v zakolko.py) a nad limit dostanu rychle 503
+if os.environ.get('SERVING_MODE') == 'threaded':
+    workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 32))
+    os.environ.setdefault('PREDICT_WORKERS', str(multiprocessing.cpu_count()))
+# zakolko podla poctu vlakien rozhodne o micro-batchingu
+os.environ['GUNICORN_THREADS'] = str(threads)
 accesslog = "-"
 errorlog = "-"
+
+# PRELOAD_MODEL=1: model sa nacita raz v mastri a workeri zdielaju jednu kopiu (copy-on-write), novy model nacita
+# master a workerov vymeni gracefully cez HUP. Inak si kazdy worker sleduje model/best sam.
+preload_app = os.environ.get('PRELOAD_MODEL', '0') == '1'
+
+
+def on_starting(server):
+    # countery predosleho behu by sa pripocitali k novym workerom
+    from metrics import clear_directory
+    clear_directory(os.environ.get('METRICS_DIR', '/tmp/zakolko-metrics'))
+
+
+def reload_workers():
+    import zakolko
+    # v mastri bez warm-up, OpenMP vlakna by sa neprezili fork
+    zakolko.load_model(warm=False)
+    os.kill(os.getpid(), signal.SIGHUP)
+
+
+def when_ready(server):
+    if preload_app:
+        import zakolko
+        zakolko.load_model(warm=False)
+        zakolko.start_model_watcher(reload_workers)
+
+
+def post_worker_init(worker):
+    import zakolko
+    zakolko.metrics.start()
+    zakolko.log.start()
+    if preload_app:
+        zakolko.warm_up(zakolko.model)
+    else:
+        zakolko.load_model()
+        zakolko.start_model_watcher()
+
+
+def worker_exit(server, worker):
+    import zakolko
+    zakolko.metrics.flush()
+    zakolko.log.stop()
+
+
+def child_exit(server, worker):
+    # v mastri aj po zabitom workerovi, skor nez sa jeho pid moze pouzit znova
+    from metrics import Metrics
+    Metrics(os.environ.get('METRICS_DIR', '/tmp/zakolko-metrics')).archive(worker.pid)
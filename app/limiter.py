@@ -0,0 +1,74 @@
+"""
+Obmedzena concurrency predikcii. Predikcie bezia v executore s PREDICT_WORKERS vlaknami, dalsich PREDICT_QUEUE
+poziadaviek moze cakat vo fronte. Poziadavka nad tento limit, alebo ta, ktora caka dlhsie ako timeout, dostane
+okamzite Overloaded (503 s Retry-After) a server sa pod narazom requestov nezahlti.
+"""
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class Overloaded(Exception):
+    pass
+
+
+class LimiterStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {'completed': self.completed, 'rejected': self.rejected, 'timeouts': self.timeouts}
+
+
+class PredictLimiter:
+    """Bounded executor for model calls with bounded wait queue"""
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='predict')
+        # bezace aj cakajuce predikcie
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.in_flight = 0
+        self.stats = LimiterStats()
+
+    def release(self, future):
+        with self.stats.lock:
+            self.in_flight -= 1
+            if not future.cancelled():
+                self.stats.completed += 1
+        self.slots.release()
+
+    def run(self, fn, *args):
+        "Run fn in executor and wait for result, raises Overloaded when queue is full or wait times out"
+        if not self.slots.acquire(blocking=False):
+            with self.stats.lock:
+                self.stats.rejected += 1
+            raise Overloaded('Too many requests in flight')
+
+        with self.stats.lock:
+            self.in_flight += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self.release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # este necakajuca predikcia sa zrusi, bezaca dobehne a uvolni slot sama
+            future.cancel()
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise Overloaded('Prediction queue wait timed out')
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        with self.stats.lock:
+            stats['in_flight'] = self.in_flight
+        stats.update(workers=self.workers, queue_size=self.queue_size, timeout=self.timeout)
+        return stats
@@ -0,0 +1,271 @@
+"""
+Metriky pre Prometheus. Kazdy gunicorn worker pocita v pamati a periodicky zapisuje svoj stav do METRICS_DIR/<pid>.json.
+/metrics scita countery a histogramy zo vsetkych suborov, takze vysledok je za vsetkych workerov bez ohladu na to,
+ktory worker scrape obsluzi. Po skonceni workera master pripocita jeho posledny stav do archived.json a subor zmaze,
+countery preto neklesaju a novy worker s rovnakym pid nic neprepise. Gauge su per worker s labelom pid a exportuju sa
+iba pre zive procesy.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ARCHIVED = 'archived.json'
+# tokeny naposledy archivovanych workerov, /metrics, ktory este precital ich subor, ich nezapocita dvakrat
+ARCHIVED_TOKENS = 100
+
+
+def rss_bytes():
+    "Resident set size of this process"
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # maximum, nie aktualne RSS, na Linuxe v kB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def clear_directory(directory):
+    "Remove states of workers from previous run, called in gunicorn master before workers start"
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json') or name.endswith('.tmp'):
+            os.unlink(os.path.join(directory, name))
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def write_json(path, data):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+def add_values(total, key, value):
+    "Add counter value or histogram list to total[key]"
+    if isinstance(value, list):
+        values = total.setdefault(key, [0] * len(value))
+        for i, v in enumerate(value):
+            values[i] += v
+    else:
+        total[key] = total.get(key, 0) + value
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + '}'
+
+def format_value(value):
+    return repr(float(value)) if value == value else 'NaN'
+
+
+class Metrics:
+    """Counters, latency histograms and per worker gauges shared by all workers through files in directory"""
+
+    def __init__(self, directory, flush_interval=5, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        # {(name, labels): [pocty v bucketoch..., sum, count]}
+        self.histograms = {}
+        self.gauges = {}
+        self.help = {}
+        self.thread = None
+        # identita procesu, pid moze dostat neskor iny worker
+        self.token = uuid.uuid4().hex
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def reset(self, name):
+        "Remove all label sets of gauge, e.g. info gauge of previous model"
+        with self.lock:
+            for key in [key for key in self.gauges if key[0] == name]:
+                del self.gauges[key]
+
+    def state(self):
+        self.set('zakolko_worker_rss_bytes', rss_bytes())
+        with self.lock:
+            return {
+                'token': self.token,
+                'counters': [[n, l, v] for (n, l), v in self.counters.items()],
+                'histograms': [[n, l, v] for (n, l), v in self.histograms.items()],
+                'gauges': [[n, l, v] for (n, l), v in self.gauges.items()],
+            }
+
+    def path(self, pid):
+        return os.path.join(self.directory, '{}.json'.format(pid))
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        write_json(self.path(os.getpid()), self.state())
+
+    def archive(self, pid):
+        "Add last state of exited worker to archived totals and remove its file, called only in gunicorn master"
+        if not self.directory:
+            return
+        path = self.path(pid)
+        try:
+            state = read_json(path)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            os.unlink(path)
+            return
+
+        archived = self.archived()
+        counters = {(n, tuple(map(tuple, l))): v for n, l, v in archived['counters']}
+        histograms = {(n, tuple(map(tuple, l))): v for n, l, v in archived['histograms']}
+        for name, labels, value in state['counters']:
+            add_values(counters, (name, tuple(map(tuple, labels))), value)
+        for name, labels, value in state['histograms']:
+            add_values(histograms, (name, tuple(map(tuple, labels))), value)
+
+        write_json(os.path.join(self.directory, ARCHIVED), {
+            'tokens': (archived['tokens'] + [state.get('token')])[-ARCHIVED_TOKENS:],
+            'counters': [[n, l, v] for (n, l), v in counters.items()],
+            'histograms': [[n, l, v] for (n, l), v in histograms.items()],
+        })
+        # subor sa zmaze az po zapise archivu, medzitym ho /metrics preskoci podla tokenu
+        os.unlink(path)
+
+    def archived(self):
+        try:
+            return read_json(os.path.join(self.directory, ARCHIVED))
+        except (OSError, ValueError):
+            return {'tokens': [], 'counters': [], 'histograms': []}
+
+    def start(self):
+        "Flush state periodically in background thread, called in each worker after fork"
+        if not self.directory or self.thread:
+            return
+        self.token = uuid.uuid4().hex
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self.thread = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self.thread.start()
+
+    def states(self):
+        "State of this worker and last flushed states of other workers as (pid, state)"
+        pid = os.getpid()
+        states = [(pid, self.state())]
+        if not self.directory or not os.path.isdir(self.directory):
+            return states
+
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name in ('{}.json'.format(pid), ARCHIVED):
+                continue
+            try:
+                states.append((int(name[:-5]), read_json(os.path.join(self.directory, name))))
+            except (OSError, ValueError):
+                continue
+
+        # archiv sa cita az po suboroch workerov, worker archivovany medzitym je v archive a jeho subor sa preskoci
+        archived = self.archived()
+        tokens = set(archived['tokens'])
+        states = [(pid, state) for pid, state in states if state.get('token') not in tokens]
+        states.append((None, archived))
+        return states
+
+    def render(self):
+        "All workers aggregated in Prometheus text format"
+        counters, histograms, gauges = {}, {}, {}
+        for pid, state in self.states():
+            for name, labels, value in state['counters']:
+                add_values(counters, (name, tuple(map(tuple, labels))), value)
+            for name, labels, value in state['histograms']:
+                add_values(histograms, (name, tuple(map(tuple, labels))), value)
+            if pid is None or not alive(pid):
+                continue
+            for name, labels, value in state['gauges']:
+                gauges[(name, tuple(map(tuple, labels)) + (('pid', str(pid)),))] = value
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = self.help.get(name, (kind, ''))
+            if text:
+                lines.append('# HELP {} {}'.format(name, text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append('{}{} {}'.format(name, format_labels(labels), format_value(value)))
+
+        for (name, labels), value in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(name, format_labels(labels + (('le', repr(bound)),)), cumulative))
+            lines.append('{}_bucket{} {}'.format(name, format_labels(labels + (('le', '+Inf'),)), value[-1]))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels), format_value(value[-2])))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels), value[-1]))
+
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge')
+            lines.append('{}{} {}'.format(name, format_labels(labels), format_value(value)))
+
+        return '\n'.join(lines) + '\n'
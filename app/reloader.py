@@ -0,0 +1,62 @@
+"""
+Sledovanie symlinku model/best. Novy model sa nacita, overi a zahreje vo vlakne na pozadi a az potom sa vymeni,
+takze request nikdy nevidi napol nacitany model a nacitanie neblokuje ziadny request.
+"""
+import os
+import threading
+
+
+def model_signature(path):
+    "Target of best symlink and its mtime, changes whenever pipeline saves a new best model"
+    target = os.path.realpath(path)
+    return target, os.stat(target).st_mtime_ns
+
+
+class ModelWatcher:
+    """Polls model path and calls on_change when it points to a different model"""
+
+    def __init__(self, path, on_change, interval, log):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.log = log
+        self.signature = None
+        self.failed = None
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, signature=None):
+        self.signature = signature
+        self.thread = threading.Thread(target=self.run, name='model-watcher', daemon=True)
+        self.thread.start()
+
+    def trigger(self):
+        "Check for new model now instead of waiting for next poll"
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.check()
+
+    def check(self):
+        try:
+            signature = model_signature(self.path)
+        except OSError as e:
+            self.log.error('Cannot stat model {}: {}'.format(self.path, e))
+            return
+
+        # rovnaky poskodeny model sa neskusa nacitat stale dokola
+        if signature == self.signature or signature == self.failed:
+            return
+
+        try:
+            self.on_change()
+        except Exception as e:
+            self.log.error('Loading model {} failed: {}'.format(signature[0], e))
+            self.failed = signature
+            return
+
+        self.log.info('Model {} loaded'.format(signature[0]))
+        self.signature = signature
@@ -1,23 +1,95 @@
+import os
 import json
-import pickle
+import time
+import random
 import logging
 
 import numpy as np
-import pandas as pd
 
-from flask import Flask, request, Response
+from flask import Flask, request, Response, g
+from flask.logging import default_handler
+
+from artifact import load_artifact
+from asynclog import AsyncLog
+from batcher import MicroBatcher
+from cache import PredictionCache, make_key
+from encoder import FeatureError
+from limiter import PredictLimiter, Overloaded
+from metrics import Metrics
+from reloader import ModelWatcher, model_signature
 
 MODEL_PATH = './model/best'
+# SERVING_BACKEND=numpy predikuje exportovanymi stromami bez importu xgboost
+SERVING_BACKEND = os.environ.get('SERVING_BACKEND', 'xgboost')
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 10))
+# model nacitany v gunicorn mastri a zdielany workermi, nove modely nacitava master (gunicorn.conf.py)
+MODEL_SHARED = os.environ.get('PRELOAD_MODEL', '0') == '1'
+MAX_BATCH_SIZE = 10000
+# /comparables vrati COMPARABLES_K inzeratov, najviac COMPARABLES_MAX_K cez ?k=
+COMPARABLES_K = int(os.environ.get('COMPARABLES_K', 5))
+COMPARABLES_MAX_K = int(os.environ.get('COMPARABLES_MAX_K', 50))
+
+# micro-batching sa zapne pre MICROBATCH_SIZE > 1 a iba ked worker obsluhuje viac requestov naraz (GUNICORN_THREADS > 1,
+# nastavuje gunicorn.conf.py). Davka nema viac riadkov ako vlakien, s jednym vlaknom by kazdy request iba cakal
+# MICROBATCH_WAIT_MS na davku s jednym riadkom.
+WORKER_THREADS = int(os.environ.get('GUNICORN_THREADS', 1))
+MICROBATCH_SIZE = min(int(os.environ.get('MICROBATCH_SIZE', 1)), WORKER_THREADS)
+MICROBATCH_WAIT_MS = float(os.environ.get('MICROBATCH_WAIT_MS', 5))
+batcher = MicroBatcher(MICROBATCH_SIZE, MICROBATCH_WAIT_MS) if MICROBATCH_SIZE > 1 else None
+
+# PREDICTION_CACHE_SIZE = 0 cache vypne, PREDICTION_CACHE_TTL v sekundach, 0 bez expiracie
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 0))
+cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_SIZE > 0 else None
+# PREDICT_WORKERS > 0 spusta predikcie v obmedzenom executore, nad PREDICT_QUEUE cakajucich vrati 503
+PREDICT_WORKERS = int(os.environ.get('PREDICT_WORKERS', 0))
+PREDICT_QUEUE = int(os.environ.get('PREDICT_QUEUE', 16))
+PREDICT_TIMEOUT = float(os.environ.get('PREDICT_TIMEOUT', 1))
+RETRY_AFTER = int(os.environ.get('RETRY_AFTER', 1))
+limiter = PredictLimiter(PREDICT_WORKERS, PREDICT_QUEUE, PREDICT_TIMEOUT) if PREDICT_WORKERS > 0 else None
+
 model = None
-LOGFILE = '/var/log/app.log'
-FORMATTER = logging.Formatter('%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(message)s')
+watcher = None
+
+# stav kazdeho workera sa zapisuje do METRICS_DIR, /metrics ich scita
+METRICS_DIR = os.environ.get('METRICS_DIR', '/tmp/zakolko-metrics')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+metrics = Metrics(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+metrics.describe('zakolko_requests_total', 'counter', 'Requests by endpoint and status code')
+metrics.describe('zakolko_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+metrics.describe('zakolko_stage_duration_seconds', 'histogram', 'Latency of /predict stages: decode, encode, predict')
+metrics.describe('zakolko_model_info', 'gauge', 'Loaded model')
+metrics.describe('zakolko_model_mae', 'gauge', 'MAE of loaded model parsed from its name')
+metrics.describe('zakolko_model_load_seconds', 'gauge', 'Time to load and warm up the model')
+metrics.describe('zakolko_model_latency_seconds', 'gauge', 'Single row latency of loaded model measured by pipeline')
+metrics.describe('zakolko_worker_rss_bytes', 'gauge', 'Resident memory of worker')
+LOGFILE = os.environ.get('LOGFILE', '/var/log/app.log')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# podiel /predict requestov, ktorych vstup sa zaloguje, chyby sa loguju vzdy
+PAYLOAD_LOG_SAMPLE_RATE = float(os.environ.get('PAYLOAD_LOG_SAMPLE_RATE', 0.01))
 
-file_handler = logging.FileHandler(LOGFILE)
-file_handler.setFormatter(FORMATTER)
-file_handler.setLevel(10)
+log = AsyncLog(LOGFILE, LOG_QUEUE_SIZE)
+log.start()
 
 app = Flask(__name__)
-app.logger.addHandler(file_handler)
+# defaultny Flask handler pise na stderr synchronne v request vlakne, vsetko ide iba cez frontu. Access a error log
+# gunicornu (gunicorn.conf.py) idu na stdout/stderr mimo fronty a tejto zmeny sa netykaju.
+app.logger.removeHandler(default_handler)
+app.logger.addHandler(log.handler)
+app.logger.setLevel(logging.INFO)
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.inc('zakolko_requests_total', endpoint=endpoint, status=response.status_code)
+    if 'start' in g:
+        metrics.observe('zakolko_request_duration_seconds', time.perf_counter() - g.start, endpoint=endpoint)
+    return response
 
 
 @app.route('/status', methods=['GET'])
@@ -27,54 +99,233 @@ def status():
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    features = json.loads(request.data)
-    app.logger.info(features)
-    pred = make_prediction(features)
+    try:
+        with metrics.time('zakolko_stage_duration_seconds', stage='decode'):
+            features = json.loads(request.data)
+    except ValueError as e:
+        return invalid(ValueError('Invalid JSON: {}'.format(e)))
+    if random.random() < PAYLOAD_LOG_SAMPLE_RATE:
+        app.logger.info('predict', extra={'payload': features})
+    try:
+        pred = make_prediction(features)
+    except ValueError as e:
+        app.logger.warning('Invalid features: {}'.format(e), extra={'payload': features})
+        return invalid(e)
+    except Overloaded as e:
+        return overloaded(e)
     message = {'prediction': int(pred[0])}
     response = Response(json.dumps(message))
     response.headers.add('Access-Control-Allow-Origin', '*')
     return response
 
+@app.route('/predict-batch', methods=['POST'])
+def predict_batch():
+    try:
+        rows, errors = parse_batch(request.get_data(as_text=True))
+    except ValueError as e:
+        return Response(json.dumps({'error': 'Invalid JSON: {}'.format(e)}), status=400)
+    if len(rows) > MAX_BATCH_SIZE:
+        return Response(json.dumps({'error': 'Batch larger than {} rows'.format(MAX_BATCH_SIZE)}), status=413)
+
+    try:
+        preds, encode_errors = make_batch_prediction(rows)
+    except Overloaded as e:
+        return overloaded(e)
+    for i, error in encode_errors.items():
+        errors.setdefault(i, error)
+
+    message = {
+        'predictions': [None if i in errors else int(p) for i, p in enumerate(preds)],
+        'errors': [{'index': i, 'error': errors[i]} for i in sorted(errors)],
+    }
+    response = Response(json.dumps(message))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+@app.route('/comparables', methods=['POST'])
+def comparables():
+    current = model
+    if current.comparables is None:
+        return Response(json.dumps({'error': 'Model {} has no comparables index'.format(current.name)}), status=404)
+
+    try:
+        k = int(request.args.get('k', COMPARABLES_K))
+        if not 0 < k <= COMPARABLES_MAX_K:
+            raise ValueError('k must be between 1 and {}'.format(COMPARABLES_MAX_K))
+        features = json.loads(request.data)
+        listings = current.comparables.query(current.encoder.normalize(features), k)
+    except ValueError as e:
+        return invalid(e)
+
+    response = Response(json.dumps({'comparables': listings}))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+def invalid(e):
+    "Rejected input, the offending feature is reported when it is known"
+    message = {'error': str(e)}
+    if isinstance(e, FeatureError):
+        message['feature'] = e.feature
+    response = Response(json.dumps(message), status=400)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+def overloaded(e):
+    "Fast rejection when prediction queue is full, client should retry later"
+    response = Response(json.dumps({'error': str(e)}), status=503)
+    response.headers.add('Retry-After', str(RETRY_AFTER))
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+@app.route('/batch-stats', methods=['GET'])
+def batch_stats():
+    stats = batcher.stats.snapshot() if batcher else {}
+    stats['enabled'] = batcher is not None
+    return json.dumps(stats)
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    stats = cache.snapshot() if cache else {}
+    stats['enabled'] = cache is not None
+    return json.dumps(stats)
+
+@app.route('/limiter-stats', methods=['GET'])
+def limiter_stats():
+    stats = limiter.snapshot() if limiter else {}
+    stats['enabled'] = limiter is not None
+    return json.dumps(stats)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/update-model', methods=['GET'])
 def update_model():
-    load_model()
-    return json.dumps({'status': 'update complete!'})
+    # model nacitava watcher na pozadi, vo vsetkych workeroch
+    if watcher or MODEL_SHARED:
+        if watcher:
+            watcher.trigger()
+        return Response(json.dumps({'status': 'update scheduled!', 'model': model.name}), status=202)
+
+    try:
+        load_model()
+    except (OSError, KeyError, ValueError) as e:
+        app.logger.error('Model update failed: {}'.format(e))
+        return Response(json.dumps({'status': 'update failed!', 'error': str(e)}), status=500)
+    return json.dumps({'status': 'update complete!', 'model': model.name})
 
 def make_prediction(features):
 
-    features = {k: v for k, v in features.items() if v != ''}
-    pred_data = {key:0 for key in model.get_booster().feature_names}
+    # generation sa cita pred modelom, aby sa predikcia stareho modelu neulozila po vymene
+    generation = cache.generation if cache else None
+    current = model
+
+    start = time.perf_counter()
+    normalized = current.encoder.normalize(features)
+    encode_time = time.perf_counter() - start
 
-    num_features = ['uzit_plocha', 'rok_vystavby', 'pocet_nadz_podlazi', 'pocet_izieb', 'podlazie', ]
-    for nf in num_features:
-        num_f = int(features.get(nf, 0))
-        if num_f == 0:
-            pred_data[nf] = np.NaN
+    if cache:
+        key = make_key(normalized)
+        pred = cache.get(key)
+        if pred is not None:
+            metrics.observe('zakolko_stage_duration_seconds', encode_time, stage='encode')
+            return pred
+
+    start = time.perf_counter()
+    row = current.encoder.encode_normalized(normalized)
+    metrics.observe('zakolko_stage_duration_seconds', encode_time + time.perf_counter() - start, stage='encode')
+
+    with metrics.time('zakolko_stage_duration_seconds', stage='predict'):
+        if batcher:
+            pred = batcher.submit(current, row)
+        elif limiter:
+            pred = limiter.run(current.predict, row)
         else:
-            pred_data[nf] = num_f
+            pred = current.predict(row)
+
+    if cache:
+        cache.put(key, pred, generation)
 
-    gps_features = ['latitude', 'longitude']
-    for nf in gps_features:
-        num_f = float(features.get(nf, 0))
-        if num_f == 0:
-            pred_data[nf] = np.NaN
+    return pred
+
+def make_batch_prediction(rows):
+    "Predict all valid rows with single booster call, returns predictions in input order and row errors"
+
+    current = model
+    matrix, errors = current.encoder.encode_batch(rows)
+    preds = np.zeros(len(rows), dtype=np.float32)
+
+    valid = np.ones(len(rows), dtype=bool)
+    valid[list(errors)] = False
+    if valid.any():
+        if limiter:
+            preds[valid] = limiter.run(current.predict, matrix[valid])
         else:
-            pred_data[nf] = num_f
+            preds[valid] = current.predict(matrix[valid])
 
-    for k,v in features.items():
-        if k not in num_features + gps_features:
-            feature_name = k +'_' +str(v)
-            pred_data[feature_name] = 1
+    return preds, errors
 
-    app.logger.info(pred_data)
-    pred_data = pd.DataFrame.from_dict(pred_data, orient='index').transpose()
+def parse_batch(data):
+    "Parse JSON array or NDJSON body into list of rows, NDJSON lines which are not valid JSON are reported as errors"
+    if data.lstrip().startswith('['):
+        return json.loads(data), {}
 
-    return model.predict(pred_data)
+    rows, errors = [], {}
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            errors[len(rows)] = 'Invalid JSON: {}'.format(e)
+            rows.append(None)
+    return rows, errors
 
-@app.before_first_request
-def load_model():
+def warm_up(artifact):
+    "First predict allocates booster buffers, run it before the model serves requests"
+    artifact.predict(artifact.encoder.template.reshape(1, -1))
+
+def load_model(warm=True):
+    # novy model sa nastavi az po uspesnej validacii, inak ostava stary
+    start = time.perf_counter()
+    new_model = load_artifact(MODEL_PATH, SERVING_BACKEND)
+    if warm:
+        warm_up(new_model)
+    swap_model(new_model)
+    record_model(new_model, time.perf_counter() - start)
+
+def record_model(artifact, load_time):
+    try:
+        mae = float(artifact.name.split('_')[-1])
+    except ValueError:
+        mae = float('nan')
+
+    metrics.reset('zakolko_model_info')
+    metrics.set('zakolko_model_info', 1, model=artifact.name)
+    metrics.set('zakolko_model_mae', mae)
+    metrics.set('zakolko_model_load_seconds', load_time)
+    # latencia z manifestu, porovnatelna s realnou v zakolko_stage_duration_seconds{stage="predict"}
+    metrics.set('zakolko_model_latency_seconds', artifact.manifest.get('latency_ms', float('nan')) / 1000)
+
+def swap_model(new_model):
     global model
-    model = pickle.load(open(MODEL_PATH, 'rb'))
+    # priradenie referencie je atomicke, request si berie model raz na zaciatku
+    model = new_model
+
+    # predikcie stareho modelu uz nesmu byt servovane
+    if cache:
+        cache.clear()
+
+def start_model_watcher(on_change=load_model):
+    "Watch best symlink and load new models in background thread"
+    global watcher
+    watcher = ModelWatcher(MODEL_PATH, on_change, MODEL_WATCH_INTERVAL, app.logger)
+    watcher.start(model_signature(MODEL_PATH))
+
+@app.before_first_request
+def ensure_model():
+    if model is None:
+        load_model()
 
 
 if __name__ == "__main__":
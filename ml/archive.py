@@ -0,0 +1,103 @@
+"""
+Archiv surovych HTML odpovedi. Obsah je ulozeny komprimovany a adresovany svojim sha256, index (sqlite) drzi url,
+id inzeratu, cas stiahnutia a ETag/Last-Modified pre podmienene requesty. Z archivu je mozne znova sparsovat inzeraty
+bez siete, napr. ked sa zmeni markup portalu alebo pribudne novy field v Inzerat.
+"""
+import os
+import gzip
+import sqlite3
+import hashlib
+import threading
+
+from datetime import datetime
+
+INDEX_FILE = 'index.sqlite'
+OBJECTS_DIR = 'objects'
+
+
+def blob_path(root, sha):
+    return os.path.join(root, OBJECTS_DIR, sha[:2], sha[2:] + '.gz')
+
+def read_text(root, sha, encoding):
+    "Read archived page, usable from worker processes without opening the index"
+    with gzip.open(blob_path(root, sha), 'rb') as f:
+        return f.read().decode(encoding or 'utf-8', errors='replace')
+
+
+class ArchivedResponse:
+    """Stand-in for requests response when server answered 304 Not Modified"""
+
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+        self.ok = True
+
+
+class PageArchive:
+    """Content addressed store of raw responses indexed by url, inzerat id and fetch time"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+
+        # fetcher zapisuje z viacerych vlakien
+        self.lock = threading.Lock()
+        self.index = sqlite3.connect(os.path.join(root, INDEX_FILE), check_same_thread=False)
+        self.index.row_factory = sqlite3.Row
+        with self.index:
+            self.index.execute(
+                "CREATE TABLE IF NOT EXISTS pages (url TEXT, inzerat_id TEXT, fetched_at TEXT, sha256 TEXT, "
+                "encoding TEXT, etag TEXT, last_modified TEXT)")
+            self.index.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at)")
+            self.index.execute("CREATE INDEX IF NOT EXISTS pages_inzerat ON pages (inzerat_id, fetched_at)")
+
+    def put_blob(self, content):
+        sha = hashlib.sha256(content).hexdigest()
+        path = blob_path(self.root, sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return sha
+
+    def add(self, url, inzerat_id, sha, encoding, etag, last_modified):
+        with self.lock, self.index:
+            self.index.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, inzerat_id, datetime.now().isoformat(), sha, encoding, etag, last_modified))
+
+    def store(self, url, response, inzerat_id=None):
+        sha = self.put_blob(response.content)
+        self.add(url, inzerat_id, sha, response.encoding or response.apparent_encoding,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def touch(self, url, inzerat_id, page):
+        "Record fetch of unchanged page"
+        self.add(url, inzerat_id, page['sha256'], page['encoding'], page['etag'], page['last_modified'])
+
+    def latest(self, url):
+        with self.lock:
+            return self.index.execute(
+                "SELECT * FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)).fetchone()
+
+    def latest_inzeraty(self):
+        "Latest archived page of every inzerat"
+        with self.lock:
+            return self.index.execute(
+                "SELECT p.* FROM pages p JOIN (SELECT inzerat_id, MAX(fetched_at) AS fetched_at FROM pages "
+                "WHERE inzerat_id IS NOT NULL GROUP BY inzerat_id) l "
+                "ON p.inzerat_id = l.inzerat_id AND p.fetched_at = l.fetched_at").fetchall()
+
+    def conditional_headers(self, page):
+        headers = {}
+        if page is not None:
+            if page['etag']:
+                headers['If-None-Match'] = page['etag']
+            if page['last_modified']:
+                headers['If-Modified-Since'] = page['last_modified']
+        return headers
+
+    def text(self, page):
+        return read_text(self.root, page['sha256'], page['encoding'])
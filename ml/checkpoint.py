@@ -0,0 +1,79 @@
+"""
+Checkpoint rozbehnuteho crawlu a statistiky jedneho behu scrapera. Po pade scraper pokracuje od poslednej spracovanej
+stranky a dokonci inzeraty, ktore na nej cakali na stiahnutie. Checkpoint patri jednemu crawlu (id je cas jeho
+zaciatku) a po max_age sekundach expiruje: inzeraty sa medzitym posuvaju po strankach a pokracovanie za starou
+strankou by ich preskocilo.
+"""
+import os
+import json
+import time
+import logging
+
+from datetime import datetime
+from dataclasses import dataclass, field, asdict
+
+log = logging.getLogger()
+
+
+@dataclass
+class CrawlStats:
+    started: str = field(default_factory=lambda: datetime.now().isoformat())
+    pages: int = 0
+    seen: int = 0
+    new: int = 0
+    failed: int = 0
+    inserted: int = 0
+    ignored: int = 0
+    duration: float = 0
+    resumed_from: int = 0
+
+    def __post_init__(self):
+        self.start_time = time.monotonic()
+
+    def finish(self):
+        self.duration = round(time.monotonic() - self.start_time, 1)
+
+    def save(self, path):
+        "Append stats of finished run as one JSON line"
+        with open(path, 'a') as f:
+            f.write(json.dumps(asdict(self)) + '\n')
+
+
+class Checkpoint:
+    """Last fully processed page and urls of inzeraty pending on the page being processed"""
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        # id crawlu, pri pokracovani sa prevezme z checkpointu
+        self.crawl = time.time()
+
+    def load(self):
+        "State of interrupted crawl, None when there is none or it is from expired crawl"
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        crawl = state.get('crawl')
+        if crawl is None or (self.max_age is not None and time.time() - crawl > self.max_age):
+            log.info('Ignoring expired checkpoint of crawl started {}'.format(
+                'unknown' if crawl is None else datetime.fromtimestamp(crawl).isoformat()))
+            self.clear()
+            return None
+
+        self.crawl = crawl
+        return state
+
+    def save(self, pager, pending):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'crawl': self.crawl, 'pager': pager, 'pending': pending}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
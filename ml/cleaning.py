@@ -0,0 +1,257 @@
+"""
+Deklarativne cistenie dat. Pravidla sa vyhodnotia postupne nad povodnym framom, ale nic sa nekopiruje: kazde pravidlo
+vrati masku riadkov, ktore ponechava, a/alebo nove hodnoty niektorych stlpcov. Na konci sa vyberu ponechane riadky
+naraz. Hranice outlierov sa ucia z dat (Tukey ploty nad IQR), volitelne zvlast pre kazdu skupinu, napr. druh bytu.
+Ciselne pravidla nad features sa ukladaju s modelom a serving podla nich validuje vstupy.
+"""
+import numpy as np
+import pandas as pd
+
+DROP = 'reject'
+NULL = 'missing'
+
+
+class Rule:
+    """Base rule, keeps all rows and changes nothing"""
+
+    name = ''
+    drop = ()
+
+    def fit(self, get, mask):
+        pass
+
+    def apply(self, get):
+        "Returns boolean mask of kept rows or None and {column: new values}"
+        return None, {}
+
+    def limits(self):
+        "Numeric bounds usable for validation of serving inputs"
+        return []
+
+
+class Drop(Rule):
+
+    def __init__(self, columns):
+        self.drop = list(columns)
+        self.name = 'drop ' + ', '.join(columns)
+
+
+class Missing(Rule):
+    """Marker value meaning missing in numeric columns (number) or text columns (string)"""
+
+    def __init__(self, value):
+        self.value = value
+        self.name = 'missing {!r}'.format(value)
+
+    def apply(self, get):
+        updates = {}
+        for c, column in get.columns():
+            numeric = pd.api.types.is_numeric_dtype(column)
+            if numeric == isinstance(self.value, str):
+                continue
+            hit = (column == self.value).to_numpy()
+            if not hit.any():
+                continue
+            column = column.where(~hit)
+            if numeric and column.dtype == np.float64:
+                column = column.astype(np.float32)
+            updates[c] = column
+        return None, updates
+
+
+class Required(Rule):
+
+    def __init__(self, column):
+        self.column = column
+        self.name = 'required ' + column
+
+    def apply(self, get):
+        return get(self.column).notna().to_numpy(), {}
+
+
+def within(values, low, high, inclusive):
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        if inclusive:
+            return (values >= low) & (values <= high)
+        return (values > low) & (values < high)
+
+
+class Range(Rule):
+    """Rows outside of range are dropped (NaN too) or the value is set missing"""
+
+    def __init__(self, column, low=-np.inf, high=np.inf, inclusive=True, action=DROP):
+        self.column = column
+        self.low = low
+        self.high = high
+        self.inclusive = inclusive
+        self.action = action
+        self.name = 'range {} {}'.format(column, action)
+
+    def apply(self, get):
+        column = get(self.column)
+        inside = within(column, self.low, self.high, self.inclusive)
+        if self.action == DROP:
+            return inside, {}
+        return None, {self.column: column.where(inside | column.isna().to_numpy())}
+
+    def limits(self):
+        return [{
+            'feature': self.column,
+            'low': None if np.isinf(self.low) else self.low,
+            'high': None if np.isinf(self.high) else self.high,
+            'inclusive': self.inclusive,
+            'action': self.action,
+        }]
+
+
+class Keep(Rule):
+    """Values other than listed ones are set missing"""
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = list(values)
+        self.name = 'keep ' + column
+
+    def apply(self, get):
+        column = get(self.column)
+        return None, {self.column: column.where(column.isin(self.values))}
+
+
+class Null(Rule):
+    """Listed values are set missing"""
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = list(values)
+        self.name = 'null ' + column
+
+    def apply(self, get):
+        column = get(self.column)
+        return None, {self.column: column.where(~column.isin(self.values))}
+
+
+class Flag(Rule):
+    """Column becomes 1 where any value is present, 0 otherwise"""
+
+    def __init__(self, column):
+        self.column = column
+        self.name = 'flag ' + column
+
+    def apply(self, get):
+        return None, {self.column: get(self.column).notna().astype(np.int8)}
+
+
+class Outliers(Rule):
+    """Drops rows outside of Tukey fences q1 - k*IQR, q3 + k*IQR learned from rows kept by previous rules.
+    With by the fences are learned per group, groups smaller than min_rows use fences of whole column."""
+
+    def __init__(self, column, k=3, by=None, min_rows=30):
+        self.column = column
+        self.k = k
+        self.by = by
+        self.min_rows = min_rows
+        self.low = -np.inf
+        self.high = np.inf
+        self.groups = {}
+        self.name = 'outliers ' + column + (' by ' + by if by else '')
+
+    def fences(self, q1, q3):
+        return q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1)
+
+    def fit(self, get, mask):
+        values = get(self.column)[mask]
+        self.low, self.high = self.fences(values.quantile(0.25), values.quantile(0.75))
+
+        self.groups = {}
+        if self.by:
+            groups = get(self.by)[mask]
+            grouped = values.groupby(groups, observed=True)
+            q = grouped.quantile([0.25, 0.75]).unstack()
+            for group, count in grouped.count().items():
+                if count >= self.min_rows:
+                    self.groups[str(group)] = self.fences(float(q.loc[group, 0.25]), float(q.loc[group, 0.75]))
+
+    def bounds(self, get):
+        "Low and high bound of every row"
+        n = len(get(self.column))
+        low = np.full(n, self.low)
+        high = np.full(n, self.high)
+        if self.groups:
+            groups = get(self.by).astype(object).to_numpy()
+            for group, (group_low, group_high) in self.groups.items():
+                rows = groups == group
+                low[rows] = group_low
+                high[rows] = group_high
+        return low, high
+
+    def apply(self, get):
+        column = get(self.column)
+        low, high = self.bounds(get)
+        return within(column, low, high, True) | column.isna().to_numpy(), {}
+
+    def limits(self):
+        return [{
+            'feature': self.column,
+            'low': float(self.low),
+            'high': float(self.high),
+            'inclusive': True,
+            'action': DROP,
+            'by': self.by,
+            'groups': {g: [float(low), float(high)] for g, (low, high) in self.groups.items()},
+        }]
+
+
+class Columns:
+    """Current values of columns, updated columns shadow the original frame"""
+
+    def __init__(self, data):
+        self.data = data
+        self.updated = {}
+        self.dropped = set()
+
+    def __call__(self, column):
+        if column in self.updated:
+            return self.updated[column]
+        return self.data[column]
+
+    def columns(self):
+        return [(c, self(c)) for c in self.data.columns if c not in self.dropped]
+
+
+class Cleaner:
+    """Applies rules in one pass, removed holds number of rows removed by each rule"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.removed = {}
+
+    def clean(self, data, fit=True):
+        get = Columns(data)
+        mask = np.ones(len(data), dtype=bool)
+        self.removed = {}
+
+        for rule in self.rules:
+            if fit:
+                rule.fit(get, mask)
+
+            keep, updates = rule.apply(get)
+            if keep is not None:
+                self.removed[rule.name] = int((mask & ~keep).sum())
+                mask &= keep
+
+            get.updated.update(updates)
+            get.dropped.update(rule.drop)
+
+        # ponechane riadky sa vyberu naraz, kazdy stlpec sa skopiruje iba raz
+        cleaned = {}
+        for c, column in get.columns():
+            column = column[mask]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.cat.remove_unused_categories()
+            cleaned[c] = column
+
+        return pd.DataFrame(cleaned, index=data.index[mask])
+
+    def limits(self, features):
+        return [limit for rule in self.rules for limit in rule.limits() if limit['feature'] in features]
@@ -0,0 +1,72 @@
+"""
+Index porovnatelnych inzeratov pre endpoint /comparables. Kazdy inzerat je bod v priestore polohy, uzitkovej plochy,
+poctu izieb a roku vystavby. Suradnice su v km a kazdy rozmer je vydeleny svojou mierkou, takze vzdialenost 1 znamena
+napr. 1 km alebo 10 m2. Index sa ulozi s modelom ako kompaktne polia a drzi iba najnovsich max_rows inzeratov, aby
+pamat servingu nerastla s tabulkou.
+"""
+import math
+
+import numpy as np
+
+FEATURES = ['latitude', 'longitude', 'uzit_plocha', 'pocet_izieb', 'rok_vystavby']
+# bez polohy a plochy inzerat nema zmysel porovnavat, ostatne chybajuce hodnoty sa doplnia medianom
+REQUIRED = ['latitude', 'longitude', 'uzit_plocha']
+KM_PER_DEGREE = 111.32
+
+
+class ComparablesIndex:
+    """Scaled feature points of newest listings together with what is shown to the user"""
+
+    def __init__(self, scale, max_rows):
+        # {feature: mierka}, poloha ma mierku 'km'
+        self.scale = scale
+        self.max_rows = max_rows
+
+    def fit(self, data, listings):
+        "data are cleaned rows, listings their zdroj, id and timestamp with the same index"
+        data = data.dropna(subset=REQUIRED)
+        listings = listings.loc[data.index]
+        if len(data) > self.max_rows:
+            newest = listings['timestamp'].sort_values(ascending=False).index[:self.max_rows]
+            data, listings = data.loc[newest], listings.loc[newest]
+
+        values = {f: data[f].to_numpy(dtype=np.float64) for f in FEATURES}
+
+        lat_mid = np.median(values['latitude'])
+        scale = {
+            'latitude': self.scale['km'] / KM_PER_DEGREE,
+            'longitude': self.scale['km'] / (KM_PER_DEGREE * math.cos(math.radians(lat_mid))),
+        }
+        scale.update({f: self.scale[f] for f in FEATURES if f not in scale})
+
+        self.offset = np.array([np.nanmedian(values[f]) for f in FEATURES])
+        self.feature_scale = np.array([scale[f] for f in FEATURES])
+
+        # body po stlpcoch, dotaz prechadza kazdy rozmer ako suvisle pole
+        self.points = np.empty((len(FEATURES), len(data)), dtype=np.float32)
+        for d, f in enumerate(FEATURES):
+            column = values[f]
+            self.points[d] = (np.where(np.isnan(column), self.offset[d], column) - self.offset[d]) / scale[f]
+
+        self.values = np.vstack([values[f] for f in FEATURES]).astype(np.float32)
+        self.cena = data['cena'].to_numpy(dtype=np.float32)
+        self.zdroj_values, self.zdroj = np.unique(listings['zdroj'].astype(str).to_numpy(dtype=str), return_inverse=True)
+        self.ids = np.char.encode(listings['id'].astype(str).to_numpy(dtype=str), 'utf-8')
+        return self
+
+    def __len__(self):
+        return self.points.shape[1]
+
+    def save(self, path):
+        np.savez(
+            path,
+            features=np.array(FEATURES),
+            offset=self.offset,
+            scale=self.feature_scale,
+            points=self.points,
+            values=self.values,
+            cena=self.cena,
+            zdroj_values=self.zdroj_values,
+            zdroj=self.zdroj.astype(np.int32),
+            ids=self.ids,
+        )
@@ -20,7 +20,23 @@ class Database:
         self.cursor.execute(query, args)
         return self.cursor.fetchall()
 
-    def execute(self, query):
-        self.cursor.execute(query,)
+    def execute(self, query, args=()):
+        self.cursor.execute(query, args)
         self.cnx.commit()
         return self.cursor.rowcount
+
+    def rollback(self):
+        self.cnx.rollback()
+
+    def execute_many(self, query, rows, batch_size=100):
+        "Execute query for all rows in one transaction, returns number of affected rows"
+        rowcount = 0
+        try:
+            for i in range(0, len(rows), batch_size):
+                self.cursor.executemany(query, rows[i:i + batch_size])
+                rowcount += self.cursor.rowcount
+            self.cnx.commit()
+        except Exception:
+            self.cnx.rollback()
+            raise
+        return rowcount
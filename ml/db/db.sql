@@ -27,8 +27,38 @@ CREATE TABLE `zakolko`.`inzeraty` (
         `balkon` VARCHAR(100),
         `garazove_statie` VARCHAR(100),
         `garaz` VARCHAR(100),
-        `timestamp` timestamp,
-        PRIMARY KEY (`zdroj`,`id`)
+        `timestamp` timestamp NULL,
+        -- cas posledneho insertu alebo zmeny riadku, podla neho sa synchronizuje snapshot pipeline
+        `updated` timestamp DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (`zdroj`,`id`),
+        KEY (`updated`)
+) ENGINE=InnoDB CHARSET='utf8';
+
+-- existujuca tabulka:
+-- ALTER TABLE `zakolko`.`inzeraty` MODIFY `timestamp` timestamp NULL,
+--     ADD COLUMN `updated` timestamp DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, ADD KEY (`updated`);
+
+-- zdielany frontier crawlu, scraper.py worker procesy si z neho prenajimaju stranky a inzeraty
+CREATE TABLE `zakolko`.`frontier` (
+        `id` BIGINT AUTO_INCREMENT,
+        `crawl` VARCHAR(32) NOT NULL,
+        `kind` ENUM('page', 'inzerat') NOT NULL,
+        `url` TEXT NOT NULL,
+        `url_sha` CHAR(40) NOT NULL,
+        `region` VARCHAR(100) NOT NULL,
+        `pager` SMALLINT,
+        `seen_pages` TINYINT NOT NULL DEFAULT 0,
+        `state` ENUM('pending', 'leased', 'done', 'failed') NOT NULL DEFAULT 'pending',
+        `attempts` TINYINT NOT NULL DEFAULT 0,
+        `leased_by` VARCHAR(100),
+        `lease_token` CHAR(32),
+        `lease_until` DATETIME,
+        `error` VARCHAR(255),
+        `updated` timestamp DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (`id`),
+        UNIQUE KEY (`crawl`, `url_sha`),
+        KEY (`state`, `kind`, `id`),
+        KEY (`lease_token`)
 ) ENGINE=InnoDB CHARSET='utf8';
 
 CREATE USER 'scraper'@'localhost' IDENTIFIED BY 'password';
@@ -0,0 +1,196 @@
+"""
+Extrakcia udajov z HTML stranok portalu. Backend je volitelny: povodny BeautifulSoup s html.parser, alebo rychlejsi
+lxml s predkompilovanymi XPath selektormi. Oba vracaju rovnaky inzerat_info dict.
+"""
+import re
+import json
+import logging
+import unicodedata
+
+log = logging.getLogger()
+
+INZERAT_HREF = re.compile(r'\.sk/(\d){7}')
+
+
+def strip_accents(text):
+    try:
+        text = unicode(text, 'utf-8')
+    except NameError: # unicode is a default on python 3
+        pass
+
+    text = unicodedata.normalize('NFD', text)\
+           .encode('ascii', 'ignore')\
+           .decode("utf-8")
+
+    return str(text)
+
+def normalize_info(inzerat_info):
+    for key, value in inzerat_info.items():
+        if isinstance(value, str):
+            inzerat_info[key] = strip_accents(value).strip()
+    return inzerat_info
+
+def add_location(inzerat_info, location_text):
+    location_text = location_text.replace('\n', '').split(',')
+    inzerat_info['Okres'] = location_text[-1].strip()
+    inzerat_info['Mesto'] = location_text[-2].strip()
+
+    try:
+        inzerat_info['Ulica'] = location_text[-3].strip()
+    except (KeyError, IndexError):
+        pass
+
+def add_extra_params(inzerat_info, tags, get_text):
+    for t in tags:
+        try:
+            k, v = str(get_text(t)).replace('\n','').split(':')
+        except ValueError:
+            log.error(t)
+            continue
+        inzerat_info[k] = v.strip()
+
+def add_gps(inzerat_info, gps_div):
+    gps_info = json.loads(gps_div)
+    inzerat_info['lat'] = gps_info['gpsLatitude']
+    inzerat_info['lon'] = gps_info['gpsLongitude']
+
+
+class Bs4Extractor:
+    """Pure Python BeautifulSoup html.parser backend"""
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.soup = BeautifulSoup
+
+    def parse(self, text):
+        return self.soup(text, "html.parser")
+
+    def get_links(self, text):
+        "Find links to each inzerat in page. Usually there 30 inzerats on single page"
+        inzeraty = self.parse(text).find_all('a', href=INZERAT_HREF)
+        inzeraty = [inzerat['href'] for inzerat in inzeraty]
+        return list(set(inzeraty))
+
+    def get_info(self, text):
+        body = self.parse(text)
+
+        inzerat_info = {}
+
+        head_div = body.find('div', {'class': 'sub--head'})
+
+        info_div = head_div.find('div', {'class': 'parameter--info'})
+        divTag = info_div.findAll('div')
+        for t in divTag:
+            k, v = str(t.get_text()).split(':')
+            inzerat_info[k] = v
+
+        location_div = head_div.find('span', {'class': 'top--info-location'})
+        add_location(inzerat_info, location_div.get_text())
+
+        cena_div = head_div.find('div', {'class': 'price--main paramNo0'})
+        inzerat_info['Cena'] = cena_div.get_text().strip()
+
+        addit_div = body.find('div', {'class': 'parameters--extra mt-4 mb-5'})
+
+        if addit_div:
+            divTag = addit_div.find('div', {'id': 'additional-features-modal-button'})
+            add_extra_params(inzerat_info, divTag.findAll('div'), lambda t: t.get_text())
+
+        button_div = body.find('ul', {'class': 'row m-0'})
+
+        if button_div:
+            divTag = button_div.find_all('div', {'class': 'additional-features--item'})
+            add_extra_params(inzerat_info, divTag, lambda t: t.get_text())
+
+        add_gps(inzerat_info, body.find('div', {'id': 'map-detail'}).attrs['data-gps-marker'])
+
+        return normalize_info(inzerat_info)
+
+
+def has_class(name):
+    "XPath predicate with BeautifulSoup class semantics, single class token or exact class attribute"
+    if ' ' in name:
+        return "normalize-space(@class)='{}'".format(name)
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(name)
+
+
+class LxmlExtractor:
+    """libxml2 parser with XPath selectors compiled once, much faster than html.parser"""
+
+    def __init__(self):
+        from lxml import etree, html
+        self.html = html
+        self.ParserError = etree.ParserError
+
+        self.links = etree.XPath('//a/@href')
+        self.head = etree.XPath("(//div[{}])[1]".format(has_class('sub--head')))
+        self.info = etree.XPath("(.//div[{}])[1]".format(has_class('parameter--info')))
+        self.divs = etree.XPath('.//div')
+        self.location = etree.XPath("(.//span[{}])[1]".format(has_class('top--info-location')))
+        self.cena = etree.XPath("(.//div[{}])[1]".format(has_class('price--main paramNo0')))
+        self.addit = etree.XPath("(//div[{}])[1]".format(has_class('parameters--extra mt-4 mb-5')))
+        self.modal = etree.XPath("(.//div[@id='additional-features-modal-button'])[1]")
+        self.button = etree.XPath("(//ul[{}])[1]".format(has_class('row m-0')))
+        self.items = etree.XPath(".//div[{}]".format(has_class('additional-features--item')))
+        self.gps = etree.XPath("(//div[@id='map-detail'])[1]")
+
+    def select(self, selector, element):
+        # chybajuci element skonci AttributeError rovnako ako pri BeautifulSoup
+        if element is None:
+            raise AttributeError('Element not found')
+        return selector(element)
+
+    def first(self, selector, element):
+        found = self.select(selector, element)
+        return found[0] if found else None
+
+    def parse(self, text):
+        # prazdna stranka (aj iba biele znaky) skonci AttributeError rovnako ako pri BeautifulSoup
+        try:
+            return self.html.document_fromstring(text)
+        except self.ParserError as e:
+            raise AttributeError('Empty page: {}'.format(e))
+
+    def get_links(self, text):
+        try:
+            doc = self.parse(text)
+        except AttributeError:
+            return []
+        return list({href for href in self.links(doc) if INZERAT_HREF.search(href)})
+
+    def get_info(self, text):
+        doc = self.parse(text)
+
+        inzerat_info = {}
+
+        head_div = self.first(self.head, doc)
+
+        for t in self.select(self.divs, self.first(self.info, head_div)):
+            k, v = str(t.text_content()).split(':')
+            inzerat_info[k] = v
+
+        add_location(inzerat_info, self.first(self.location, head_div).text_content())
+
+        inzerat_info['Cena'] = self.first(self.cena, head_div).text_content().strip()
+
+        addit_div = self.first(self.addit, doc)
+        if addit_div is not None:
+            modal_div = self.first(self.modal, addit_div)
+            add_extra_params(inzerat_info, self.select(self.divs, modal_div), lambda t: t.text_content())
+
+        button_div = self.first(self.button, doc)
+        if button_div is not None:
+            add_extra_params(inzerat_info, self.items(button_div), lambda t: t.text_content())
+
+        add_gps(inzerat_info, self.first(self.gps, doc).attrib['data-gps-marker'])
+
+        return normalize_info(inzerat_info)
+
+
+EXTRACTORS = {
+    'bs4': Bs4Extractor,
+    'lxml': LxmlExtractor,
+}
+
+def make_extractor(backend):
+    return EXTRACTORS[backend]()
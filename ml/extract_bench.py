@@ -0,0 +1,47 @@
+"""
+Meranie throughputu parsovania extraction backendov nad ulozenymi HTML strankami inzeratov. Zhodu backendov
+pole po poli overuje tests/ml/test_extract.py nad fixtures/pages.
+
+Pouzitie: python extract_bench.py [adresar s .html strankami] [pocet opakovani]
+"""
+import os
+import sys
+import time
+
+from extract import EXTRACTORS
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+
+def extract_or_error(extractor, text):
+    try:
+        return extractor.get_info(text)
+    except Exception as e:
+        return type(e).__name__
+
+
+def benchmark(extractor, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, text in pages:
+            extract_or_error(extractor, text)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else FIXTURES
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                pages.append((name, f.read()))
+
+    extractors = {backend: make() for backend, make in EXTRACTORS.items()}
+
+    print('{} pages'.format(len(pages)))
+    for backend, extractor in extractors.items():
+        print('{}: {:.1f} pages/s'.format(backend, benchmark(extractor, pages, repeat)))
@@ -0,0 +1,95 @@
+"""
+Paralelne stahovanie stranok pre scraper. Slusnost voci portalu zabezpecuje token bucket pre kazdy host a retry
+s exponencialnym backoffom, nie nahodny sleep pred kazdym requestom. Spojenia su drzane v pooli (keep-alive).
+"""
+import time
+import random
+import threading
+
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Allows rate requests per second on average with bursts up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Fetcher:
+    """Thread pool of pooled keep-alive connections with per host rate limit and retries"""
+
+    def __init__(self, rate, burst, workers, max_retries=3, backoff=2, timeout=60):
+        self.rate = rate
+        self.burst = burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def get(self, url, headers=None):
+        "GET url with rate limit, retry connection errors and retryable status codes with exponential backoff"
+        bucket = self.bucket(url)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt + random.uniform(0, 1))
+                continue
+
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                return response
+
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                time.sleep(int(retry_after))
+            else:
+                time.sleep(self.backoff * 2 ** attempt + random.uniform(0, 1))
+
+        return response
+
+    def map(self, fn, items):
+        "Run fn over items in thread pool, results are in order of items"
+        return list(self.executor.map(fn, items))
@@ -0,0 +1,121 @@
+"""
+Zdielany frontier crawlu v tabulke frontier vedla inzeraty. Ulohy su stranky vysledkov vyhladavania a inzeraty,
+worker si ich prenajme na lease_seconds a potom oznaci ako hotove alebo zlyhane. Zlyhana uloha sa vrati do fronty,
+po max_attempts pokusoch ostane failed. Lease padnuteho workera vyprsi a ulohu prevezme iny worker, nic sa nestrati.
+Kazdy crawl ma vlastne id, ta ista url sa v nom zaradi iba raz.
+"""
+import time
+import uuid
+import hashlib
+import logging
+
+from dataclasses import dataclass
+
+from mysql.connector import Error as DBError, errorcode
+
+log = logging.getLogger()
+
+PAGE = 'page'
+INZERAT = 'inzerat'
+
+# workeri prenajimaju ulohy sucasne, lease pri cakani na zamok alebo deadlocku sa zopakuje a potom je prazdny
+LOCK_ERRORS = (errorcode.ER_LOCK_WAIT_TIMEOUT, errorcode.ER_LOCK_DEADLOCK)
+LOCK_RETRIES = 3
+LOCK_RETRY_SLEEP = 0.5
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    url: str
+    region: str
+    crawl: str
+    pager: int
+    seen_pages: int
+    attempts: int
+    token: str
+
+
+def url_sha(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+class Frontier:
+    """Queue of crawl jobs shared by scraper workers through the database"""
+
+    def __init__(self, db, worker, lease_seconds, max_attempts):
+        self.db = db
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def add(self, kind, urls, region, crawl, pager=None, seen_pages=0):
+        "Enqueue urls not yet queued in crawl, returns number of new jobs"
+        if not urls:
+            return 0
+        sql = ("INSERT IGNORE INTO frontier (`crawl`, `kind`, `url`, `url_sha`, `region`, `pager`, `seen_pages`) "
+               "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+        rows = [(crawl, kind, url, url_sha(url), region, pager, seen_pages) for url in urls]
+        return self.db.execute_many(sql, rows)
+
+    def lease(self, n):
+        "Lease up to n pending or expired jobs, lock wait timeout or deadlock is retried and then gives empty lease"
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return self.lease_jobs(n)
+            except DBError as e:
+                if e.errno not in LOCK_ERRORS:
+                    raise
+                self.db.rollback()
+                log.warning('Lease zlyhal na zamku ({}), pokus {}/{}'.format(e.errno, attempt + 1, LOCK_RETRIES + 1))
+                if attempt < LOCK_RETRIES:
+                    time.sleep(LOCK_RETRY_SLEEP * (attempt + 1))
+        return []
+
+    def lease_jobs(self, n):
+        "Pages first so that new inzeraty get queued early"
+        # vyprsany lease po poslednom pokuse sa uz neopakuje
+        self.db.execute(
+            "UPDATE frontier SET `state` = 'failed', `error` = 'lease expired', `lease_token` = NULL "
+            "WHERE `state` = 'leased' AND `lease_until` < NOW() AND `attempts` >= %s", (self.max_attempts,))
+
+        token = uuid.uuid4().hex
+        leased = self.db.execute(
+            "UPDATE frontier SET `state` = 'leased', `leased_by` = %s, `lease_token` = %s, "
+            "`lease_until` = NOW() + INTERVAL %s SECOND, `attempts` = `attempts` + 1 "
+            "WHERE `state` = 'pending' OR (`state` = 'leased' AND `lease_until` < NOW()) "
+            "ORDER BY `kind`, `id` LIMIT %s", (self.worker, token, self.lease_seconds, n))
+        if not leased:
+            return []
+
+        rows = self.db.select_all(
+            "SELECT `id`, `kind`, `url`, `region`, `crawl`, `pager`, `seen_pages`, `attempts` FROM frontier "
+            "WHERE `lease_token` = %s ORDER BY `kind`, `id`", (token,))
+        return [Job(*row, token=token) for row in rows]
+
+    def done(self, jobs):
+        self.finish(jobs, "`state` = 'done', `error` = NULL")
+
+    def fail(self, jobs, error):
+        "Return jobs to queue for retry, after max_attempts they stay failed"
+        self.finish(jobs, "`state` = IF(`attempts` >= %s, 'failed', 'pending'), `error` = %s",
+                    (self.max_attempts, error[:255]))
+
+    def finish(self, jobs, assignment, args=()):
+        # iba ulohy, ktorych lease worker stale drzi, prevzate ulohy uz patria inemu workerovi
+        for token in set(job.token for job in jobs):
+            ids = [job.id for job in jobs if job.token == token]
+            self.db.execute(
+                "UPDATE frontier SET {}, `lease_token` = NULL WHERE `lease_token` = %s AND `id` IN ({})".format(
+                    assignment, ', '.join(['%s'] * len(ids))), (*args, token, *ids))
+
+    def active(self):
+        "Number of pending and leased jobs, crawl is finished when there are none"
+        return self.db.select_one("SELECT COUNT(*) FROM frontier WHERE `state` IN ('pending', 'leased')")[0]
+
+    def prune(self, days):
+        "Delete finished jobs older than days, returns number of deleted rows"
+        return self.db.execute(
+            "DELETE FROM frontier WHERE `state` IN ('done', 'failed') AND `updated` < NOW() - INTERVAL %s DAY",
+            (days,))
@@ -0,0 +1,102 @@
+"""
+Priestorova mriezka cien. Oblast je rozdelena na pravidelne bunky, pre kazdu sa z okolia (stvorec 2*radius+1 buniek)
+spocita vyhladena cena za m2 a pocet inzeratov. Vyhladenie k celkovemu priemeru zabrani extremom v riedkych
+bunkach. Mriezka sa ulozi s modelom ako male polia a serving z nej cita features podla lat/lon v O(1).
+
+Trenovacie riadky dostanu hodnoty bez vlastnej ceny (leave-one-out), inak by feature obsahovala target.
+"""
+import math
+
+import numpy as np
+
+FEATURES = ['grid_cena_m2', 'grid_density']
+METERS_PER_DEGREE = 111320
+
+
+def box_sum(values, radius):
+    "Sum of values over (2*radius+1)^2 neighborhood of every cell via 2D cumulative sums"
+    padded = np.pad(values, radius + 1)[:-1, :-1]
+    cumulative = padded.cumsum(0).cumsum(1)
+    size = 2 * radius + 1
+    return (cumulative[size:, size:] - cumulative[:-size, size:] - cumulative[size:, :-size]
+            + cumulative[:-size, :-size])
+
+
+class PriceGrid:
+    """Smoothed price per m2 and listing density over neighborhood of each grid cell"""
+
+    def __init__(self, lat_range, lon_range, cell_m, radius, prior):
+        self.lat0 = lat_range[0]
+        self.lon0 = lon_range[0]
+        self.step_lat = cell_m / METERS_PER_DEGREE
+        self.step_lon = cell_m / (METERS_PER_DEGREE * math.cos(math.radians(sum(lat_range) / 2)))
+        self.shape = (int(math.ceil((lat_range[1] - lat_range[0]) / self.step_lat)),
+                      int(math.ceil((lon_range[1] - lon_range[0]) / self.step_lon)))
+        self.radius = radius
+        self.prior = prior
+
+    def cells(self, X):
+        "Flat cell index of every row, -1 outside of grid or without GPS"
+        lat = np.asarray(X['latitude'], dtype=np.float64)
+        lon = np.asarray(X['longitude'], dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            i = np.floor((lat - self.lat0) / self.step_lat)
+            j = np.floor((lon - self.lon0) / self.step_lon)
+            inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & (j < self.shape[1])
+        cells = np.full(len(lat), -1, dtype=np.int64)
+        cells[inside] = i[inside].astype(np.int64) * self.shape[1] + j[inside].astype(np.int64)
+        return cells
+
+    def price_m2(self, X, y):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            price = np.asarray(y, dtype=np.float64) / np.asarray(X['uzit_plocha'], dtype=np.float64)
+        price[~np.isfinite(price) | (price <= 0)] = np.nan
+        return price
+
+    def fit(self, X, y):
+        cells = self.cells(X)
+        price = self.price_m2(X, y)
+        known = (cells >= 0) & ~np.isnan(price)
+
+        size = self.shape[0] * self.shape[1]
+        count = np.bincount(cells[known], minlength=size).reshape(self.shape).astype(np.float64)
+        total = np.bincount(cells[known], weights=price[known], minlength=size).reshape(self.shape)
+
+        self.mean = float(price[known].mean())
+        self.count = box_sum(count, self.radius).ravel()
+        self.total = box_sum(total, self.radius).ravel()
+        return self
+
+    def smoothed(self, total, count):
+        return (total + self.prior * self.mean) / (count + self.prior)
+
+    def add_features(self, X, y=None):
+        "X with grid features appended, with y each row's own price is left out of its neighborhood"
+        cells = self.cells(X)
+        inside = cells >= 0
+
+        total = np.where(inside, self.total[cells], np.nan)
+        count = np.where(inside, self.count[cells], np.nan)
+
+        if y is not None:
+            price = self.price_m2(X, y)
+            own = inside & ~np.isnan(price)
+            total[own] -= price[own]
+            count[own] -= 1
+
+        return X.assign(**{
+            'grid_cena_m2': self.smoothed(total, count).astype(np.float32),
+            'grid_density': count.astype(np.float32),
+        })
+
+    def save(self, path):
+        np.savez(
+            path,
+            features=np.array(FEATURES),
+            lat0=self.lat0,
+            lon0=self.lon0,
+            step_lat=self.step_lat,
+            step_lon=self.step_lon,
+            grid_cena_m2=self.smoothed(self.total, self.count).reshape(self.shape).astype(np.float32),
+            grid_density=self.count.reshape(self.shape).astype(np.float32),
+        )
@@ -0,0 +1,55 @@
+"""
+Porovnanie reziie jedneho trialu pri tuningu. Povodne kazdy trial posielal pandas DataFrame do XGBRegressor.fit, ktory
+data zakazdym konvertoval a kvantizoval. Teraz sa float32 matice postavia raz v make_data_matrix a trialy ich zdielaju.
+Maly pocet kol zvyrazni reziu oproti samotnemu trenovaniu.
+
+Pouzitie: python matrix_bench.py [pocet trialov] [pocet kol]
+"""
+import sys
+import time
+
+import xgboost as xgb
+
+from pipeline import Pipeline, PipelineDB, booster_params, score_params, log
+
+PARAMS = {
+    'learning_rate': 0.1,
+    'max_depth': 6,
+    'min_child_weight': 1,
+    'colsample_bytree': 0.8,
+    'subsample': 0.9,
+}
+
+
+def dataframe_trial(pipe, rounds):
+    model = xgb.XGBRegressor(n_estimators=rounds, **booster_params(PARAMS))
+    model.fit(pipe.X_fit, pipe.y_fit, verbose=False)
+    model.predict(pipe.X_valid)
+
+def cached_trial(pipe, rounds):
+    score_params(PARAMS, rounds, (pipe.dfit, pipe.dvalid, None))
+
+def benchmark(trial, pipe, trials, rounds):
+    start = time.perf_counter()
+    for _ in range(trials):
+        trial(pipe, rounds)
+    return (time.perf_counter() - start) / trials * 1000
+
+
+if __name__ == '__main__':
+
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    pipe = Pipeline(PipelineDB(), log)
+    pipe.get_data()
+    pipe.clean_data()
+    pipe.make_dummies_from_cat()
+
+    start = time.perf_counter()
+    pipe.make_data_matrix()
+    print('matrices built once in {:.1f} ms'.format((time.perf_counter() - start) * 1000))
+
+    print('{} rows, {} features, {} trials x {} rounds'.format(len(pipe.X_fit), len(pipe.feature_names), trials, rounds))
+    print('DataFrame per trial: {:.1f} ms/trial'.format(benchmark(dataframe_trial, pipe, trials, rounds)))
+    print('cached matrices:     {:.1f} ms/trial'.format(benchmark(cached_trial, pipe, trials, rounds)))
@@ -3,17 +3,29 @@ Script urceny na natrenovanie modelu z dat. Kedze sa mi nechce rucne tunit hyper
 Ako metriku pouzivam MAE, lebo mi pride najlepsia pre nehnutelnosti.
 """
 import os
+import math
 import sys
+import json
 import pickle
+import shutil
+import time
+import hashlib
 import logging
 
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
 from db.Database import Database
+from snapshot import Snapshot
+from grid import PriceGrid, FEATURES as GRID_FEATURES
+from comparables import ComparablesIndex
+from cleaning import Cleaner, Drop, Missing, Required, Range, Keep, Null, Flag, Outliers, NULL
 
 import xgboost as xgb
 import pandas as pd
 import numpy as np
 
-from hyperopt import fmin, tpe, hp, STATUS_OK, Trials, space_eval
+from hyperopt import tpe, hp, base, STATUS_OK, Trials, space_eval
 from sklearn.metrics import mean_absolute_error
 from sklearn.model_selection import train_test_split
 
@@ -33,15 +45,273 @@ log.addHandler(stream_handler)
 
 EVALS = 2000
 
+# pocet paralelnych trialov, jadra sa delia medzi procesy a vlakna XGBoost v kazdom z nich
+SEARCH_WORKERS = int(os.environ.get('SEARCH_WORKERS', os.cpu_count()))
+XGB_JOBS = max(1, os.cpu_count() // SEARCH_WORKERS)
+# outlier je mimo q1 - k*IQR, q3 + k*IQR, hranice sa ucia zvlast pre kazdy druh bytu
+OUTLIER_K = 3
+OUTLIER_BY = 'druh'
+
+# priestorova mriezka cien, bunky GRID_CELL_M metrov, okolie GRID_RADIUS buniek, GRID_CELL_M = 0 ju vypne
+GRID_CELL_M = 250
+GRID_RADIUS = 2
+# vaha celkoveho priemeru pri vyhladeni ceny za m2 v riedkych bunkach
+GRID_PRIOR = 5
+GRID_LAT = (47.9, 48.4)
+GRID_LON = (16.5, 17.5)
+
+# index porovnatelnych inzeratov, vzdialenost 1 je 1 km alebo 10 m2 alebo 1 izba alebo 15 rokov vystavby
+COMPARABLES_SCALE = {'km': 1, 'uzit_plocha': 10, 'pocet_izieb': 1, 'rok_vystavby': 15}
+# pocet najnovsich inzeratov v indexe, ohranicuje pamat servingu
+COMPARABLES_MAX_ROWS = 100000
+
+# lokalny snapshot pouzivanych stlpcov, synchronizuje sa po castiach
+SNAPSHOT_DIR = './snapshot'
+SNAPSHOT_CHUNK_ROWS = 50000
+# kazda synchronizacia znova nacita riadky zmenene tolko sekund pred poslednou, zachyti neskoro commitnute zapisy
+SNAPSHOT_OVERLAP_SECONDS = 600
+
+# successive halving: kandidati dostanu MIN_ROUNDS kol, do dalsieho kola postupi najlepsia 1/ETA s ETA nasobkom kol
+MIN_ROUNDS = 50
+MAX_ROUNDS = 2000
+ETA = 3
+BRACKET_SIZE = 27
+EARLY_STOPPING_ROUNDS = 20
+# cast trenovacich dat na early stopping a porovnanie kandidatov, X_test ostava na finalne MAE
+VALID_SIZE = 0.1
+
+# hist so spolocnymi binmi, kvantily dat sa spocitaju raz pri stavbe matice a vsetky trialy ich zdielaju
+TREE_METHOD = 'hist'
+MAX_BIN = 256
+
+# inkrementalny update (pipeline.py incremental) pokracuje v boostingu najlepsieho modelu na inzeratoch novsich ako
+# jeho data, pri menej ako INCREMENTAL_MIN_ROWS novych inzeratoch model ostava
+INCREMENTAL_MIN_ROWS = 200
+INCREMENTAL_MAX_ROUNDS = 200
+# najnovsi podiel novych inzeratov, model sa na nom overi pred aj po update
+INCREMENTAL_HOLDOUT = 0.2
+# plne hladanie ak MAE na najnovsich inzeratoch prekroci MAE_DEGRADATION nasobok MAE modelu, PSI niektorej feature
+# prekroci DRIFT_PSI alebo posledne hladanie je starsie ako INCREMENTAL_MAX_AGE_DAYS
+MAE_DEGRADATION = 1.15
+DRIFT_PSI = 0.2
+PSI_BINS = 10
+INCREMENTAL_MAX_AGE_DAYS = 7
+
+# hladanie meria aj latenciu predikcie jedneho riadku (median z LATENCY_ROWS) a velkost modelu, loss kandidata je
+# MAE + LATENCY_COST * latencia v ms, teda kolko eur MAE je ochotny model zhorsit o 1 ms rychlejsiu predikciu.
+# LATENCY_BUDGET_MS > 0 je tvrdy limit, kandidat nad nim prehra s kazdym kandidatom v limite.
+LATENCY_COST = float(os.environ.get('LATENCY_COST', 100))
+LATENCY_BUDGET_MS = float(os.environ.get('LATENCY_BUDGET_MS', 0))
+LATENCY_ROWS = 50
+OVER_BUDGET_FACTOR = 10
+
+# priebezne ulozene trialy, prerusene hladanie pokracuje od nich
+TRIALS_FILE = './model/trials.pkl'
+
+CAT_COLUMNS = ['mesto','druh','stav', 'kurenie','energ_cert', 'vytah', 'garaz', 'garazove_statie']
+NUM_FEATURES = ['uzit_plocha', 'rok_vystavby', 'pocet_nadz_podlazi', 'pocet_izieb', 'podlazie']
+GPS_FEATURES = ['latitude', 'longitude']
+DRIFT_FEATURES = ['cena'] + NUM_FEATURES + GPS_FEATURES
+
+# model je adresar model_<mae> s tymito subormi, symlink best ukazuje na najlepsi
+BOOSTER_FILE = 'booster.json'
+MANIFEST_FILE = 'manifest.json'
+ENCODER_FILE = 'encoder.json'
+TREES_FILE = 'trees.npz'
+GRID_FILE = 'grid.npz'
+COMPARABLES_FILE = 'comparables.npz'
+
+# objective s identickou linkou, ich predikcia je base_score + suma listov
+IDENTITY_OBJECTIVES = ['reg:squarederror', 'reg:linear', 'reg:absoluteerror', 'reg:pseudohubererror']
+# pocet riadkov X_test ulozenych s exportom stromov, app podla nich overi zhodu s XGBoost
+PARITY_ROWS = 100
+
+
+def file_checksum(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def make_matrix(X, y, feature_names, ref=None):
+    "Training matrix in float32, quantized once when QuantileDMatrix is available"
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    if hasattr(xgb, 'QuantileDMatrix'):
+        return xgb.QuantileDMatrix(X, label=y, feature_names=feature_names, max_bin=MAX_BIN, ref=ref)
+    return xgb.DMatrix(X, label=y, feature_names=feature_names)
+
+# trenovacie matice v procese workera, postavene raz pri jeho starte
+search_matrices = None
+
+def init_search_worker(X_fit, y_fit, X_valid, y_valid, feature_names):
+    global search_matrices
+    dfit = make_matrix(X_fit, y_fit, feature_names)
+    # latenciu meria rodic, paralelne trenujuci workeri by ju skreslili
+    search_matrices = (dfit, make_matrix(X_valid, y_valid, feature_names, ref=dfit), None)
+
+def booster_params(params, **extra):
+    params = {k: v.item() if hasattr(v, 'item') else v for k, v in params.items() if k != 'n_estimators'}
+    return dict(params, tree_method=TREE_METHOD, max_bin=MAX_BIN, **extra)
+
+def measure_model(booster, rows):
+    "Median latency of single row prediction in ms and size of saved model in bytes"
+    booster.inplace_predict(rows[:1])
+    latencies = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        booster.inplace_predict(rows[i:i + 1])
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000, len(booster.save_raw())
+
+def objective(mae, latency_ms):
+    "Search loss, MAE plus price of latency, candidates over latency budget lose to any candidate within it"
+    loss = mae + LATENCY_COST * latency_ms
+    if LATENCY_BUDGET_MS and latency_ms > LATENCY_BUDGET_MS:
+        loss *= OVER_BUDGET_FACTOR
+    return loss
+
+def score_params(params, rounds, matrices=None, keep_model=False):
+    """Train candidate for at most rounds boosting rounds with early stopping, loss is best validation MAE with
+    latency of early stopped model, matrices without latency rows skip the measurement. With keep_model the early
+    stopped model is returned in result as bytes, so that latency can be measured elsewhere"""
+    dfit, dvalid, rows = matrices if matrices is not None else search_matrices
+
+    history = {}
+    booster = xgb.train(booster_params(params, eval_metric='mae', nthread=XGB_JOBS), dfit, rounds,
+                        evals=[(dvalid, 'valid')], early_stopping_rounds=EARLY_STOPPING_ROUNDS, evals_result=history,
+                        verbose_eval=False)
+
+    mae = history['valid']['mae']
+    best_iteration = int(np.argmin(mae))
+
+    latency_ms, size_bytes = 0, 0
+    if rows is not None:
+        latency_ms, size_bytes = measure_model(booster[:best_iteration + 1], rows)
+
+    result = {
+        'loss': objective(float(mae[best_iteration]), latency_ms),
+        'status': STATUS_OK,
+        'mae': float(mae[best_iteration]),
+        'latency_ms': latency_ms,
+        'size_bytes': size_bytes,
+        'n_estimators': best_iteration + 1,
+        'rounds': rounds,
+        # early stopping skoncil pred limitom, viac kol by vysledok nezmenilo
+        'stopped': len(mae) < rounds,
+    }
+    if keep_model:
+        result['model'] = bytes(booster[:best_iteration + 1].save_raw())
+    return result
+
+def score_in_worker(params, rounds):
+    return score_params(params, rounds, keep_model=True)
+
+def add_latency(result, rows):
+    "Measure latency and size of model returned by search worker and update loss, model bytes are removed"
+    booster = xgb.Booster(model_file=bytearray(result.pop('model')))
+    booster.set_param({'nthread': XGB_JOBS})
+    result['latency_ms'], result['size_bytes'] = measure_model(booster, rows)
+    result['loss'] = objective(result['mae'], result['latency_ms'])
+    return result
+
+def pareto_front(results):
+    "Results not dominated in both MAE and latency, fastest first"
+    front = []
+    for result in sorted(results, key=lambda r: (r['latency_ms'], r['mae'])):
+        if not front or result['mae'] < front[-1]['mae']:
+            front.append(result)
+    return front
+
+def psi(expected, actual, bins=PSI_BINS):
+    "Population stability index of actual values against expected, bins are quantiles of expected, NaN is own bin"
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+
+    known = expected[~np.isnan(expected)]
+    edges = np.unique(np.quantile(known, np.linspace(0, 1, bins + 1)[1:-1])) if len(known) else np.array([])
+
+    def shares(values):
+        index = np.where(np.isnan(values), len(edges) + 1, np.searchsorted(edges, values, side='right'))
+        # prazdny bin by dal nekonecne PSI
+        return np.maximum(np.bincount(index, minlength=len(edges) + 2) / len(values), 1e-4)
+
+    e, a = shares(expected), shares(actual)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+def load_trials(path):
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return Trials()
+
+def save_trials(trials, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(trials, f)
+    os.replace(tmp_path, path)
+
+def make_cleaner():
+    return Cleaner([
+        Drop(['id', 'zdroj', 'timestamp', 'updated']),
+
+        # prilis malo nenulovych hodnot
+        Drop(['balkon', 'lodzia', 'verejne_parkovanie', 'orientacia', 'telkoint']),
+
+        # model zatial iba pre bratislavu
+        Drop(['okres']),
+
+        # ulicu zatial neviem vyuzit
+        Drop(['ulica']),
+
+        # cena za m2 nie vhoda feature, kedze ju neni mozne vypocitat z pozorovani
+        Drop(['cena_m2']),
+
+        # chybajuce hodnoty
+        Missing(-1),
+        Missing(''),
+
+        # drop riadkov kde cena je neznama/dohodu
+        Required('cena'),
+
+        # extremne ceny
+        Range('cena', 40000, 600000, inclusive=False),
+
+        # extremne hodnoty
+        Range('rok_vystavby', low=1900, action=NULL),
+        Range('podlazie', high=50, action=NULL),
+
+        Range('longitude', 16.5, 17.5, inclusive=False),
+        Range('latitude', 47.9, 48.4, inclusive=False),
+
+        Outliers('cena', OUTLIER_K, by=OUTLIER_BY),
+        Outliers('uzit_plocha', OUTLIER_K, by=OUTLIER_BY),
+
+        # normalizuj type kurenia
+        Keep('kurenie', ['Ustredne', 'Lokalne']),
+
+        Null('energ_cert', ['nema']),
+
+        Flag('garaz'),
+        Flag('garazove_statie'),
+    ])
+
 class PipelineDB(Database):
 
     def __init__(self):
         super().__init__()
 
-    def get_all_inzeraty(self):
-        sql = "SELECT * FROM inzeraty"
-        df = pd.read_sql(sql, con=self.cnx)
-        return df
+    def get_inzeraty_since(self, columns, column, since, chunksize):
+        "Stream selected columns of inzeraty with column at or after since (all when None) in chunks"
+        sql = "SELECT {} FROM inzeraty".format(', '.join('`{}`'.format(c) for c in columns))
+        params = ()
+        if since:
+            sql += " WHERE `{}` >= %s".format(column)
+            params = (since,)
+        sql += " ORDER BY `{}`".format(column)
+        return pd.read_sql(sql, con=self.cnx, params=params, chunksize=chunksize)
 
 
 class Pipeline():
@@ -52,67 +322,71 @@ class Pipeline():
         self.log = log
         self.data = None
         self.best = './model/best'
+        self.synced_to = None
+        self.searched_at = None
+        self.base_model = None
+        self.pareto = None
+        # pocet inkrementalnych updatov od plneho hladania a MAE posledneho z nich na najnovsich inzeratoch
+        self.updates = 0
+        self.holdout_mae = None
 
     def get_data(self):
-        self.data = self.db.get_all_inzeraty()
+        snapshot = Snapshot(SNAPSHOT_DIR, SNAPSHOT_OVERLAP_SECONDS)
 
-    def clean_data(self):
-
-        # replace missing with NaN
-        self.data  = self.data.replace({-1: None})
-        self.data  = self.data.replace({'': None})
-
-        self.data = self.data.drop(['id', 'zdroj', 'timestamp'], axis=1)
-
-        # prilis malo nenulovych hodnot
-        self.data = self.data.drop(['balkon', 'lodzia', 'verejne_parkovanie', 'orientacia', 'telkoint'], axis=1)
-
-        # model zatial iba pre bratislavu
-        self.data = self.data.drop(['okres'], axis=1)
-
-        # ulicu zatial neviem vyuzit
-        self.data = self.data.drop(['ulica'], axis=1)
-
-        # cena za m2 nie vhoda feature, kedze ju neni mozne vypocitat z pozorovani
-        self.data = self.data.drop(['cena_m2'], axis=1)
+        rows = snapshot.sync(self.db, SNAPSHOT_CHUNK_ROWS)
+        self.log.info('Snapshot synced, {} new rows until {}'.format(rows, snapshot.meta['synced_to']))
+        self.synced_to = snapshot.meta['synced_to']
 
-        # drop riadkov kde cena je neznama/dohodu
-        self.data = self.data[self.data['cena'].notna()]
-
-        # drop extremne ceny
-        self.data = self.data[600000 > self.data.cena]
-        self.data = self.data[40000 < self.data.cena]
-
-        # extremne hodnoty
-        #TODO: automaticka detekcia outlierov
-        self.data.loc[1900 > self.data.rok_vystavby, 'rok_vystavby'] = np.NaN
-        self.data.loc[50 < self.data.podlazie, 'podlazie'] = np.NaN
+        self.data = snapshot.load()
 
-        self.data = self.data[17.5 > self.data.longitude]
-        self.data = self.data[16.5 < self.data.longitude]
+    def clean_data(self):
 
-        self.data = self.data[48.4 > self.data.latitude]
-        self.data = self.data[47.9 < self.data.latitude]
+        self.cleaner = make_cleaner()
+        rows = len(self.data)
 
-        # normalizuj type kurenia
-        self.data.loc[~self.data.kurenie.isin(['Ustredne', 'Lokalne']), 'kurenie'] = None
+        cleaned = self.cleaner.clean(self.data)
+        # cistenie zahodi identifikaciu inzeratu, index porovnatelnych ju potrebuje
+        self.listings = self.data.loc[cleaned.index, ['zdroj', 'id', 'timestamp']]
+        self.data = cleaned
 
-        self.data.loc[self.data.energ_cert == 'nema', 'energ_cert'] = None
+        for rule, removed in self.cleaner.removed.items():
+            self.log.info('{}: {} rows removed'.format(rule, removed))
+        self.log.info('{} of {} rows kept'.format(len(self.data), rows))
 
-        self.data.loc[~self.data.garaz.isnull(), 'garaz'] = 1
-        self.data.loc[self.data.garaz.isnull(), 'garaz'] = 0
-
-        self.data.loc[~self.data.garazove_statie.isnull(), 'garazove_statie'] = 1
-        self.data.loc[self.data.garazove_statie.isnull(), 'garazove_statie'] = 0
+    def make_comparables(self):
+        self.comparables = ComparablesIndex(COMPARABLES_SCALE, COMPARABLES_MAX_ROWS).fit(self.data, self.listings)
+        self.log.info('Comparables index with {} listings'.format(len(self.comparables)))
 
     def make_dummies_from_cat(self):
 
-        cat_columns = ['mesto','druh','stav', 'kurenie','energ_cert', 'vytah', 'garaz', 'garazove_statie']
+        # povodne hodnoty kategorii, aby serving vedel namapovat vstup na one-hot stlpec
+        self.categories = {c: [str(v) for v in self.data[c].dropna().unique()] for c in CAT_COLUMNS}
 
-        self.data = pd.get_dummies(self.data, columns=cat_columns, prefix=cat_columns)
+        self.data = pd.get_dummies(self.data, columns=CAT_COLUMNS, prefix=CAT_COLUMNS)
 
         self.data.columns = self.data.columns.str.strip()
 
+    def make_grid(self):
+        return PriceGrid(GRID_LAT, GRID_LON, GRID_CELL_M, GRID_RADIUS, GRID_PRIOR)
+
+    def make_encoder(self):
+        "Spec of feature encoder used by app, keeps one-hot naming in one place"
+        index = {name: i for i, name in enumerate(self.X.columns)}
+
+        categories = {}
+        for c, values in self.categories.items():
+            categories[c] = {v: index[(c + '_' + v).strip()] for v in values if (c + '_' + v).strip() in index}
+
+        return {
+            'columns': list(self.X.columns),
+            'num_features': NUM_FEATURES,
+            'gps_features': GPS_FEATURES,
+            'categories': categories,
+            # rovnake hranice ako pri cisteni, serving podla nich validuje vstup
+            'limits': self.cleaner.limits(NUM_FEATURES + GPS_FEATURES),
+            'grid_features': GRID_FEATURES if self.grid else [],
+        }
+
     def make_data_matrix(self):
         self.y = self.data['cena']
 
@@ -120,84 +394,444 @@ class Pipeline():
 
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(self.X, self.y, test_size=0.1, random_state=123)
 
+        self.grid = None
+        if GRID_CELL_M:
+            # na vyhodnotenie mriezka iba z trenovacich dat, test nevidi vlastne ceny
+            grid = self.make_grid().fit(self.X_train, self.y_train)
+            self.X_train = grid.add_features(self.X_train, self.y_train)
+            self.X_test = grid.add_features(self.X_test)
+
+            # finalny model a serving pouzivaju mriezku zo vsetkych dat
+            self.grid = self.make_grid().fit(self.X, self.y)
+            self.X = self.grid.add_features(self.X, self.y)
+
+        self.X_fit, self.X_valid, self.y_fit, self.y_valid = train_test_split(self.X_train, self.y_train, test_size=VALID_SIZE, random_state=123)
+
+        # matice hladania sa postavia raz a zdielaju ich vsetky trialy, finalne matice az v train_model
+        self.feature_names = list(self.X.columns)
+        self.dfit = make_matrix(self.X_fit, self.y_fit, self.feature_names)
+        self.dvalid = make_matrix(self.X_valid, self.y_valid, self.feature_names, ref=self.dfit)
+        self.latency_rows = self.X_valid.head(LATENCY_ROWS).to_numpy(dtype=np.float32)
+
         self.space = {
             'learning_rate':    hp.choice('learning_rate',    np.arange(0.05, 0.5, 0.05)),
             'max_depth':        hp.choice('max_depth',        np.arange(2, 30, 1, dtype=int)),
             'min_child_weight': hp.choice('min_child_weight', np.arange(1, 8, 1, dtype=int)),
             'colsample_bytree': hp.choice('colsample_bytree', np.arange(0.3, 1, 0.1)),
             'subsample':        hp.uniform('subsample', 0.8, 1),
-            'n_estimators':     hp.choice('n_estimators',     np.arange(100, 2000, 100,dtype=int))
         }
 
-    def score(self, params):
-
-        model = xgb.XGBRegressor(**params)
+    def score(self, params, rounds):
+
+        result = score_params(params, rounds, (self.dfit, self.dvalid, self.latency_rows))
+
+        self.log.info('MAE {mae} latency {latency_ms:.3f} ms'.format(**result))
+
+        return result
+
+    def evaluate(self, pool, params, rounds):
+        if not pool:
+            return [self.score(p, rounds) for p in params]
+
+        results = list(pool.map(score_in_worker, params, [rounds] * len(params)))
+        # latencia sa meria az po davke, postupne v tomto procese, ked workeri nic netrenuju
+        for result in results:
+            add_latency(result, self.latency_rows)
+            self.log.info('MAE {mae} latency {latency_ms:.3f} ms'.format(**result))
+        return results
+
+    def halving(self, pool, params):
+        "Successive halving of one bracket, returns result of every candidate from its last evaluated budget"
+        results = [None] * len(params)
+        alive = list(range(len(params)))
+        # osamoteny kandidat nema s kym sutazit, rovno plny rozpocet s early stopping
+        rounds = MIN_ROUNDS if len(alive) > 1 else MAX_ROUNDS
+
+        while True:
+            todo = [i for i in alive if results[i] is None or not results[i]['stopped']]
+            for i, result in zip(todo, self.evaluate(pool, [params[i] for i in todo], rounds)):
+                results[i] = result
+
+            self.log.info('{} candidates with {} rounds, best loss {}'.format(
+                len(alive), rounds, min(results[i]['loss'] for i in alive)))
+
+            if rounds >= MAX_ROUNDS:
+                return results
+
+            alive = sorted(alive, key=lambda i: results[i]['loss'])[:max(1, len(alive) // ETA)]
+            rounds = min(MAX_ROUNDS, rounds * ETA) if len(alive) > 1 else MAX_ROUNDS
+
+    def suggest(self, domain, trials, rstate, n):
+        "Ask TPE for batch of n trials, suggestions are based on all finished trials"
+        new_ids = trials.new_trial_ids(n)
+        trials.refresh()
+        # po startup trialoch vrati tpe.suggest iba jeden doc, kazde id sa pyta zvlast s vlastnym seedom
+        docs = []
+        for tid in new_ids:
+            docs.extend(tpe.suggest([tid], domain, trials, int(rstate.integers(2 ** 31 - 1))))
+        # pri kratsej davke by sa docs a vysledky halvingu v record posunuli
+        if len(docs) != n:
+            raise RuntimeError('TPE suggested {} of {} trials'.format(len(docs), n))
+        params = [space_eval(self.space, {k: v[0] for k, v in doc['misc']['vals'].items() if v}) for doc in docs]
+        return docs, params
+
+    def record(self, trials, docs, results):
+        now = datetime.now()
+        for doc, result in zip(docs, results):
+            doc['state'] = base.JOB_STATE_DONE
+            doc['result'] = result
+            doc['book_time'] = doc['refresh_time'] = now
+        trials.insert_trial_docs(docs)
+        trials.refresh()
 
-        model.fit(self.X_train, self.y_train, verbose=False)
+    def optimize(self, trials, space):
 
-        Y_pred = model.predict(self.X_test)
+        domain = base.Domain(self.score, space)
+        rstate = np.random.default_rng()
 
-        score = mean_absolute_error(self.y_test, Y_pred)
+        if trials.trials:
+            self.log.info('Resuming search after {} trials'.format(len(trials.trials)))
 
-        self.log.info(score)
+        pool = None
+        if SEARCH_WORKERS > 1:
+            # DMatrix sa neda picklovat, worker si matice postavi raz z float32 poli
+            data = (self.X_fit.to_numpy(dtype=np.float32), self.y_fit.to_numpy(dtype=np.float32),
+                    self.X_valid.to_numpy(dtype=np.float32), self.y_valid.to_numpy(dtype=np.float32), self.feature_names)
+            pool = ProcessPoolExecutor(SEARCH_WORKERS, initializer=init_search_worker, initargs=data)
 
-        return {'loss': score, 'status': STATUS_OK}
+        try:
+            while len(trials.trials) < EVALS:
+                n = min(BRACKET_SIZE, EVALS - len(trials.trials))
+                docs, params = self.suggest(domain, trials, rstate, n)
 
-    def optimize(self, trials, space):
+                self.record(trials, docs, self.halving(pool, params))
+                save_trials(trials, TRIALS_FILE)
+        finally:
+            if pool:
+                pool.shutdown()
 
-        best = fmin(self.score, space, algo=tpe.suggest, max_evals=EVALS)
-        return best
+        return trials.argmin, trials.best_trial['result']['n_estimators']
 
     def find_best_model(self):
 
-        trials = Trials()
+        trials = load_trials(TRIALS_FILE)
 
-        best_params = self.optimize(trials, self.space)
+        best_params, n_estimators = self.optimize(trials, self.space)
 
         self.best_params = space_eval(self.space, best_params)
+        # pocet stromov urcil early stopping najlepsieho kandidata
+        self.best_params['n_estimators'] = n_estimators
 
         self.log.info(self.best_params)
+        self.searched_at = datetime.now().isoformat()
+
+        self.pareto = self.report_pareto(trials)
+        latency_ms = trials.best_trial['result'].get('latency_ms', 0)
+        if LATENCY_BUDGET_MS and latency_ms > LATENCY_BUDGET_MS:
+            self.log.warning('No candidate within latency budget {} ms, best has {:.3f} ms'.format(
+                LATENCY_BUDGET_MS, latency_ms))
+
+        # hladanie dobehlo, dalsi beh zacne nanovo
+        os.unlink(TRIALS_FILE)
+
+    def report_pareto(self, trials):
+        "Log and return MAE/latency Pareto front of finished trials"
+        results = []
+        for trial in trials.trials:
+            result = trial['result']
+            # trialy z behu pred meranim latencie
+            if 'latency_ms' not in result:
+                continue
+            vals = {k: v[0] for k, v in trial['misc']['vals'].items() if v}
+            params = {k: v.item() if hasattr(v, 'item') else v for k, v in space_eval(self.space, vals).items()}
+            results.append(dict(
+                {k: result[k] for k in ('loss', 'mae', 'latency_ms', 'size_bytes', 'n_estimators')}, params=params))
+
+        front = pareto_front(results)
+        for r in front:
+            self.log.info('Pareto MAE {:.0f} latency {:.3f} ms size {} kB trees {} max_depth {}'.format(
+                r['mae'], r['latency_ms'], r['size_bytes'] // 1024, r['n_estimators'], r['params']['max_depth']))
+        return front
 
     def train_model(self):
 
-        # overenie prenosu best_params
-        self.xg_reg = xgb.XGBRegressor(**self.best_params)
+        params = booster_params(self.best_params)
+        rounds = self.best_params['n_estimators']
+
+        # data hladania sa uvolnia skor, ako sa postavia finalne matice, v pamati je vzdy iba jedna sada
+        self.dfit = self.dvalid = None
+        self.X_fit = self.X_valid = self.y_fit = self.y_valid = None
 
-        self.xg_reg.fit(self.X_train, self.y_train, verbose=False)
+        # overenie prenosu best_params
+        dtrain = make_matrix(self.X_train, self.y_train, self.feature_names)
+        dtest = make_matrix(self.X_test, self.y_test, self.feature_names, ref=dtrain)
+        self.booster = xgb.train(params, dtrain, rounds)
 
-        Y_pred = self.xg_reg.predict(self.X_test)
+        Y_pred = self.booster.predict(dtest)
+        del dtrain, dtest
 
         self.mae = mean_absolute_error(self.y_test, Y_pred)
 
         self.log.info(self.mae)
 
-        self.log.info(sorted( ((v,k) for k,v in self.xg_reg.get_booster().get_score(importance_type='weight').items()), reverse=True))
+        self.log.info(sorted( ((v,k) for k,v in self.booster.get_score(importance_type='weight').items()), reverse=True))
 
         # pretrenuj finalny model na vsetkych datach
-        self.xg_reg = xgb.XGBRegressor(**self.best_params)
+        self.booster = xgb.train(params, make_matrix(self.X, self.y, self.feature_names), rounds)
+
+    def update_model(self):
+        """Continue boosting of best model on listings newer than its data and save the result. Returns reason why
+        full search is needed and whether its model should replace best regardless of MAE in best's name, reason is
+        None when model was updated or there was nothing to update."""
+        base_dir = os.path.realpath(self.best)
+        try:
+            with open(os.path.join(base_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return 'best model {} has no manifest'.format(base_dir), None
 
-        self.xg_reg.fit(self.X, self.y, verbose=False)
+        searched_at = manifest.get('searched_at') or manifest['trained_at']
+        if datetime.now() - datetime.fromisoformat(searched_at) > timedelta(days=INCREMENTAL_MAX_AGE_DAYS):
+            return 'last search {} is older than {} days'.format(searched_at, INCREMENTAL_MAX_AGE_DAYS), None
 
-    def save_model(self):
+        self.y = self.data['cena']
+        self.X = self.data.drop(['cena'], axis=1)
+
+        # model nepozna nove hodnoty kategorii, ich one-hot stlpce sa zahodia, ostatne features sa zmenit nesmu
+        columns = set(self.X.columns) | set(GRID_FEATURES if GRID_CELL_M else [])
+        dummies = tuple(c + '_' for c in CAT_COLUMNS)
+        changed = [c for c in set(manifest['feature_names']) ^ columns if not c.startswith(dummies)]
+        if changed:
+            # best model nezodpoveda aktualnym features
+            return 'features {} changed'.format(', '.join(sorted(changed))), True
+
+        # nove su inzeraty pridane po datach modelu, replay meni updated aj inzeratom, na ktorych sa model ucil
+        data_to = manifest.get('data_to') or manifest['trained_at']
+        timestamp = self.listings.loc[self.X.index, 'timestamp'].to_numpy()
+        new = timestamp > np.datetime64(pd.Timestamp(data_to))
+        if new.sum() < INCREMENTAL_MIN_ROWS:
+            self.log.info('{} new listings since {}, model {} is kept'.format(new.sum(), data_to, manifest['mae']))
+            return None, None
+
+        drift = {f: psi(self.data.loc[~new, f], self.data.loc[new, f]) for f in DRIFT_FEATURES}
+        self.log.info('PSI of {} new listings {}'.format(new.sum(), drift))
+        feature = max(drift, key=drift.get)
+        # MAE v nazve best modelu uz neplati pre nove data, model z plneho hladania ho nahradi
+        if drift[feature] > DRIFT_PSI:
+            return 'drift of {} PSI {:.3f}'.format(feature, drift[feature]), True
+
+        # najnovsie inzeraty su holdout, pred nimi early stopping cast, poradie podla timestamp
+        new_index = self.X.index[new][np.argsort(timestamp[new], kind='stable')]
+        holdout = int(math.ceil(len(new_index) * INCREMENTAL_HOLDOUT))
+        fit_index, holdout_index = new_index[:-holdout], new_index[-holdout:]
+        stop = int(math.ceil(len(fit_index) * INCREMENTAL_HOLDOUT))
+
+        X_eval = self.X
+        self.grid = None
+        if GRID_CELL_M:
+            # na vyhodnotenie mriezka bez holdoutu, holdout nevidi vlastne ceny
+            known = self.X.index.difference(holdout_index)
+            grid = self.make_grid().fit(self.X.loc[known], self.y.loc[known])
+            X_eval = pd.concat([grid.add_features(self.X.loc[known], self.y.loc[known]),
+                                grid.add_features(self.X.loc[holdout_index])])
+
+            # update modelu a serving pouzivaju mriezku zo vsetkych dat
+            self.grid = self.make_grid().fit(self.X, self.y)
+            self.X = self.grid.add_features(self.X, self.y)
+
+        X_eval = X_eval.reindex(columns=manifest['feature_names'], fill_value=0)
+        self.X = self.X.reindex(columns=manifest['feature_names'], fill_value=0)
+        self.feature_names = list(self.X.columns)
+
+        self.X_fit, self.y_fit = X_eval.loc[fit_index[:-stop]], self.y.loc[fit_index[:-stop]]
+        self.X_valid, self.y_valid = X_eval.loc[fit_index[-stop:]], self.y.loc[fit_index[-stop:]]
+        self.X_test, self.y_test = X_eval.loc[holdout_index], self.y.loc[holdout_index]
+
+        base_path = os.path.join(base_dir, BOOSTER_FILE)
+        dfit = make_matrix(self.X_fit, self.y_fit, self.feature_names)
+        dvalid = make_matrix(self.X_valid, self.y_valid, self.feature_names, ref=dfit)
+        dholdout = make_matrix(self.X_test, self.y_test, self.feature_names, ref=dfit)
+
+        base_booster = xgb.Booster(model_file=base_path)
+        base_mae = mean_absolute_error(self.y_test, base_booster.predict(dholdout))
+        self.log.info('Model {} MAE {} on {} newest listings'.format(manifest['mae'], base_mae, holdout))
+        if base_mae > manifest['mae'] * MAE_DEGRADATION:
+            return 'MAE degraded from {} to {}'.format(manifest['mae'], base_mae), True
+
+        self.best_params = dict(manifest['params'])
+        params = booster_params(self.best_params)
+
+        history = {}
+        booster = xgb.train(dict(params, eval_metric='mae'), dfit, INCREMENTAL_MAX_ROUNDS, evals=[(dvalid, 'valid')],
+                            early_stopping_rounds=EARLY_STOPPING_ROUNDS, evals_result=history, verbose_eval=False,
+                            xgb_model=base_path)
+        rounds = int(np.argmin(history['valid']['mae'])) + 1
+
+        # holdout neurcoval pocet kol, jeho MAE je nestranny odhad
+        updated = booster[:self.best_params['n_estimators'] + rounds]
+        mae = mean_absolute_error(self.y_test, updated.predict(dholdout))
+        if mae >= base_mae:
+            self.log.info('Continued boosting MAE {} does not improve {}, model is kept'.format(mae, base_mae))
+            return None, None
+
+        # MAE na najnovsich inzeratoch nie je porovnatelne s testom plneho hladania, v nazve ostava MAE base modelu
+        self.mae = manifest['mae']
+        self.holdout_mae = mae
+        self.updates = manifest.get('updates', 0) + 1
+        self.log.info('{} rounds added, MAE {} on newest listings'.format(rounds, self.holdout_mae))
+
+        # update modelu aj s holdoutom, rovnako ako finalny model pri plnom hladani
+        dnew = make_matrix(self.X.loc[new_index], self.y.loc[new_index], self.feature_names)
+        self.booster = xgb.train(params, dnew, rounds, xgb_model=base_path)
+        self.best_params['n_estimators'] += rounds
+        self.searched_at = searched_at
+        self.base_model = os.path.basename(base_dir)
+
+        self.save_model(promote=True)
+        return None, None
+
+    def export_trees(self, booster_path, trees_path):
+        "Flatten trees of saved booster into contiguous arrays for NumPy evaluator in app"
+        with open(booster_path) as f:
+            learner = json.load(f)['learner']
+
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES or learner['gradient_booster']['name'] != 'gbtree':
+            self.log.warning('Trees export not supported for {} objective'.format(objective))
+            return False
+
+        base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        for tree in learner['gradient_booster']['model']['trees']:
+            offset = len(feature)
+            roots.append(offset)
+            depth = [0] * len(tree['left_children'])
+
+            for node, (l, r) in enumerate(zip(tree['left_children'], tree['right_children'])):
+                if l == -1:
+                    # list ukazuje sam na seba, traverzovanie v nom ostane
+                    feature.append(0)
+                    threshold.append(0)
+                    left.append(offset + node)
+                    right.append(offset + node)
+                    default_left.append(True)
+                    value.append(tree['split_conditions'][node])
+                    continue
+
+                depth[l] = depth[r] = depth[node] + 1
+                max_depth = max(max_depth, depth[l])
+                feature.append(tree['split_indices'][node])
+                threshold.append(tree['split_conditions'][node])
+                left.append(offset + l)
+                right.append(offset + r)
+                default_left.append(bool(tree['default_left'][node]))
+                value.append(0)
+
+        parity_X = self.X_test.head(PARITY_ROWS).to_numpy(dtype=np.float32)
+        parity_y = self.booster.predict(xgb.DMatrix(parity_X, feature_names=list(self.X.columns)))
+
+        np.savez(
+            trees_path,
+            feature=np.array(feature, dtype=np.int32),
+            threshold=np.array(threshold, dtype=np.float32),
+            left=np.array(left, dtype=np.int32),
+            right=np.array(right, dtype=np.int32),
+            default_left=np.array(default_left, dtype=bool),
+            value=np.array(value, dtype=np.float32),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+            base_score=base_score,
+            parity_X=parity_X,
+            parity_y=parity_y,
+        )
+        return True
+
+    def make_manifest(self, booster_path):
+        latency_ms, size_bytes = measure_model(self.booster, self.X_test.head(LATENCY_ROWS).to_numpy(dtype=np.float32))
+        self.log.info('Model latency {:.3f} ms per row, size {} kB'.format(latency_ms, size_bytes // 1024))
+
+        return {
+            'feature_names': list(self.X.columns),
+            'mae': float(self.mae),
+            'latency_ms': latency_ms,
+            'size_bytes': size_bytes,
+            'trained_at': datetime.now().isoformat(),
+            'checksum': file_checksum(booster_path),
+            'params': {k: v.item() if hasattr(v, 'item') else v for k, v in self.best_params.items()},
+            # inkrementalny update pokracuje od inzeratov novsich ako data_to
+            'data_to': self.synced_to,
+            'searched_at': self.searched_at,
+            'base_model': self.base_model,
+            'updates': self.updates,
+            'holdout_mae': self.holdout_mae,
+            # MAE/latencia kandidatov hladania, z ktorych bol model vybrany
+            'pareto': self.pareto,
+        }
+
+    def save_model(self, promote=None):
+        "Save model directory and point best to it when promote is true, by default when MAE beats current best"
 
         best_model = os.path.basename(os.path.realpath(self.best))
         best_score = int(float(best_model.split('_')[-1]))
 
         new_model = 'model_{}'.format(str(int(self.mae)))
+        if self.updates:
+            # update ma MAE base modelu, meno sa od neho lisi poradim updatu
+            new_model = 'model_u{}_{}'.format(self.updates, str(int(self.mae)))
+        model_dir = os.path.join('model', new_model)
+
+        # model sa zapise do docasneho adresara a premenuje az ked je kompletny
+        tmp_dir = model_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        booster_path = os.path.join(tmp_dir, BOOSTER_FILE)
+        self.booster.save_model(booster_path)
+
+        # overenie, ze ulozeny booster je mozne nacitat
+        xgb.Booster(model_file=booster_path)
+
+        with open(os.path.join(tmp_dir, ENCODER_FILE), 'w') as f:
+            json.dump(self.make_encoder(), f)
+
+        manifest = self.make_manifest(booster_path)
+
+        if self.grid:
+            grid_path = os.path.join(tmp_dir, GRID_FILE)
+            self.grid.save(grid_path)
+            manifest['grid_checksum'] = file_checksum(grid_path)
 
-        pickle.dump(self.xg_reg, open('model/{}'.format(new_model), 'wb'))
+        comparables_path = os.path.join(tmp_dir, COMPARABLES_FILE)
+        self.comparables.save(comparables_path)
+        manifest['comparables_checksum'] = file_checksum(comparables_path)
 
-        if best_score <= self.mae:
+        trees_path = os.path.join(tmp_dir, TREES_FILE)
+        if self.export_trees(booster_path, trees_path):
+            manifest['trees_checksum'] = file_checksum(trees_path)
+
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(model_dir, ignore_errors=True)
+        os.rename(tmp_dir, model_dir)
+
+        if promote is None:
+            promote = self.mae < best_score
+        if not promote:
             self.log.info('New score {} is higher than present lowest {} score!'.format(self.mae, best_score))
             return
 
-        try:
-            os.unlink(self.best)
-
-        except FileNotFoundError:
+        if not os.path.islink(self.best):
             self.log.warning('No best soft link was found!')
 
-        os.symlink(new_model, './model/best')
+        # atomicka vymena symlinku, serving nikdy nevidi chybajuci best
+        tmp_link = self.best + '.tmp'
+        if os.path.lexists(tmp_link):
+            os.unlink(tmp_link)
+        os.symlink(new_model, tmp_link)
+        os.replace(tmp_link, self.best)
 
     def run_pipeline(self):
 
@@ -207,6 +841,8 @@ class Pipeline():
 
         self.clean_data()
 
+        self.make_comparables()
+
         self.make_dummies_from_cat()
 
         self.make_data_matrix()
@@ -219,10 +855,41 @@ class Pipeline():
 
         self.log.info('Pipeline finished!')
 
+    def run_incremental(self):
+
+        self.log.info('Incremental update started!')
+
+        self.get_data()
+
+        self.clean_data()
+
+        self.make_comparables()
+
+        self.make_dummies_from_cat()
+
+        reason, replace = self.update_model()
+
+        if reason:
+            self.log.info('Full search needed: {}'.format(reason))
+
+            self.make_data_matrix()
+
+            self.find_best_model()
+
+            self.train_model()
+
+            # pri drifte a degradacii sa MAE v nazve best modelu neda porovnat
+            self.save_model(promote=replace)
+
+        self.log.info('Incremental update finished!')
+
 
 if __name__ == '__main__':
 
     pipe_db = PipelineDB()
 
     pipe = Pipeline(pipe_db, log)
-    pipe.run_pipeline()
+    if sys.argv[1:] == ['incremental']:
+        pipe.run_incremental()
+    else:
+        pipe.run_pipeline()
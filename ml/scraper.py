@@ -1,27 +1,73 @@
 """
 Script urceny na scrapovanie vybranej stranky s nehnutelnostami. Sparsovane data su potom ukladane vo forme recordu do DB.
 """
+import os
 import re
 import sys
 import time
-import json
+import socket
 import logging
-import random
 import requests
-import unicodedata
+import multiprocessing
 
-from bs4 import BeautifulSoup
 from datetime import datetime
-from dataclasses import asdict
+from dataclasses import asdict, fields
+
+from mysql.connector import Error as DBError
 
 from inzerat import Inzerat
+from seen import SeenInzeraty
+from fetcher import Fetcher
+from extract import make_extractor
+from archive import PageArchive, ArchivedResponse, read_text
+from checkpoint import Checkpoint, CrawlStats
+from frontier import Frontier, PAGE, INZERAT
 from db.Database import Database
 
-LOGFILE = '/var/log/scraper.log'
-SLEEP_TIME = 3
+LOGFILE = os.environ.get('SCRAPER_LOGFILE', '/var/log/scraper.log')
+
+# slusnost voci portalu: priemerny pocet requestov za sekundu na host, burst a pocet paralelnych stahovani
+REQUESTS_PER_SECOND = 1
+BURST = 3
+FETCH_WORKERS = 4
+MAX_RETRIES = 3
+
+ZDROJ = 'www.nehnutelnosti.sk'
+# None = presna mnozina idciek v pamati, inak Bloom filter s danou chybovostou pre velmi velku historiu
+SEEN_BLOOM_ERROR_RATE = None
+# pocet riadkov v jednom multi-row INSERT
+INSERT_BATCH_SIZE = 100
+# bs4 alebo lxml, pozri extract.py
+EXTRACTOR_BACKEND = 'lxml'
+# adresar archivu surovych stranok, None = archiv vypnuty
+ARCHIVE_DIR = None
+REPLAY_WORKERS = multiprocessing.cpu_count()
+# chyby parsovania jedneho inzeratu, inzerat sa preskoci a crawl pokracuje
+PARSE_ERRORS = (AttributeError, ValueError, IndexError, KeyError)
+
+# inkrementalny crawl skonci po tolkych stranach za sebou bez noveho inzeratu, None = prejde vsetky strany
+STOP_AFTER_SEEN_PAGES = 3
+CHECKPOINT_FILE = '/var/tmp/scraper-checkpoint.json'
+# checkpoint starsieho crawlu sa ignoruje a crawl zacne od prvej strany
+CHECKPOINT_MAX_AGE = 6 * 3600
+RUN_STATS_FILE = '/var/log/scraper-runs.jsonl'
 
 # url template
 url = 'https://www.nehnutelnosti.sk/bratislava/byty/predaj/?p[page]='
+
+# zdielany crawl: scraper.py seed [region ...] zalozi crawl, lubovolny pocet scraper.py worker procesov ho prejde
+# spolu. Rate limit plati pre kazdy worker zvlast. Dalsi okres je iba dalsia url vyhladavania.
+REGIONS = {
+    'bratislava': url,
+}
+LEASE_SECONDS = 300
+# pocet pokusov o ulohu, potom ostane failed
+MAX_ATTEMPTS = 3
+# pocet uloh prenajatych naraz, inzeraty davky sa stahuju paralelne
+LEASE_BATCH = 2 * FETCH_WORKERS
+# worker bez uloh caka, kym ostatni mozu pridat nove, a skonci ked vo frontieri nic nebezi
+IDLE_SLEEP = 5
+FRONTIER_KEEP_DAYS = 30
 formatter = logging.Formatter('%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(message)s')
 
 log = logging.getLogger()
@@ -42,194 +88,319 @@ def get_float_from_tag(tag):
         return float(found.group(0).replace(',', '.'))
     return None
 
-def strip_accents(text):
-    try:
-        text = unicode(text, 'utf-8')
-    except NameError: # unicode is a default on python 3
-        pass
+fetcher = Fetcher(REQUESTS_PER_SECOND, BURST, FETCH_WORKERS, MAX_RETRIES)
+extractor = make_extractor(EXTRACTOR_BACKEND)
+archive = PageArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
 
-    text = unicodedata.normalize('NFD', text)\
-           .encode('ascii', 'ignore')\
-           .decode("utf-8")
+def make_request(url, inzerat_id=None):
+    "Make request and get response. Per host rate limit of fetcher makes sure we dont get blocked"
+    if archive is None:
+        return fetcher.get(url)
 
-    return str(text)
+    # podmieneny request, nezmenena stranka sa nestahuje znova
+    page = archive.latest(url)
+    response = fetcher.get(url, headers=archive.conditional_headers(page))
 
-def make_request(url):
-    "Make request and get response. Use random sleep up to 5s, so we dont get blocked"
-    time.sleep(random.uniform(1,5))
-    response = requests.get(url, timeout=60)
+    if response.status_code == 304 and page is not None:
+        archive.touch(url, inzerat_id, page)
+        return ArchivedResponse(archive.text(page))
+
+    if response.ok:
+        archive.store(url, response, inzerat_id)
     return response
 
-def parse_response(response):
-    return BeautifulSoup(response.text, "html.parser")
+def replay_inzerat(page):
+    "Extract inzerat info from archived page, runs in worker process"
+    try:
+        return extractor.get_info(read_text(ARCHIVE_DIR, page['sha256'], page['encoding']))
+    except PARSE_ERRORS:
+        log.error('Replay zlyhal pre: {}'.format(page['url']))
+        return None
 
 
 class Scraper:
     """Hlavna trieda na scrapovanie daneho portalu s nehnutelnostami"""
 
-    def __init__(self, url, inzerat_parser):
+    def __init__(self, url, inzerat_parser, checkpoint, stop_after_seen_pages=STOP_AFTER_SEEN_PAGES):
         self.url = url
         self.inzerat_parser = inzerat_parser
-        self.no_new_inzeraty = 0
+        self.checkpoint = checkpoint
+        self.stop_after_seen_pages = stop_after_seen_pages
+        self.stats = CrawlStats()
 
     def scrape(self):
         "Main function responsible for running scraper"
         pager = 1
+
+        state = self.checkpoint.load()
+        if state:
+            log.info('Resuming after page {}, {} pending inzeraty'.format(state['pager'], len(state['pending'])))
+            # cakajuce inzeraty mohli byt medzitym ulozene inym behom
+            pending = self.inzerat_parser.get_new_inzeraty_url(state['pending'])
+            self.stats.seen += len(state['pending']) - len(pending)
+            self.process_inzeraty(pending)
+            pager = state['pager'] + 1
+            self.stats.resumed_from = pager
+
+        seen_pages = 0
         while True:
-            page = Page(url+str(pager))
+            page = Page(self.url+str(pager))
 
             log.info(page.url)
 
             page.process_page()
+            self.stats.pages += 1
 
             # scraper reached last page
             if not page.inzeraty_url:
-                return
+                break
 
             log.info(page.inzeraty_url)
 
-            processed = self.inzerat_parser.get_all_inzeraty_on_page(page.inzeraty_url)
+            new_url = self.inzerat_parser.get_new_inzeraty_url(page.inzeraty_url)
+            self.stats.seen += len(page.inzeraty_url) - len(new_url)
 
-            if not processed:
-                return
+            self.checkpoint.save(pager, new_url)
+            self.process_inzeraty(new_url)
+            self.checkpoint.save(pager, [])
 
-            for record in processed:
-                inzerat_parser.db.insert_inzerat(record)
-                self.no_new_inzeraty += 1
+            # na strane boli iba zname inzeraty, nove uz pravdepodobne nepribudnu
+            seen_pages = 0 if new_url else seen_pages + 1
+            if self.stop_after_seen_pages and seen_pages >= self.stop_after_seen_pages:
+                log.info('{} pages without new inzerat, stopping'.format(seen_pages))
+                break
 
             pager += 1
 
+        self.checkpoint.clear()
+        self.stats.finish()
 
-class Page:
-    """Class representing single portal page"""
+    def process_inzeraty(self, new_url):
+        processed = self.inzerat_parser.process_inzeraty(new_url)
 
-    def __init__(self, url):
-        self.url = url
-        self.inzeraty_url = []
-        self.body = None
+        self.stats.new += len(processed)
+        self.stats.failed += len(new_url) - len(processed)
 
-    def process_page(self):
-        response = make_request(self.url)
-        self.body = parse_response(response)
-        self.get_inzerat_href()
+        if processed:
+            self.save_inzeraty(processed)
 
-    def get_inzerat_href(self):
-        "Find links to each inzerat in page. Usually there 30 inzerats on single page"
-        inzeraty = self.body.find_all('a', href=re.compile(r'\.sk/(\d){7}'))
-        inzeraty = [inzerat['href'] for inzerat in inzeraty]
-        self.inzeraty_url = list(set(inzeraty))
+    def save_inzeraty(self, inzeraty):
+        "Insert all inzeraty of page in one transaction, falls back to inserting one by one"
+        db = self.inzerat_parser.db
+        try:
+            inserted = db.insert_inzeraty(inzeraty)
+        except DBError as e:
+            log.error('Bulk insert zlyhal, vkladam po jednom: {}'.format(e))
+            inserted = sum(db.insert_inzerat(inzerat) for inzerat in inzeraty)
 
+        log.info('{} records inserted, {} ignored'.format(inserted, len(inzeraty) - inserted))
+        self.stats.inserted += inserted
+        self.stats.ignored += len(inzeraty) - inserted
 
-class InzeratParser:
-    """Class for parsing single inzerat on a page. There are many inzerat's on a single page"""
 
-    def __init__(self, db):
-        self.db = db
+class FrontierScraper(Scraper):
+    """Worker of shared crawl, processes page and inzerat jobs leased from frontier until the crawl is finished"""
 
-    def parse_inzerat(self, url):
-        response = make_request(url)
-        body = parse_response(response)
-        return body
+    def __init__(self, frontier, inzerat_parser, stop_after_seen_pages=STOP_AFTER_SEEN_PAGES):
+        self.frontier = frontier
+        self.inzerat_parser = inzerat_parser
+        self.stop_after_seen_pages = stop_after_seen_pages
+        self.stats = CrawlStats()
 
-    def has_already_seen(self, url):
-        id = url.split('/')[3]
-        if self.db.is_inzerat_existing(id):
-            log.info('Inzerat alrady seen: {}'.format(url))
-            return True
-        else:
-            False
+    def seed(self, regions):
+        "Start new crawl from first page of each region, returns crawl id"
+        crawl = datetime.now().strftime('%Y%m%d%H%M%S')
+        for region in regions:
+            self.frontier.add(PAGE, [REGIONS[region] + '1'], region, crawl, pager=1)
+        return crawl
 
-    def process_inzerat(self, i):
-        try:
-            body = self.parse_inzerat(i)
-        except TimeoutError:
-            log.error('Timeout pre: {}'.format(i))
+    def scrape(self):
+        while True:
+            jobs = self.frontier.lease(LEASE_BATCH)
+            if not jobs:
+                # strany prenajate inymi workermi este mozu pridat inzeraty
+                if not self.frontier.active():
+                    break
+                time.sleep(IDLE_SLEEP)
+                continue
+
+            for job in jobs:
+                if job.kind == PAGE:
+                    self.process_page_job(job)
+            self.process_inzerat_jobs([job for job in jobs if job.kind == INZERAT])
 
+        self.stats.finish()
+
+    def process_page_job(self, job):
+        page = Page(job.url)
+        log.info(page.url)
         try:
-            inzerat_info = self.get_info_from_inzerat(body)
-        except AttributeError:
-            log.error(i)
-            return []
-        return inzerat_info
+            page.process_page()
+        except requests.RequestException as e:
+            log.error('Request zlyhal pre: {}'.format(page.url))
+            self.frontier.fail([job], str(e))
+            return
+        self.stats.pages += 1
+
+        # scraper reached last page
+        if not page.inzeraty_url:
+            self.frontier.done([job])
+            return
+
+        new_url = self.inzerat_parser.get_new_inzeraty_url(page.inzeraty_url)
+        self.stats.seen += len(page.inzeraty_url) - len(new_url)
+
+        # dalsia strana ide do fronty hned, ostatni workeri ju mozu stahovat, kym sa spracuju inzeraty tejto
+        # na strane boli iba zname inzeraty, nove uz pravdepodobne nepribudnu
+        seen_pages = 0 if new_url else job.seen_pages + 1
+        if self.stop_after_seen_pages and seen_pages >= self.stop_after_seen_pages:
+            log.info('{} pages without new inzerat in {}, stopping'.format(seen_pages, job.region))
+        else:
+            self.frontier.add(PAGE, [REGIONS[job.region] + str(job.pager + 1)], job.region, job.crawl,
+                              pager=job.pager + 1, seen_pages=seen_pages)
 
-    def get_all_inzeraty_on_page(self, inzeraty_url):
-        inzeraty = []
-        for inzerat_url in inzeraty_url:
-            if self.has_already_seen(inzerat_url):
-                continue
+        self.frontier.add(INZERAT, new_url, job.region, job.crawl)
 
-            log.info(inzerat_url)
-            inzerat_info = self.process_inzerat(inzerat_url)
+        # strana je hotova az ked su jej inzeraty aj dalsia strana vo fronte
+        self.frontier.done([job])
 
-            if not inzerat_info:
-                continue
+    def process_inzerat_jobs(self, jobs):
+        if not jobs:
+            return
 
-            inzerat = self.create_inzerat_record(inzerat_info)
+        for job in jobs:
+            self.inzerat_parser.seen.add(self.inzerat_parser.get_inzerat_id(job.url))
 
+        inzeraty, done, failed = [], [], []
+        for job, inzerat in zip(jobs, fetcher.map(self.inzerat_parser.process_inzerat, [j.url for j in jobs])):
+            if inzerat is None:
+                failed.append(job)
+                continue
             inzeraty.append(inzerat)
+            done.append(job)
 
-        return inzeraty
+        self.stats.new += len(inzeraty)
+        self.stats.failed += len(failed)
 
-    def get_info_from_inzerat(self, body):
+        # ulozene pred oznacenim hotovych, po pade sa inzerat stiahne znova a INSERT IGNORE ho preskoci
+        if inzeraty:
+            self.save_inzeraty(inzeraty)
+        self.frontier.done(done)
+        if failed:
+            self.frontier.fail(failed, 'Download or parsing failed')
 
-        inzerat_info = {}
 
-        head_div = body.find('div', {'class': 'sub--head'})
+class Replayer:
+    """Re-parse all archived inzeraty without network and update their records in DB"""
 
-        info_div = head_div.find('div', {'class': 'parameter--info'})
-        divTag = info_div.findAll('div')
-        for t in divTag:
-            k, v = str(t.get_text()).split(':')
-            inzerat_info[k] = v
+    def __init__(self, archive, inzerat_parser, workers):
+        self.archive = archive
+        self.inzerat_parser = inzerat_parser
+        self.workers = workers
+        self.no_affected = 0
+
+    def replay(self):
+        pages = [dict(page) for page in self.archive.latest_inzeraty()]
+        log.info('Replay {} archived inzeraty'.format(len(pages)))
+
+        inzeraty = []
+        with multiprocessing.Pool(self.workers) as pool:
+            for page, inzerat_info in zip(pages, pool.imap(replay_inzerat, pages, chunksize=16)):
+                if not inzerat_info:
+                    continue
+                try:
+                    inzerat = self.inzerat_parser.create_inzerat_record(inzerat_info)
+                except PARSE_ERRORS:
+                    log.error('Replay zlyhal pre: {}'.format(page['url']))
+                    continue
+                # cas stiahnutia stranky, nie cas replay
+                inzerat.timestamp = page['fetched_at']
+                inzeraty.append(inzerat)
+
+                if len(inzeraty) >= INSERT_BATCH_SIZE:
+                    self.save(inzeraty)
+                    inzeraty = []
+
+        self.save(inzeraty)
 
-        location_div = head_div.find('span', {'class': 'top--info-location'})
-        location_text = location_div.get_text().replace('\n', '').split(',')
-        inzerat_info['Okres'] = location_text[-1].strip()
-        inzerat_info['Mesto'] = location_text[-2].strip()
+    def save(self, inzeraty):
+        self.no_affected += self.inzerat_parser.db.upsert_inzeraty(inzeraty)
 
+
+class Page:
+    """Class representing single portal page"""
+
+    def __init__(self, url):
+        self.url = url
+        self.inzeraty_url = []
+
+    def process_page(self):
+        response = make_request(self.url)
+        self.inzeraty_url = extractor.get_links(response.text)
+
+
+class InzeratParser:
+    """Class for parsing single inzerat on a page. There are many inzerat's on a single page"""
+
+    def __init__(self, db, seen):
+        self.db = db
+        self.seen = seen
+
+    def parse_inzerat(self, url):
+        response = make_request(url, self.get_inzerat_id(url))
+        return extractor.get_info(response.text)
+
+    def get_inzerat_id(self, url):
+        return url.split('/')[3]
+
+    def has_already_seen(self, url):
+        return not self.get_new_inzeraty_url([url])
+
+    def get_new_inzeraty_url(self, inzeraty_url):
+        "Filter out urls of inzeraty which are already stored, without query per url"
+        ids = [self.get_inzerat_id(u) for u in inzeraty_url]
+        new_ids = set(self.seen.filter_new(ids))
+
+        new_url = []
+        for inzerat_url, id in zip(inzeraty_url, ids):
+            if id in new_ids:
+                new_url.append(inzerat_url)
+            else:
+                log.info('Inzerat alrady seen: {}'.format(inzerat_url))
+        return new_url
+
+    def process_inzerat(self, i):
+        "Download and parse inzerat into record, None when it fails so that other inzeraty of page go on"
         try:
-            inzerat_info['Ulica'] = location_text[-3].strip()
-        except (KeyError, IndexError):
-            pass
+            return self.create_inzerat_record(self.parse_inzerat(i))
+        except requests.RequestException:
+            log.error('Request zlyhal pre: {}'.format(i))
+        except PARSE_ERRORS as e:
+            log.error('Parsovanie zlyhalo pre: {} ({!r})'.format(i, e))
+        return None
 
-        cena_div = head_div.find('div', {'class': 'price--main paramNo0'})
-        inzerat_info['Cena'] = cena_div.get_text().strip()
+    def get_all_inzeraty_on_page(self, inzeraty_url):
+        return self.process_inzeraty(self.get_new_inzeraty_url(inzeraty_url))
 
-        addit_div = body.find('div', {'class': 'parameters--extra mt-4 mb-5'})
+    def process_inzeraty(self, new_url):
+        "Download and parse new inzeraty, returns records of successfully parsed ones"
+        inzeraty = []
 
-        if addit_div:
-            divTag = addit_div.find('div', {'id': 'additional-features-modal-button'})
-            divTag = divTag.findAll('div')
-            for t in divTag:
-                try:
-                    k, v = str(t.get_text()).replace('\n','').split(':')
-                except ValueError:
-                    log.error(t)
-                    continue
-                inzerat_info[k] = v.strip()
+        log.info(new_url)
 
-        button_div = body.find('ul', {'class': 'row m-0'})
+        # inzerat moze byt aj na dalsej stranke, uz sa nestahuje znova
+        for inzerat_url in new_url:
+            self.seen.add(self.get_inzerat_id(inzerat_url))
 
-        if button_div:
-            divTag = button_div.find_all('div', {'class': 'additional-features--item'})
-            for t in divTag:
-                try:
-                    k, v = str(t.get_text()).replace('\n','').split(':')
-                except ValueError:
-                    log.error(t)
-                    continue
-                inzerat_info[k] = v.strip()
+        # inzeraty sa stahuju paralelne, rate limit riesi fetcher
+        for inzerat in fetcher.map(self.process_inzerat, new_url):
 
-        gps_div = body.find('div', {'id': 'map-detail'}).attrs['data-gps-marker']
-        gps_info = json.loads(gps_div)
-        inzerat_info['lat'] = gps_info['gpsLatitude']
-        inzerat_info['lon'] = gps_info['gpsLongitude']
+            if inzerat is None:
+                continue
 
-        for key, value in inzerat_info.items():
-            if isinstance(value, str):
-                inzerat_info[key] = strip_accents(value).strip()
+            inzeraty.append(inzerat)
 
-        return inzerat_info
+        return inzeraty
 
     def get_str_info(self, inzerat_info, inzerat):
         inzerat.id = inzerat_info['ID inzerátu'].strip()
@@ -285,7 +456,7 @@ class InzeratParser:
         self.get_str_info(inzerat_info, inzerat)
 
         inzerat.timestamp = datetime.now().isoformat()
-        inzerat.zdroj = 'www.nehnutelnosti.sk'
+        inzerat.zdroj = ZDROJ
 
         return inzerat
 
@@ -293,31 +464,95 @@ class ScraperDB(Database):
 
     def __init__(self):
         super().__init__()
+        columns = [f.name for f in fields(Inzerat)]
+        self.insert_sql = "INSERT IGNORE INTO inzeraty ( {} ) VALUES ( {} )".format(
+            ', '.join('`' + c + '`' for c in columns), ', '.join(['%s'] * len(columns)))
+        self.upsert_sql = "INSERT INTO inzeraty ( {} ) VALUES ( {} ) ON DUPLICATE KEY UPDATE {}".format(
+            ', '.join('`' + c + '`' for c in columns), ', '.join(['%s'] * len(columns)),
+            ', '.join('`{0}` = VALUES(`{0}`)'.format(c) for c in columns))
+
+    def inzerat_row(self, inzerat):
+        return tuple(v.replace('/', '_') if isinstance(v, str) else v for v in asdict(inzerat).values())
 
     def insert_inzerat(self, inzerat):
-        record = asdict(inzerat)
-        columns = ', '.join("`" + str(x).replace('/', '_') + "`" for x in record.keys())
-        values = ', '.join("'" + str(x).replace('/', '_') + "'" for x in record.values())
-        sql = "INSERT IGNORE INTO %s ( %s ) VALUES ( %s );" % ('inzeraty', columns, values)
-        rowcount = self.execute(sql)
+        "Row at a time insert, returns 1 if inzerat was inserted"
+        rowcount = self.execute(self.insert_sql, self.inzerat_row(inzerat))
         if rowcount > 0:
             log.info("{} record inserted".format(inzerat.id))
+        return max(rowcount, 0)
+
+    def insert_inzeraty(self, inzeraty):
+        "Multi-row INSERT IGNORE in one transaction, returns number of actually inserted rows"
+        if not inzeraty:
+            return 0
+        rows = [self.inzerat_row(inzerat) for inzerat in inzeraty]
+        return self.execute_many(self.insert_sql, rows, INSERT_BATCH_SIZE)
+
+    def upsert_inzeraty(self, inzeraty):
+        "Insert or overwrite inzeraty in one transaction, used by replay of archived pages"
+        if not inzeraty:
+            return 0
+        rows = [self.inzerat_row(inzerat) for inzerat in inzeraty]
+        return self.execute_many(self.upsert_sql, rows, INSERT_BATCH_SIZE)
+
+    def get_inzerat_ids(self, zdroj):
+        query = "SELECT id FROM inzeraty WHERE zdroj = %s"
+        return [row[0] for row in self.select_all(query, (zdroj,))]
 
-    def is_inzerat_existing(self, id):
-        query = "SELECT 1 FROM inzeraty WHERE id = %s" % (id)
-        res = self.select_one(query)
-        return res
+    def get_existing_ids(self, zdroj, ids):
+        query = "SELECT id FROM inzeraty WHERE zdroj = %s AND id IN ({})".format(', '.join(['%s'] * len(ids)))
+        return [row[0] for row in self.select_all(query, (zdroj, *ids))]
 
 
 if __name__ == '__main__':
 
+    db = ScraperDB()
+
+    # python scraper.py replay: znova sparsuje archivovane stranky bez siete
+    if sys.argv[1:] == ['replay']:
+        if archive is None:
+            log.error('Replay needs ARCHIVE_DIR')
+            sys.exit(1)
+
+        log.info('Replay started!')
+
+        replayer = Replayer(archive, InzeratParser(db, None), REPLAY_WORKERS)
+        replayer.replay()
+
+        log.info('{} rows affected'.format(replayer.no_affected))
+        log.info('Replay done!')
+        sys.exit()
+
+    # python scraper.py seed [region ...]: zalozi zdielany crawl, python scraper.py worker: spracuje jeho ulohy
+    if sys.argv[1:2] == ['seed']:
+        frontier = Frontier(db, None, LEASE_SECONDS, MAX_ATTEMPTS)
+        log.info('{} old frontier jobs deleted'.format(frontier.prune(FRONTIER_KEEP_DAYS)))
+
+        regions = sys.argv[2:] or list(REGIONS)
+        unknown = [r for r in regions if r not in REGIONS]
+        if unknown:
+            log.error('Unknown regions {}, known are {}'.format(', '.join(unknown), ', '.join(REGIONS)))
+            sys.exit(1)
+
+        crawl = FrontierScraper(frontier, None).seed(regions)
+        log.info('Crawl {} seeded'.format(crawl))
+        sys.exit()
+
     log.info('Scraping started!')
 
-    db = ScraperDB()
-    inzerat_parser = InzeratParser(db)
+    seen = SeenInzeraty(db, ZDROJ, SEEN_BLOOM_ERROR_RATE)
+    log.info('{} known inzeraty loaded'.format(seen.load()))
+
+    inzerat_parser = InzeratParser(db, seen)
 
-    scraper = Scraper(url, inzerat_parser)
+    if sys.argv[1:] == ['worker']:
+        worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+        scraper = FrontierScraper(Frontier(db, worker, LEASE_SECONDS, MAX_ATTEMPTS), inzerat_parser)
+    else:
+        scraper = Scraper(url, inzerat_parser, Checkpoint(CHECKPOINT_FILE, CHECKPOINT_MAX_AGE))
     scraper.scrape()
 
-    log.info('{} records inserted'.format(scraper.no_new_inzeraty))
+    log.info('{} records inserted, {} ignored'.format(scraper.stats.inserted, scraper.stats.ignored))
+    log.info(scraper.stats)
+    scraper.stats.save(RUN_STATS_FILE)
     log.info('Scraping done!')
@@ -0,0 +1,66 @@
+"""
+Mnozina uz videnych inzeratov. Idcka sa nacitaju z DB raz pri starte, kontrola URL potom nejde do DB. Pri velkej
+historii je mozne pouzit Bloom filter, jeho kladne odpovede sa overia jednym IN dotazom na stranku.
+"""
+import math
+import hashlib
+
+
+class BloomFilter:
+    """Compact probabilistic set, may answer seen for unseen id with probability error_rate"""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for p in self.positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+
+class SeenInzeraty:
+    """Ids of inzeraty already stored for one zdroj"""
+
+    def __init__(self, db, zdroj, bloom_error_rate=None):
+        self.db = db
+        self.zdroj = zdroj
+        self.bloom_error_rate = bloom_error_rate
+        self.ids = set()
+        # idcka pridane pocas behu, v DB este nemusia byt
+        self.added = set()
+
+    def load(self):
+        ids = self.db.get_inzerat_ids(self.zdroj)
+        if self.bloom_error_rate:
+            # rezerva, aby chybovost neprekrocila limit ani po pridani novych inzeratov
+            self.ids = BloomFilter(max(2 * len(ids), 100000), self.bloom_error_rate)
+        for id in ids:
+            self.ids.add(id)
+        return len(ids)
+
+    def add(self, id):
+        self.ids.add(id)
+        if self.bloom_error_rate:
+            self.added.add(id)
+
+    def filter_new(self, ids):
+        "Return ids which are not stored yet, in original order"
+        maybe_seen = [id for id in ids if id in self.ids]
+
+        if maybe_seen and self.bloom_error_rate:
+            # Bloom filter moze mat false positive, potvrdi sa jednym dotazom
+            confirmed = set(self.db.get_existing_ids(self.zdroj, maybe_seen))
+            maybe_seen = [id for id in maybe_seen if id in confirmed or id in self.added]
+
+        maybe_seen = set(maybe_seen)
+        return [id for id in ids if id not in maybe_seen]
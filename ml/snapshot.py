@@ -0,0 +1,181 @@
+"""
+Lokalny stlpcovy snapshot tabulky inzeraty. Drzi iba stlpce, ktore pipeline pouziva, kategorie ako int32 kody do
+spolocneho slovnika a cisla v uzkych typoch. Kazda synchronizacia pripoje iba riadky zmenene od poslednej, po castiach,
+takze ani prva synchronizacia nemusi mat celu tabulku v pamati.
+
+Zmeny sa hladaju podla stlpca updated, ktory nastavuje databaza pri kazdom inserte a zmene riadku. Stlpec timestamp
+nastavuje scraper pri parsovani a replay ho prepise casom stiahnutia stranky, na synchronizaciu sa nehodi. Riadok
+zapisany v transakcii, ktora sa commitne az po synchronizacii, moze mat updated starsi ako synced_to, preto sa vzdy
+znova nacita okno overlap sekund pred synced_to a riadky z neho, ktore uz v snapshote su, sa preskocia.
+"""
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+META_FILE = 'meta.json'
+
+KEY_COLUMNS = ['zdroj', 'id']
+CAT_COLUMNS = ['zdroj', 'mesto', 'druh', 'stav', 'kurenie', 'energ_cert', 'vytah', 'garaz', 'garazove_statie']
+# v DB chybajuca hodnota cisla je -1, NULL sa zapise rovnako
+NUM_COLUMNS = {
+    'cena': np.float32,
+    'uzit_plocha': np.float32,
+    'rok_vystavby': np.int16,
+    'pocet_nadz_podlazi': np.int8,
+    'pocet_izieb': np.int8,
+    'podlazie': np.int8,
+    'latitude': np.float32,
+    'longitude': np.float32,
+}
+COLUMNS = ['id', 'timestamp', 'updated'] + CAT_COLUMNS + list(NUM_COLUMNS)
+SYNC_COLUMN = 'updated'
+
+
+def narrow(values, dtype):
+    "Cast numbers to narrow dtype, NaN and integers out of dtype range become -1 instead of wrapping around"
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        with np.errstate(invalid='ignore'):
+            values = np.where((values >= info.min) & (values <= info.max), values, -1)
+    return np.nan_to_num(values, nan=-1).astype(dtype)
+
+def part_name(n):
+    return 'part-{:05d}.npz'.format(n)
+
+
+class Snapshot:
+    """Append only npz parts with shared category dictionaries and last synced update time"""
+
+    def __init__(self, root, overlap):
+        self.root = root
+        self.overlap = overlap
+        os.makedirs(root, exist_ok=True)
+        self.meta = self.load_meta()
+        self.codes = {c: {v: i for i, v in enumerate(values)} for c, values in self.meta['categories'].items()}
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.root, META_FILE)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        # snapshot synchronizovany podla ineho stlpca sa vytvori znova, stare casti sa prepisu
+        if meta.get('sync_column') != SYNC_COLUMN:
+            meta = {'synced_to': None, 'sync_column': SYNC_COLUMN, 'overlap': [], 'parts': 0,
+                    'categories': {c: [] for c in CAT_COLUMNS}}
+        return meta
+
+    def save_meta(self):
+        path = os.path.join(self.root, META_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(path + '.tmp', path)
+
+    def encode(self, column, values):
+        "Codes of values in shared dictionary, unseen values are appended, empty string and NULL are -1"
+        codes = self.codes[column]
+        categories = self.meta['categories'][column]
+        result = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is None or v == '' or v != v:
+                result[i] = -1
+                continue
+            if v not in codes:
+                codes[v] = len(categories)
+                categories.append(v)
+            result[i] = codes[v]
+        return result
+
+    def synced_keys(self, chunk):
+        "(zdroj, id, updated) of chunk rows"
+        updated = pd.to_datetime(chunk[SYNC_COLUMN]).to_numpy(dtype='datetime64[s]').astype(str)
+        return list(zip(chunk['zdroj'].astype(str).tolist(), chunk['id'].astype(str).tolist(), updated.tolist()))
+
+    def append(self, chunk):
+        # riadky z okna overlap, ktore sa od minulej synchronizacie nezmenili, uz v snapshote su
+        overlap = {tuple(k) for k in self.meta['overlap']}
+        keys = self.synced_keys(chunk)
+        new = np.array([k not in overlap for k in keys], dtype=bool)
+        if not new.any():
+            return 0
+        chunk = chunk[new]
+
+        arrays = {
+            'id': chunk['id'].astype(str).to_numpy(dtype=str),
+            'timestamp': pd.to_datetime(chunk['timestamp']).to_numpy(dtype='datetime64[s]'),
+            'updated': pd.to_datetime(chunk[SYNC_COLUMN]).to_numpy(dtype='datetime64[s]'),
+        }
+        for c in CAT_COLUMNS:
+            arrays[c] = self.encode(c, chunk[c].tolist())
+        for c, dtype in NUM_COLUMNS.items():
+            arrays[c] = narrow(pd.to_numeric(chunk[c]).to_numpy(dtype=np.float64), dtype)
+
+        # cast sa zapise pred meta, nedokoncena cast bez meta sa pri dalsej synchronizacii prepise
+        np.savez(os.path.join(self.root, part_name(self.meta['parts'])), **arrays)
+
+        synced_to = arrays['updated'].max()
+        if self.meta['synced_to']:
+            synced_to = max(synced_to, np.datetime64(self.meta['synced_to']))
+        window = str(synced_to - np.timedelta64(self.overlap, 's'))
+
+        self.meta['parts'] += 1
+        self.meta['synced_to'] = str(synced_to)
+        self.meta['overlap'] = sorted(k for k in overlap | set(keys) if k[2] >= window)
+        self.save_meta()
+        return len(chunk)
+
+    def sync(self, db, chunksize):
+        "Append rows changed since last sync, returns number of appended rows"
+        since = None
+        if self.meta['synced_to']:
+            since = str(np.datetime64(self.meta['synced_to']) - np.timedelta64(self.overlap, 's'))
+        rows = 0
+        for chunk in db.get_inzeraty_since(COLUMNS, SYNC_COLUMN, since, chunksize):
+            if len(chunk):
+                rows += self.append(chunk)
+        return rows
+
+    def parts(self, columns):
+        "Arrays of parts, newest first without older copies of the same inzerat, categories as codes"
+        seen = set()
+        for n in reversed(range(self.meta['parts'])):
+            with np.load(os.path.join(self.root, part_name(n))) as part:
+                keys = list(zip(part['zdroj'].tolist(), part['id'].tolist()))
+                keep = np.array([k not in seen for k in keys], dtype=bool)
+                seen.update(keys)
+                yield {c: part[c][keep] for c in columns}
+
+    def frame(self, arrays, columns):
+        data = {}
+        for c in columns:
+            values = arrays[c]
+            if c in CAT_COLUMNS:
+                values = pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(self.meta['categories'][c]))
+            data[c] = values
+        return pd.DataFrame(data, columns=columns, copy=False)
+
+    def chunks(self, columns=None):
+        """Stream snapshot part by part as DataFrames with categorical columns. Rows updated later (replay upsert)
+        are stored in several parts, newest parts go first and older copies of the same inzerat are skipped."""
+        columns = columns or COLUMNS
+        for arrays in self.parts(columns):
+            yield self.frame(arrays, columns)
+
+    def load(self, columns=None):
+        """Whole snapshot as one DataFrame. Pipeline needs all rows at once (outlier fences, one-hot columns and the
+        split are learned over the whole table), so chunks() cannot bound it. Parts are joined column by column
+        instead of concatenating DataFrames and each column's parts are freed once joined."""
+        columns = columns or COLUMNS
+        arrays = {c: [] for c in columns}
+        for part in self.parts(columns):
+            for c in columns:
+                arrays[c].append(part[c])
+        if not any(arrays[c] for c in columns):
+            return pd.DataFrame(columns=columns)
+
+        data = {}
+        for c in columns:
+            data[c] = np.concatenate(arrays.pop(c))
+        return self.frame(data, columns)
@@ -0,0 +1,99 @@
+"""
+Spolocne fixtures testov servingu. app a ml maju moduly s rovnakym menom (grid, comparables), preto sa testy
+spustaju zvlast: python -m pytest tests/app
+"""
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+import pytest
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+sys.path.insert(0, APP_DIR)
+
+# zakolko pri importe zaklada metriky a log, v testoch idu do docasneho adresara
+TMP_DIR = tempfile.mkdtemp(prefix='zakolko-test-')
+os.environ.setdefault('METRICS_DIR', os.path.join(TMP_DIR, 'metrics'))
+os.environ.setdefault('LOGFILE', os.path.join(TMP_DIR, 'app.log'))
+
+NUM_FEATURES = ['uzit_plocha', 'rok_vystavby', 'pocet_nadz_podlazi', 'pocet_izieb', 'podlazie']
+GPS_FEATURES = ['latitude', 'longitude']
+CATEGORIES = {'mesto': ['Bratislava I', 'Bratislava II']}
+LIMITS = [
+    {'feature': 'uzit_plocha', 'low': 10.0, 'high': 300.0, 'inclusive': True, 'action': 'reject', 'by': 'mesto',
+     'groups': {'Bratislava I': [10.0, 200.0]}},
+    {'feature': 'rok_vystavby', 'low': 1900, 'high': None, 'inclusive': True, 'action': 'missing'},
+    {'feature': 'latitude', 'low': 47.9, 'high': 48.4, 'inclusive': False, 'action': 'reject'},
+]
+
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def make_data(n, seed=0):
+    "Random listings as float32 matrix in model column order, part of numbers is missing"
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(20, 150, n), rng.choice([1960, 1990, 2020], n), rng.integers(1, 12, n),
+        rng.integers(1, 5, n), rng.integers(0, 10, n), rng.uniform(48.05, 48.25, n), rng.uniform(16.95, 17.25, n),
+        rng.integers(0, 2, n), rng.integers(0, 2, n),
+    ]).astype(np.float32)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = 3000 * np.nan_to_num(X[:, 0], nan=60) + 20000 * np.nan_to_num(X[:, 8]) + rng.normal(0, 5000, n)
+    return X, y
+
+
+def write_model(root, name='model_1000', seed=0, rounds=20):
+    "Train small booster and save it the way pipeline does, returns model directory"
+    import xgboost as xgb
+    from encoder import FeatureEncoder
+
+    columns = NUM_FEATURES + GPS_FEATURES + ['mesto_' + v for v in CATEGORIES['mesto']]
+    categories = {c: {v: columns.index(c + '_' + v) for v in values} for c, values in CATEGORIES.items()}
+
+    X, y = make_data(500, seed)
+    booster = xgb.train({'max_depth': 3, 'eta': 0.3, 'objective': 'reg:squarederror'},
+                        xgb.DMatrix(X, y, feature_names=columns), rounds)
+
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    booster.save_model(os.path.join(path, 'booster.json'))
+    FeatureEncoder(columns, NUM_FEATURES, GPS_FEATURES, categories, LIMITS).save(os.path.join(path, 'encoder.json'))
+    manifest = {
+        'feature_names': columns,
+        'mae': float(name.split('_')[-1]),
+        'checksum': sha256(os.path.join(path, 'booster.json')),
+    }
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    "model/best symlink to freshly trained model"
+    os.makedirs(str(tmp_path / 'model'))
+    write_model(str(tmp_path / 'model'))
+    os.symlink('model_1000', str(tmp_path / 'model' / 'best'))
+    return tmp_path / 'model'
+
+
+@pytest.fixture
+def zakolko(model_dir, monkeypatch):
+    "Serving module with model loaded from model_dir"
+    import zakolko
+    monkeypatch.setattr(zakolko, 'MODEL_PATH', str(model_dir / 'best'))
+    zakolko.load_model()
+    if zakolko.cache:
+        zakolko.cache.clear()
+    return zakolko
+
+
+@pytest.fixture
+def client(zakolko):
+    return zakolko.app.test_client()
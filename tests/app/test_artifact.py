@@ -0,0 +1,58 @@
+import os
+import json
+
+import pytest
+
+from conftest import write_model, make_data
+from artifact import load_artifact, MANIFEST_FILE, BOOSTER_FILE, ENCODER_FILE
+
+
+@pytest.fixture
+def path(tmp_path):
+    return write_model(str(tmp_path))
+
+
+def test_loads_model_with_encoder(path):
+    artifact = load_artifact(path)
+    X, _ = make_data(5)
+
+    assert artifact.name == 'model_1000'
+    assert artifact.encoder.columns == artifact.manifest['feature_names']
+    assert artifact.predict(X).shape == (5,)
+
+
+def test_corrupted_booster_is_rejected(path):
+    with open(os.path.join(path, BOOSTER_FILE), 'a') as f:
+        f.write(' ')
+
+    with pytest.raises(ValueError, match='Checksum'):
+        load_artifact(path)
+
+
+def test_encoder_must_match_model_columns(path):
+    encoder_path = os.path.join(path, ENCODER_FILE)
+    with open(encoder_path) as f:
+        spec = json.load(f)
+    spec['columns'] = spec['columns'][::-1]
+    with open(encoder_path, 'w') as f:
+        json.dump(spec, f)
+
+    with pytest.raises(ValueError, match='Encoder columns'):
+        load_artifact(path)
+
+
+def test_symlink_resolves_to_model_directory(path, tmp_path):
+    os.symlink(path, str(tmp_path / 'best'))
+    assert load_artifact(str(tmp_path / 'best')).name == 'model_1000'
+
+
+def test_numpy_backend_needs_exported_trees(path):
+    with pytest.raises(ValueError, match='no exported trees'):
+        load_artifact(path, backend='numpy')
+
+
+def test_missing_manifest_fails(path):
+    os.unlink(os.path.join(path, MANIFEST_FILE))
+    with pytest.raises(OSError):
+        load_artifact(path)
+
@@ -0,0 +1,67 @@
+import os
+import json
+import logging
+
+from flask.logging import default_handler
+
+from asynclog import AsyncLog
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_json_lines_with_extra_fields(tmp_path):
+    path = str(tmp_path / 'app.log')
+    log = AsyncLog(path, 100)
+    log.start()
+    make_logger('asynclog-json', log.handler).info('predict %s', 'ok', extra={'ms': 1.5})
+    log.stop()
+
+    [entry] = read_lines(path)
+    assert entry['msg'] == 'predict ok'
+    assert entry['level'] == 'INFO'
+    assert entry['ms'] == 1.5
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    log = AsyncLog(str(tmp_path / 'app.log'), 2)
+    logger = make_logger('asynclog-full', log.handler)
+    # writer vlakno nebezi, fronta sa nevyprazdnuje
+    for i in range(5):
+        logger.info('record %d', i)
+
+    assert log.handler.dropped == 3
+
+
+def test_file_is_reopened_after_logrotate_create(tmp_path):
+    path = str(tmp_path / 'app.log')
+    log = AsyncLog(path, 100)
+    log.start()
+    logger = make_logger('asynclog-rotate', log.handler)
+
+    logger.info('before')
+    log.stop()
+    # logrotate create: subor sa premenuje a zalozi sa prazdny novy
+    os.rename(path, path + '.1')
+    open(path, 'w').close()
+    log.start()
+    logger.info('after')
+    log.stop()
+
+    assert [e['msg'] for e in read_lines(path + '.1')] == ['before']
+    assert [e['msg'] for e in read_lines(path)] == ['after']
+
+
+def test_app_logger_writes_only_through_queue(zakolko):
+    assert default_handler not in zakolko.app.logger.handlers
+    assert zakolko.log.handler in zakolko.app.logger.handlers
@@ -0,0 +1,83 @@
+import json
+import threading
+
+import numpy as np
+
+from batcher import MicroBatcher
+
+
+class SumModel:
+    "Predicts row sums and records size of every call"
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X):
+        self.calls.append(len(X))
+        return X.sum(axis=1)
+
+
+def submit_concurrently(batcher, model, n):
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def run(i):
+        start.wait()
+        results[i] = batcher.submit(model, np.full((1, 2), i, dtype=np.float32))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_rows_are_predicted_together():
+    model = SumModel()
+    batcher = MicroBatcher(8, 200)
+
+    results = submit_concurrently(batcher, model, 8)
+
+    assert [r.tolist() for r in results] == [[2.0 * i] for i in range(8)]
+    assert max(model.calls) > 1
+    assert batcher.stats.snapshot()['rows'] == 8
+
+
+def test_batch_is_limited_by_max_size():
+    model = SumModel()
+    batcher = MicroBatcher(3, 200)
+
+    submit_concurrently(batcher, model, 7)
+
+    assert max(model.calls) <= 3
+    assert sum(model.calls) == 7
+
+
+def test_model_error_reaches_every_request_of_batch():
+    class Broken:
+        def predict(self, X):
+            raise ValueError('broken')
+
+    batcher = MicroBatcher(4, 50)
+    errors = []
+
+    def run():
+        try:
+            batcher.submit(Broken(), np.zeros((1, 2), dtype=np.float32))
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == ['broken'] * 3
+
+
+def test_batcher_is_off_with_single_thread_worker(zakolko, client):
+    # testy bezia bez GUNICORN_THREADS, teda s jednym vlaknom na workera
+    assert zakolko.WORKER_THREADS == 1
+    assert zakolko.batcher is None
+    assert json.loads(client.get('/batch-stats').data)['enabled'] is False
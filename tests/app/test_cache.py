@@ -0,0 +1,52 @@
+import json
+import time
+
+from cache import PredictionCache, make_key
+
+
+def test_key_does_not_depend_on_order():
+    assert make_key({'a': 1, 'b': 'x'}) == make_key({'b': 'x', 'a': 1})
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(2)
+    cache.put('a', 1, cache.generation)
+    cache.put('b', 2, cache.generation)
+    cache.get('a')
+    cache.put('c', 3, cache.generation)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.snapshot()['evictions'] == 1
+
+
+def test_ttl_expires_values():
+    cache = PredictionCache(10, ttl=0.01)
+    cache.put('a', 1, cache.generation)
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    assert cache.snapshot()['expirations'] == 1
+
+
+def test_value_from_previous_generation_is_not_stored():
+    cache = PredictionCache(10)
+    generation = cache.generation
+    # model sa vymenil, kym sa predikcia pocitala
+    cache.clear()
+    cache.put('a', 1, generation)
+
+    assert cache.get('a') is None
+
+
+def test_model_swap_clears_cache(zakolko, client):
+    body = json.dumps({'uzit_plocha': 60})
+    client.post('/predict', data=body)
+    client.post('/predict', data=body)
+    assert zakolko.cache.snapshot()['hits'] == 1
+
+    zakolko.load_model()
+    assert zakolko.cache.snapshot()['size'] == 0
+    # po vymene modelu sa predikcia pocita znova
+    client.post('/predict', data=body)
+    assert zakolko.cache.snapshot()['hits'] == 1
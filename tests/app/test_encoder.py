@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from conftest import NUM_FEATURES, GPS_FEATURES, LIMITS
+from encoder import FeatureEncoder, FeatureError
+
+COLUMNS = NUM_FEATURES + GPS_FEATURES + ['mesto_Bratislava I', 'mesto_Bratislava II']
+CATEGORIES = {'mesto': {'Bratislava I': 7, 'Bratislava II': 8}}
+
+
+@pytest.fixture
+def encoder():
+    return FeatureEncoder(COLUMNS, NUM_FEATURES, GPS_FEATURES, CATEGORIES, LIMITS)
+
+
+def test_value_outside_reject_limit_names_feature(encoder):
+    with pytest.raises(FeatureError) as e:
+        encoder.normalize({'uzit_plocha': 100000})
+    assert e.value.feature == 'uzit_plocha'
+
+
+def test_group_limit_is_used_for_its_group(encoder):
+    assert encoder.normalize({'uzit_plocha': 250, 'mesto': 'Bratislava II'})['uzit_plocha'] == 250
+    with pytest.raises(FeatureError):
+        encoder.normalize({'uzit_plocha': 250, 'mesto': 'Bratislava I'})
+
+
+def test_value_outside_missing_limit_is_dropped(encoder):
+    assert encoder.normalize({'rok_vystavby': 1800, 'pocet_izieb': 2}) == {'pocet_izieb': 2}
+
+
+def test_batch_reports_rows_outside_limits(encoder):
+    matrix, errors = encoder.encode_batch([{'uzit_plocha': 50}, {'uzit_plocha': 100000}, {'rok_vystavby': 1800}])
+    assert list(errors) == [1]
+    assert 'uzit_plocha' in errors[1]
+    assert np.isnan(matrix[2, COLUMNS.index('rok_vystavby')])
+
+
+def test_spec_round_trip(encoder, tmp_path):
+    path = str(tmp_path / 'encoder.json')
+    encoder.save(path)
+    loaded = FeatureEncoder.load(path)
+
+    assert loaded.to_spec() == encoder.to_spec()
+    features = {'uzit_plocha': 60, 'mesto': 'Bratislava I', 'latitude': 48.1}
+    np.testing.assert_array_equal(loaded.encode(features), encoder.encode(features))
+
+
+def test_encode_puts_values_in_model_columns(encoder):
+    row = encoder.encode({'uzit_plocha': '60', 'pocet_izieb': 0, 'mesto': 'Bratislava II', 'podlazie': ''})[0]
+
+    assert row.dtype == np.float32
+    assert row[COLUMNS.index('uzit_plocha')] == 60
+    # 0 a prazdny retazec su chybajuce hodnoty
+    assert np.isnan(row[COLUMNS.index('pocet_izieb')])
+    assert np.isnan(row[COLUMNS.index('podlazie')])
+    assert row[COLUMNS.index('mesto_Bratislava II')] == 1
+    assert row[COLUMNS.index('mesto_Bratislava I')] == 0
+
+
+def test_batch_matches_single_rows(encoder):
+    rows = [{'uzit_plocha': 60, 'mesto': 'Bratislava I'}, {'latitude': 48.2, 'rok_vystavby': 1990}, {}]
+    matrix, errors = encoder.encode_batch(rows)
+
+    assert errors == {}
+    np.testing.assert_array_equal(matrix, np.vstack([encoder.encode(r) for r in rows]))
+
+
+@pytest.mark.parametrize('features, feature', [
+    ({'mesto': 'Kosice'}, 'mesto'),
+    ({'bazen': 1}, 'bazen'),
+    ({'uzit_plocha': 'velky'}, 'uzit_plocha'),
+])
+def test_invalid_features_name_the_feature(encoder, features, feature):
+    with pytest.raises(FeatureError) as e:
+        encoder.normalize(features)
+    assert e.value.feature == feature
+
+
+def test_features_must_be_object(encoder):
+    with pytest.raises(ValueError):
+        encoder.normalize(None)
+
+
+def test_from_feature_names_prefers_longest_prefix():
+    names = ['uzit_plocha', 'garaz_Ano', 'garazove_statie_Ano', 'mesto_Bratislava I']
+    encoder = FeatureEncoder.from_feature_names(names, num_features=['uzit_plocha'], gps_features=[],
+                                                cat_columns=['garaz', 'garazove_statie', 'mesto'])
+
+    assert encoder.categories == {'garaz': {'Ano': 1}, 'garazove_statie': {'Ano': 2}, 'mesto': {'Bratislava I': 3}}
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+from limiter import PredictLimiter, Overloaded
+
+
+@pytest.fixture
+def busy():
+    "Limiter with one worker blocked until release is set"
+    limiter = PredictLimiter(1, 0, 5)
+    release, started = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+        return 'done'
+
+    thread = threading.Thread(target=limiter.run, args=(block,))
+    thread.start()
+    started.wait()
+    yield limiter
+    release.set()
+    thread.join()
+
+
+def test_runs_function_and_counts():
+    limiter = PredictLimiter(2, 2, 5)
+    assert limiter.run(lambda x: x * 2, 21) == 42
+    assert limiter.snapshot()['completed'] == 1
+
+
+def test_full_limiter_rejects_immediately(busy):
+    with pytest.raises(Overloaded):
+        busy.run(lambda: 1)
+    assert busy.snapshot()['rejected'] == 1
+    assert busy.snapshot()['in_flight'] == 1
+
+
+def test_wait_over_timeout_is_rejected():
+    limiter = PredictLimiter(1, 1, 0.05)
+    release, started = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    def occupy():
+        # aj tento request caka dlhsie ako timeout
+        with pytest.raises(Overloaded):
+            limiter.run(block)
+
+    thread = threading.Thread(target=occupy)
+    thread.start()
+    started.wait()
+
+    with pytest.raises(Overloaded):
+        limiter.run(lambda: 1)
+    release.set()
+    thread.join()
+    assert limiter.snapshot()['timeouts'] == 2
+
+
+def test_overloaded_predict_gets_503_with_retry_after(zakolko, client, busy, monkeypatch):
+    monkeypatch.setattr(zakolko, 'limiter', busy)
+    monkeypatch.setattr(zakolko, 'cache', None)
+
+    response = client.post('/predict', data=json.dumps({'uzit_plocha': 60}))
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(zakolko.RETRY_AFTER)
+    assert client.post('/predict-batch', data=json.dumps([{'uzit_plocha': 60}])).status_code == 503
@@ -0,0 +1,75 @@
+import os
+import re
+
+import metrics
+from metrics import Metrics, write_json
+
+# pid, ktory urcite nepatri zivemu procesu
+DEAD_PID = 2 ** 22 + 1
+
+
+def requests_total(text):
+    return float(re.search(r'^requests_total\{endpoint="predict"\} (\S+)$', text, re.M).group(1))
+
+
+def worker(directory, pid, count):
+    "Flush state of worker pid with count requests"
+    m = Metrics(str(directory))
+    m.inc('requests_total', count, endpoint='predict')
+    m.observe('latency_seconds', 0.003)
+    write_json(m.path(pid), m.state())
+    return m
+
+
+def test_render_sums_workers(tmp_path):
+    worker(tmp_path, DEAD_PID, 3)
+    scraper = Metrics(str(tmp_path))
+    scraper.inc('requests_total', 2, endpoint='predict')
+
+    text = scraper.render()
+
+    assert requests_total(text) == 5
+    assert 'latency_seconds_count 1' in text
+
+
+def test_archived_worker_keeps_counters_and_pid_can_be_reused(tmp_path):
+    master = Metrics(str(tmp_path))
+    worker(tmp_path, DEAD_PID, 3)
+    master.archive(DEAD_PID)
+
+    assert not os.path.exists(master.path(DEAD_PID))
+    assert requests_total(Metrics(str(tmp_path)).render()) == 3
+
+    # novy worker s rovnakym pid zacina od nuly, total nesmie klesnut
+    worker(tmp_path, DEAD_PID, 1)
+    assert requests_total(Metrics(str(tmp_path)).render()) == 4
+    master.archive(DEAD_PID)
+    assert requests_total(Metrics(str(tmp_path)).render()) == 4
+    assert 'latency_seconds_count 2' in Metrics(str(tmp_path)).render()
+
+
+def test_worker_file_already_archived_is_not_counted_twice(tmp_path):
+    m = worker(tmp_path, DEAD_PID, 3)
+    write_json(os.path.join(str(tmp_path), metrics.ARCHIVED), {
+        'tokens': [m.token],
+        'counters': [[n, l, v] for n, l, v in m.state()['counters']],
+        'histograms': [],
+    })
+
+    assert requests_total(Metrics(str(tmp_path)).render()) == 3
+
+
+def test_archive_keeps_bounded_tokens(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'ARCHIVED_TOKENS', 2)
+    master = Metrics(str(tmp_path))
+    for _ in range(3):
+        worker(tmp_path, DEAD_PID, 1)
+        master.archive(DEAD_PID)
+
+    assert len(master.archived()['tokens']) == 2
+    assert requests_total(master.render()) == 3
+
+
+def test_archive_of_worker_without_file_does_nothing(tmp_path):
+    Metrics(str(tmp_path)).archive(DEAD_PID)
+    assert os.listdir(str(tmp_path)) == []
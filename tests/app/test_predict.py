@@ -0,0 +1,36 @@
+import json
+
+
+def post(client, path, body):
+    response = client.post(path, data=json.dumps(body))
+    return response.status_code, json.loads(response.data)
+
+
+def test_predict(client):
+    status, body = post(client, '/predict', {'uzit_plocha': 60, 'pocet_izieb': 2, 'mesto': 'Bratislava II'})
+    assert status == 200
+    assert isinstance(body['prediction'], int)
+
+
+def test_predict_rejects_outlier_with_feature(client):
+    status, body = post(client, '/predict', {'uzit_plocha': 100000})
+    assert status == 400
+    assert body['feature'] == 'uzit_plocha'
+
+
+def test_predict_rejects_unknown_category_with_feature(client):
+    status, body = post(client, '/predict', {'mesto': 'Kosice'})
+    assert status == 400
+    assert body['feature'] == 'mesto'
+
+
+def test_predict_rejects_null_and_invalid_json(client):
+    assert post(client, '/predict', None)[0] == 400
+    response = client.post('/predict', data='{"uzit_plocha": ')
+    assert response.status_code == 400
+
+
+def test_comparables_without_index_is_not_found(client):
+    status, body = post(client, '/comparables', {'uzit_plocha': 60})
+    assert status == 404
+    assert 'model_1000' in body['error']
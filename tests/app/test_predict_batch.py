@@ -0,0 +1,53 @@
+import json
+
+
+
+def post_batch(client, data):
+    response = client.post('/predict-batch', data=data)
+    return response.status_code, json.loads(response.data)
+
+
+ROWS = [
+    {'uzit_plocha': 60, 'mesto': 'Bratislava II'},
+    {'uzit_plocha': 100000},
+    {'mesto': 'Kosice'},
+    {'uzit_plocha': 80, 'pocet_izieb': 3},
+]
+
+
+def test_json_array_keeps_order_and_reports_invalid_rows(client):
+    status, body = post_batch(client, json.dumps(ROWS))
+
+    assert status == 200
+    predictions = body['predictions']
+    assert predictions[1] is None and predictions[2] is None
+    assert all(isinstance(p, int) for p in (predictions[0], predictions[3]))
+    assert [e['index'] for e in body['errors']] == [1, 2]
+
+
+def test_batch_matches_single_predictions(client):
+    _, body = post_batch(client, json.dumps(ROWS))
+
+    for i in (0, 3):
+        single = json.loads(client.post('/predict', data=json.dumps(ROWS[i])).data)['prediction']
+        assert body['predictions'][i] == single
+
+
+def test_ndjson_reports_broken_lines(client):
+    data = '\n'.join([json.dumps(ROWS[0]), '{"uzit_plocha": ', '', json.dumps(ROWS[3])])
+    status, body = post_batch(client, data)
+
+    assert status == 200
+    assert body['predictions'][1] is None
+    assert len(body['predictions']) == 3
+    assert body['errors'][0]['index'] == 1
+    assert 'Invalid JSON' in body['errors'][0]['error']
+
+
+def test_invalid_array_is_rejected(client):
+    assert post_batch(client, '[{"uzit_plocha": 60}')[0] == 400
+
+
+def test_too_large_batch_is_rejected(zakolko, client, monkeypatch):
+    monkeypatch.setattr(zakolko, 'MAX_BATCH_SIZE', 2)
+    assert post_batch(client, json.dumps(ROWS))[0] == 413
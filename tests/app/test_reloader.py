@@ -0,0 +1,72 @@
+import os
+import json
+import logging
+
+import pytest
+
+from conftest import write_model
+from reloader import ModelWatcher, model_signature
+from artifact import BOOSTER_FILE
+
+log = logging.getLogger('test')
+
+
+def point_best(model_dir, name):
+    "Switch best symlink atomically the way pipeline does"
+    tmp = str(model_dir / 'best.tmp')
+    os.symlink(name, tmp)
+    os.replace(tmp, str(model_dir / 'best'))
+
+
+def test_watcher_loads_only_changed_model(model_dir):
+    calls = []
+    watcher = ModelWatcher(str(model_dir / 'best'), lambda: calls.append(1), 60, log)
+    watcher.signature = model_signature(str(model_dir / 'best'))
+
+    watcher.check()
+    assert calls == []
+
+    write_model(str(model_dir), 'model_900', seed=1)
+    point_best(model_dir, 'model_900')
+    watcher.check()
+    watcher.check()
+    assert calls == [1]
+    assert watcher.signature[0].endswith('model_900')
+
+
+def test_broken_model_is_not_retried(model_dir):
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError('broken')
+
+    watcher = ModelWatcher(str(model_dir / 'best'), fail, 60, log)
+    watcher.check()
+    watcher.check()
+
+    assert calls == [1]
+    assert watcher.signature is None
+
+
+def test_serving_keeps_old_model_when_new_one_is_broken(zakolko, model_dir, client):
+    path = write_model(str(model_dir), 'model_900', seed=1)
+    with open(os.path.join(path, BOOSTER_FILE), 'a') as f:
+        f.write(' ')
+    point_best(model_dir, 'model_900')
+
+    with pytest.raises(ValueError):
+        zakolko.load_model()
+
+    assert zakolko.model.name == 'model_1000'
+    assert client.post('/predict', data=json.dumps({'uzit_plocha': 60})).status_code == 200
+
+
+def test_update_model_swaps_to_new_best(zakolko, model_dir, client):
+    write_model(str(model_dir), 'model_900', seed=1)
+    point_best(model_dir, 'model_900')
+
+    response = client.get('/update-model')
+
+    assert json.loads(response.data)['model'] == 'model_900'
+    assert zakolko.model.name == 'model_900'
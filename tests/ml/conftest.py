@@ -0,0 +1,68 @@
+"""
+Spolocne fixtures testov pipeline a scrapera, spustaju sa zvlast od testov servingu: python -m pytest tests/ml
+"""
+import os
+import sys
+import tempfile
+import datetime as dt
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+ML_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'ml'))
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+FIXTURES_DIR = os.path.join(ML_DIR, 'fixtures', 'pages')
+sys.path.insert(0, ML_DIR)
+
+# scraper pri importe otvara log subor
+os.environ.setdefault('SCRAPER_LOGFILE', os.path.join(tempfile.mkdtemp(prefix='scraper-test-'), 'scraper.log'))
+
+def load_app_module(name):
+    "Serving module loaded from app, app and ml are not importable together (same module names)"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(APP_DIR, name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+MESTA = ['Bratislava I - Stare Mesto', 'Bratislava II - Ruzinov', 'Bratislava V - Petrzalka']
+DRUHY = ['1 izbovy byt', '2 izbovy byt', '3 izbovy byt']
+
+
+def make_listings(n, start=dt.datetime(2022, 1, 1), seed=0, first_id=1000000):
+    "Rows of inzeraty table as DB returns them, -1 and empty string mean missing"
+    rng = np.random.default_rng(seed)
+    times = [start + dt.timedelta(hours=i) for i in range(n)]
+    data = pd.DataFrame({
+        'id': [str(first_id + i) for i in range(n)],
+        'zdroj': 'www.nehnutelnosti.sk',
+        'ulica': 'Hlavna',
+        'mesto': rng.choice(MESTA, n),
+        'okres': 'Bratislava',
+        'druh': rng.choice(DRUHY, n),
+        'stav': rng.choice(['Novostavba', 'Povodny stav'], n),
+        'kurenie': rng.choice(['Ustredne', 'Lokalne', 'Ine', ''], n),
+        'energ_cert': rng.choice(['A', 'B', 'nema', ''], n),
+        'orientacia': '',
+        'telkoint': '',
+        'uzit_plocha': rng.uniform(20, 150, n).round(),
+        'cena_m2': -1.0,
+        'rok_vystavby': rng.choice([-1, 1960, 1985, 2010], n),
+        'pocet_nadz_podlazi': rng.integers(-1, 15, n),
+        'pocet_izieb': rng.integers(1, 5, n),
+        'podlazie': rng.integers(-1, 12, n),
+        'latitude': rng.uniform(48.05, 48.25, n),
+        'longitude': rng.uniform(16.95, 17.25, n),
+        'verejne_parkovanie': '',
+        'vytah': rng.choice(['Ano', 'Nie', ''], n),
+        'lodzia': '',
+        'balkon': '',
+        'garazove_statie': rng.choice(['Ano', ''], n),
+        'garaz': rng.choice(['Ano', ''], n),
+        'timestamp': times,
+        'updated': times,
+    })
+    data['cena'] = (data['uzit_plocha'] * 3000 + (data['latitude'] - 48) * 200000
+                    + rng.normal(0, 10000, n)).clip(45000, 590000)
+    return data
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import scraper
+from archive import PageArchive, OBJECTS_DIR
+
+
+class FakeResponse:
+    def __init__(self, text='', status_code=200, headers=None):
+        self.content = text.encode('utf-8')
+        self.text = text
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.encoding = 'utf-8'
+        self.apparent_encoding = 'utf-8'
+        self.headers = headers or {}
+
+
+def blobs(root):
+    return [name for _, _, names in os.walk(os.path.join(root, OBJECTS_DIR)) for name in names]
+
+
+def test_same_content_is_stored_once(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    archive.store('https://host/1', FakeResponse('<html>a</html>'), '1')
+    archive.store('https://host/2', FakeResponse('<html>a</html>'), '2')
+    archive.store('https://host/1', FakeResponse('<html>b</html>'), '1')
+
+    assert len(blobs(str(tmp_path))) == 2
+    assert archive.text(archive.latest('https://host/1')) == '<html>b</html>'
+
+
+def test_latest_inzeraty_returns_newest_page_of_each(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    archive.store('https://host/1', FakeResponse('old'), '1')
+    archive.store('https://host/1', FakeResponse('new'), '1')
+    archive.store('https://host/?p=1', FakeResponse('results'))
+
+    pages = archive.latest_inzeraty()
+    assert [archive.text(p) for p in pages] == ['new']
+
+
+def test_conditional_headers_from_last_fetch(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    assert archive.conditional_headers(None) == {}
+
+    archive.store('https://host/1', FakeResponse('a', headers={'ETag': '"x"', 'Last-Modified': 'Mon'}), '1')
+    assert archive.conditional_headers(archive.latest('https://host/1')) == {
+        'If-None-Match': '"x"', 'If-Modified-Since': 'Mon'}
+
+
+@pytest.fixture
+def archived(tmp_path, monkeypatch):
+    "Scraper archive with fetcher answering from list of responses and recording request headers"
+    archive = PageArchive(str(tmp_path))
+    monkeypatch.setattr(scraper, 'archive', archive)
+    requests = []
+
+    class Fetcher:
+        responses = []
+
+        def get(self, url, headers=None):
+            requests.append(headers)
+            return self.responses.pop(0)
+
+    fetcher = Fetcher()
+    monkeypatch.setattr(scraper, 'fetcher', fetcher)
+    return archive, fetcher, requests
+
+
+def test_not_modified_page_is_served_from_archive(archived):
+    archive, fetcher, requests = archived
+    fetcher.responses = [FakeResponse('page', headers={'ETag': '"v1"'}), FakeResponse(status_code=304)]
+
+    assert scraper.make_request('https://host/1', '1').text == 'page'
+    response = scraper.make_request('https://host/1', '1')
+
+    assert response.text == 'page' and response.ok
+    assert requests == [{}, {'If-None-Match': '"v1"'}]
+    assert len(archive.latest_inzeraty()) == 1
+
+
+def test_failed_response_is_not_archived(archived):
+    archive, fetcher, _ = archived
+    fetcher.responses = [FakeResponse('error', status_code=500)]
+
+    assert scraper.make_request('https://host/1', '1').status_code == 500
+    assert archive.latest('https://host/1') is None
+
+
+def test_replay_reparses_archived_inzeraty_without_network(tmp_path, monkeypatch):
+    from conftest import FIXTURES_DIR
+
+    archive = PageArchive(str(tmp_path))
+    for id, name in (('1', 'inzerat.html'), ('2', 'inzerat_bez_mapy.html')):
+        with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+            archive.store('https://host/{}/x'.format(id), FakeResponse(f.read()), id)
+    monkeypatch.setattr(scraper, 'ARCHIVE_DIR', str(tmp_path))
+
+    class UpsertDB:
+        def __init__(self):
+            self.rows = []
+
+        def upsert_inzeraty(self, inzeraty):
+            self.rows.extend(inzeraty)
+            return len(inzeraty)
+
+    parser = scraper.InzeratParser(UpsertDB(), None)
+    replayer = scraper.Replayer(archive, parser, 1)
+    replayer.replay()
+
+    [inzerat] = parser.db.rows
+    assert replayer.no_affected == 1
+    assert inzerat.timestamp == archive.latest('https://host/1/x')['fetched_at']
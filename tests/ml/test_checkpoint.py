@@ -0,0 +1,123 @@
+import json
+import time
+
+import pytest
+
+import scraper
+from checkpoint import Checkpoint
+
+
+class FakeParser:
+    "Knows ids in seen, records every batch of urls sent to processing"
+
+    def __init__(self, seen=()):
+        self.seen = set(seen)
+        self.processed = []
+
+    def get_new_inzeraty_url(self, urls):
+        return [u for u in urls if u not in self.seen]
+
+    def process_inzeraty(self, urls):
+        self.processed.append(list(urls))
+        self.seen.update(urls)
+        return []
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    "Fetched page numbers, every page before 3 has two inzeraty, page 3 is empty and ends the crawl"
+    fetched = []
+
+    class FakePage:
+        def __init__(self, url):
+            self.url = url
+            self.pager = int(url.rsplit('=', 1)[1])
+            self.inzeraty_url = []
+
+        def process_page(self):
+            fetched.append(self.pager)
+            if self.pager < 3:
+                self.inzeraty_url = ['p{}-a'.format(self.pager), 'p{}-b'.format(self.pager)]
+
+    monkeypatch.setattr(scraper, 'Page', FakePage)
+    return fetched
+
+
+def write_state(path, **state):
+    with open(path, 'w') as f:
+        json.dump(state, f)
+
+
+def run(path, parser):
+    s = scraper.Scraper('https://host/?p=', parser, Checkpoint(str(path), max_age=3600), stop_after_seen_pages=None)
+    s.scrape()
+    return s
+
+
+def test_resume_filters_pending_through_seen(tmp_path, pages):
+    path = tmp_path / 'checkpoint.json'
+    write_state(path, crawl=time.time() - 60, pager=1, pending=['p1-a', 'p1-b'])
+    parser = FakeParser(seen=['p1-a'])
+
+    s = run(path, parser)
+
+    assert parser.processed[0] == ['p1-b']
+    assert pages == [2, 3]
+    assert s.stats.resumed_from == 2
+    assert not path.exists()
+
+
+def test_expired_checkpoint_starts_from_first_page(tmp_path, pages):
+    path = tmp_path / 'checkpoint.json'
+    write_state(path, crawl=time.time() - 7200, pager=1, pending=['p1-a'])
+    parser = FakeParser()
+
+    s = run(path, parser)
+
+    assert pages == [1, 2, 3]
+    assert parser.processed == [['p1-a', 'p1-b'], ['p2-a', 'p2-b']]
+    assert s.stats.resumed_from == 0
+
+
+def test_checkpoint_without_crawl_id_is_ignored(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    write_state(path, pager=5, pending=[])
+
+    assert Checkpoint(str(path), max_age=3600).load() is None
+    assert not path.exists()
+
+
+def test_resumed_crawl_keeps_its_id(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    first = Checkpoint(path, max_age=3600)
+    first.save(4, ['x'])
+
+    resumed = Checkpoint(path, max_age=3600)
+    assert resumed.load() == {'crawl': first.crawl, 'pager': 4, 'pending': ['x']}
+    resumed.save(5, [])
+    assert Checkpoint(path, max_age=3600).load()['crawl'] == first.crawl
+
+
+def test_crawl_stops_after_pages_without_new_inzerat(tmp_path, monkeypatch):
+    fetched = []
+
+    class EndlessPage:
+        def __init__(self, url):
+            self.url = url
+            self.inzeraty_url = []
+
+        def process_page(self):
+            pager = int(self.url.rsplit('=', 1)[1])
+            fetched.append(pager)
+            self.inzeraty_url = ['p{}-a'.format(pager)]
+
+    monkeypatch.setattr(scraper, 'Page', EndlessPage)
+    # prve dve strany su nove, dalej iba zname inzeraty
+    parser = FakeParser(seen=['p{}-a'.format(i) for i in range(3, 100)])
+    path = tmp_path / 'checkpoint.json'
+    s = scraper.Scraper('https://host/?p=', parser, Checkpoint(str(path), max_age=3600), stop_after_seen_pages=3)
+    s.scrape()
+
+    assert fetched == [1, 2, 3, 4, 5]
+    assert s.stats.seen == 3
+    assert not path.exists()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import Cleaner, Drop, Missing, Required, Range, Keep, Outliers, DROP, NULL
+
+
+def frame(**columns):
+    return pd.DataFrame(columns)
+
+
+def test_rules_are_applied_in_one_pass():
+    data = frame(cena=[100.0, -1, 300, 400], rok=[1950, 1800, 2000, -1], kurenie=['Ustredne', 'Ine', '', 'Lokalne'])
+    cleaner = Cleaner([
+        Missing(-1),
+        Missing(''),
+        Required('cena'),
+        Range('rok', low=1900, action=NULL),
+        Keep('kurenie', ['Ustredne', 'Lokalne']),
+        Drop(['kurenie']),
+    ])
+    cleaned = cleaner.clean(data)
+
+    assert list(cleaned.index) == [0, 2, 3]
+    assert list(cleaned.columns) == ['cena', 'rok']
+    assert cleaned['rok'].isna().tolist() == [False, False, True]
+    assert cleaner.removed == {'required cena': 1}
+
+
+def test_range_drop_removes_rows_and_missing_values():
+    cleaned = Cleaner([Range('cena', 0, 10, inclusive=False)]).clean(frame(cena=[5.0, 10, np.nan]))
+    assert list(cleaned.index) == [0]
+
+
+def test_outliers_are_learned_from_rows_kept_before():
+    values = [100.0] * 50 + [110.0] * 50 + [100000.0, -5.0]
+    data = frame(plocha=values)
+    cleaner = Cleaner([Range('plocha', low=0), Outliers('plocha', k=3)])
+    cleaned = cleaner.clean(data)
+
+    assert len(cleaned) == 100
+    assert cleaner.removed == {'range plocha reject': 1, 'outliers plocha': 1}
+
+
+def test_outliers_per_group_fall_back_to_whole_column():
+    data = frame(plocha=[50.0] * 40 + [51.0] * 40 + [200.0] * 5 + [201.0] * 5,
+                 druh=['byt'] * 80 + ['dom'] * 10)
+    rule = Outliers('plocha', k=1, by='druh', min_rows=30)
+    cleaned = Cleaner([rule]).clean(data)
+
+    assert set(rule.groups) == {'byt'}
+    # maly dom sa posudzuje plotmi celeho stlpca, v ktorom prevazuju byty
+    assert (cleaned['druh'] == 'byt').all()
+    assert len(cleaned) == 80
+
+
+def test_outlier_limits_reject_serving_inputs():
+    data = frame(plocha=[50.0] * 40 + [60.0] * 40, druh=['byt'] * 80)
+    cleaner = Cleaner([Outliers('plocha', k=3, by='druh'), Range('rok', low=1900, action=NULL)])
+    cleaner.clean(data.assign(rok=1990))
+
+    limits = {limit['feature']: limit for limit in cleaner.limits(['plocha', 'rok'])}
+    assert limits['plocha']['action'] == DROP
+    assert limits['plocha']['by'] == 'druh'
+    assert limits['plocha']['groups'] == {'byt': [20.0, 90.0]}
+    assert limits['rok']['action'] == NULL
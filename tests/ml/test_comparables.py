@@ -0,0 +1,77 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_app_module
+from comparables import ComparablesIndex, FEATURES
+
+serving = load_app_module('comparables')
+
+SCALE = {'km': 1, 'uzit_plocha': 10, 'pocet_izieb': 1, 'rok_vystavby': 15}
+
+
+def make_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'latitude': rng.uniform(48.05, 48.25, n),
+        'longitude': rng.uniform(16.95, 17.25, n),
+        'uzit_plocha': rng.uniform(30, 120, n).round(),
+        'pocet_izieb': rng.integers(1, 5, n).astype(float),
+        'rok_vystavby': rng.choice([np.nan, 1960, 1990, 2020], n),
+        'cena': rng.uniform(80000, 400000, n),
+    })
+    listings = pd.DataFrame({
+        'zdroj': 'www.nehnutelnosti.sk',
+        'id': [str(1000000 + i) for i in range(n)],
+        'timestamp': [dt.datetime(2022, 1, 1) + dt.timedelta(hours=i) for i in range(n)],
+    })
+    return data, listings
+
+
+@pytest.fixture
+def index(tmp_path):
+    data, listings = make_data(500)
+    path = str(tmp_path / 'comparables.npz')
+    ComparablesIndex(SCALE, 1000).fit(data, listings).save(path)
+    return serving.ComparablesIndex.load(path)
+
+
+def brute_force(index, query):
+    dims = [d for d, f in enumerate(FEATURES) if f in query]
+    points = index.points[dims].astype(np.float64)
+    q = np.array([(query[FEATURES[d]] - index.offset[d]) / index.scale[d] for d in dims])[:, None]
+    return np.sqrt(((points - q) ** 2).sum(axis=0))
+
+
+def test_query_returns_k_nearest_closest_first(index):
+    query = {'latitude': 48.15, 'longitude': 17.1, 'uzit_plocha': 60, 'pocet_izieb': 2}
+    result = index.query(query, 5)
+
+    distances = brute_force(index, query)
+    expected = np.argsort(distances)[:5]
+    assert [r['id'] for r in result] == [str(1000000 + i) for i in expected]
+    assert [r['distance'] for r in result] == sorted(r['distance'] for r in result)
+
+
+def test_missing_query_features_are_left_out(index):
+    result = index.query({'uzit_plocha': 60}, 10)
+    # vzdialenost iba podla plochy, 1 = 10 m2
+    for r in result:
+        assert r['distance'] == pytest.approx(abs(r['uzit_plocha'] - 60) / 10, abs=1e-3)
+
+
+def test_query_needs_some_feature(index):
+    with pytest.raises(ValueError):
+        index.query({'mesto': 'Bratislava I'}, 5)
+
+
+def test_index_keeps_newest_listings_with_position():
+    data, listings = make_data(100)
+    data.loc[99, 'latitude'] = np.nan
+    index = ComparablesIndex(SCALE, 10).fit(data, listings)
+
+    assert len(index) == 10
+    ids = sorted(i.decode('utf-8') for i in index.ids)
+    assert ids == [str(1000000 + i) for i in range(89, 99)]
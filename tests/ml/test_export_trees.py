@@ -0,0 +1,72 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from conftest import load_app_module
+import pipeline
+
+forest = load_app_module('forest')
+COLUMNS = ['a', 'b', 'c', 'd', 'e']
+
+
+def make_X(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(COLUMNS))).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    return X
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    X = make_X(2000, 0)
+    y = np.nan_to_num(X[:, 0]) * 3 + np.isnan(X[:, 1]) * 5 + np.nan_to_num(X[:, 2]) ** 2
+    # rozne hlbky stromov, plytke listy musia v traverzovani ostat na mieste
+    booster = xgb.train({'max_depth': 6, 'eta': 0.3, 'min_child_weight': 20, 'objective': 'reg:squarederror'},
+                        xgb.DMatrix(X, y, feature_names=COLUMNS), 40)
+
+    root = tmp_path_factory.mktemp('model')
+    booster_path, trees_path = str(root / 'booster.json'), str(root / 'trees.npz')
+    booster.save_model(booster_path)
+
+    p = pipeline.Pipeline(None, logging.getLogger(__name__))
+    p.booster = booster
+    p.X = p.X_test = pd.DataFrame(make_X(300, 1), columns=COLUMNS)
+    assert p.export_trees(booster_path, trees_path)
+
+    return booster, forest.TreeEnsemble.load(trees_path)
+
+
+def booster_predict(booster, X):
+    return booster.predict(xgb.DMatrix(X, feature_names=COLUMNS))
+
+
+@pytest.mark.parametrize('n', [1, 256, 700])
+def test_numpy_evaluator_matches_xgboost(exported, n):
+    booster, ensemble = exported
+    X = make_X(n, n)
+    # 700 riadkov sa nezmesti do jedneho bloku
+    assert n <= forest.CHUNK_ROWS or n % forest.CHUNK_ROWS
+    np.testing.assert_allclose(ensemble.predict(X), booster_predict(booster, X), rtol=forest.PARITY_RTOL, atol=1e-3)
+
+
+def test_missing_values_follow_default_direction(exported):
+    booster, ensemble = exported
+    X = np.full((3, len(COLUMNS)), np.nan, dtype=np.float32)
+    X[1, 0] = 1.5
+    np.testing.assert_allclose(ensemble.predict(X), booster_predict(booster, X), rtol=forest.PARITY_RTOL, atol=1e-3)
+
+
+def test_values_equal_to_threshold_go_right(exported):
+    booster, ensemble = exported
+    splits = ensemble.left != np.arange(len(ensemble.left))
+    X = np.tile(make_X(1, 2), (splits.sum(), 1))
+    X[np.arange(len(X)), ensemble.feature[splits]] = ensemble.threshold[splits]
+    np.testing.assert_allclose(ensemble.predict(X), booster_predict(booster, X), rtol=forest.PARITY_RTOL, atol=1e-3)
+
+
+def test_empty_batch(exported):
+    _, ensemble = exported
+    assert ensemble.predict(np.empty((0, len(COLUMNS)), dtype=np.float32)).shape == (0,)
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from extract import EXTRACTORS
+
+PAGES = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+
+
+def read_page(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def get_info(extractor, text):
+    "Extracted dict or type of raised error"
+    try:
+        return extractor.get_info(text)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.fixture(scope='module')
+def extractors():
+    return EXTRACTORS['bs4'](), EXTRACTORS['lxml']()
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_info_parity(extractors, name):
+    text = read_page(name)
+    expected, result = (get_info(e, text) for e in extractors)
+
+    if not isinstance(expected, dict):
+        assert result is expected
+        return
+
+    assert isinstance(result, dict), result
+    assert list(result) == list(expected)
+    for field, value in expected.items():
+        assert result[field] == value, field
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_links_parity(extractors, name):
+    text = read_page(name)
+    expected, result = (sorted(e.get_links(text)) for e in extractors)
+    assert result == expected
+
+
+def test_fixtures_cover_listing_and_results():
+    bs4 = EXTRACTORS['bs4']()
+    assert isinstance(get_info(bs4, read_page('inzerat.html')), dict)
+    assert bs4.get_links(read_page('vysledky.html'))
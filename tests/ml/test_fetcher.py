@@ -0,0 +1,104 @@
+import time
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetcher import Fetcher
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/fail/<n>/<key> answers 503 n times then 200, /sleep/<ms>/<body> answers body after delay"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits.append((time.monotonic(), self.path))
+        parts = self.path.strip('/').split('/')
+
+        status, body = 200, b'ok'
+        if parts[0] == 'fail':
+            with server.lock:
+                server.failures[self.path] = server.failures.get(self.path, 0) + 1
+                failed = server.failures[self.path]
+            if failed <= int(parts[1]):
+                status = 503
+        elif parts[0] == 'sleep':
+            time.sleep(int(parts[1]) / 1000)
+            body = parts[2].encode()
+
+        self.send_response(status)
+        if status == 503:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = []
+    server.failures = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base(server, host='127.0.0.1'):
+    return 'http://{}:{}'.format(host, server.server_address[1])
+
+
+def test_retries_retryable_status_until_success(server):
+    fetcher = Fetcher(rate=1000, burst=10, workers=2, max_retries=3)
+    response = fetcher.get(base(server) + '/fail/2/a')
+
+    assert response.status_code == 200
+    assert len(server.hits) == 3
+
+
+def test_gives_up_after_max_retries(server):
+    fetcher = Fetcher(rate=1000, burst=10, workers=2, max_retries=2)
+    response = fetcher.get(base(server) + '/fail/10/b')
+
+    assert response.status_code == 503
+    assert len(server.hits) == 3
+
+
+def test_rate_limit_per_host(server):
+    rate, burst, n = 20, 2, 12
+    fetcher = Fetcher(rate=rate, burst=burst, workers=6)
+
+    start = time.monotonic()
+    fetcher.map(fetcher.get, [base(server) + '/sleep/0/{}'.format(i) for i in range(n)])
+    elapsed = time.monotonic() - start
+
+    # po burste prejde najviac rate requestov za sekundu
+    assert elapsed >= (n - burst) / rate * 0.9
+    hits = sorted(t for t, _ in server.hits)
+    window = [t for t in hits if t - hits[0] <= 0.25]
+    assert len(window) <= burst + 0.25 * rate + 1
+
+    # iny host ma vlastny bucket a neciaka
+    start = time.monotonic()
+    fetcher.map(fetcher.get, [base(server, 'localhost') + '/sleep/0/x'] * burst)
+    assert time.monotonic() - start < 0.5 * (n - burst) / rate
+
+
+def test_map_keeps_order_of_items(server):
+    fetcher = Fetcher(rate=1000, burst=20, workers=4)
+    delays = [80, 10, 50, 0, 30, 5]
+    urls = [base(server) + '/sleep/{}/{}'.format(d, i) for i, d in enumerate(delays)]
+
+    bodies = fetcher.map(lambda url: fetcher.get(url).text, urls)
+
+    assert bodies == [str(i) for i in range(len(delays))]
@@ -0,0 +1,121 @@
+import pytest
+from mysql.connector import Error as DBError, errorcode
+
+import frontier
+import scraper
+from frontier import Frontier, Job, PAGE, INZERAT
+
+
+class ScriptedDB:
+    "Database answering lease UPDATE from a script of rowcounts or errors"
+
+    def __init__(self, leases, rows=()):
+        self.leases = list(leases)
+        self.rows = list(rows)
+        self.rollbacks = 0
+
+    def execute(self, query, args=()):
+        if "`state` = 'leased', `leased_by`" not in query:
+            return 0
+        result = self.leases.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def select_all(self, query, args=()):
+        return self.rows
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(frontier, 'LOCK_RETRY_SLEEP', 0)
+
+
+def lock_error(errno):
+    return DBError(msg='lock', errno=errno)
+
+
+def test_lease_retries_deadlock():
+    row = (1, PAGE, 'https://host/?p=1', 'bratislava', 'c1', 1, 0, 1)
+    db = ScriptedDB([lock_error(errorcode.ER_LOCK_DEADLOCK), 1], rows=[row])
+
+    jobs = Frontier(db, 'w1', 300, 3).lease(4)
+
+    assert [job.url for job in jobs] == ['https://host/?p=1']
+    assert db.rollbacks == 1
+
+
+def test_lease_gives_up_on_lock_wait_with_empty_lease():
+    db = ScriptedDB([lock_error(errorcode.ER_LOCK_WAIT_TIMEOUT)] * (frontier.LOCK_RETRIES + 1))
+
+    assert Frontier(db, 'w1', 300, 3).lease(4) == []
+    assert db.rollbacks == frontier.LOCK_RETRIES + 1
+
+
+def test_lease_raises_other_db_errors():
+    db = ScriptedDB([DBError(msg='gone', errno=errorcode.CR_SERVER_LOST)])
+
+    with pytest.raises(DBError):
+        Frontier(db, 'w1', 300, 3).lease(4)
+
+
+class RecordingFrontier:
+    def __init__(self):
+        self.calls = []
+
+    def add(self, kind, urls, region, crawl, pager=None, seen_pages=0):
+        self.calls.append((kind, list(urls), pager, seen_pages))
+
+    def done(self, jobs):
+        self.calls.append(('done', [job.id for job in jobs]))
+
+
+class KnownParser:
+    def __init__(self, seen):
+        self.seen = set(seen)
+
+    def get_new_inzeraty_url(self, urls):
+        return [u for u in urls if u not in self.seen]
+
+
+@pytest.fixture
+def page(monkeypatch):
+    class FakePage:
+        def __init__(self, url):
+            self.url = url
+            self.inzeraty_url = []
+
+        def process_page(self):
+            self.inzeraty_url = ['https://host/1000001/a', 'https://host/1000002/b']
+
+    monkeypatch.setattr(scraper, 'Page', FakePage)
+
+
+def page_job(pager, seen_pages=0):
+    return Job(7, PAGE, scraper.REGIONS['bratislava'] + str(pager), 'bratislava', 'c1', pager, seen_pages, 1, 't')
+
+
+def test_next_page_is_queued_before_inzeraty(page):
+    queue = RecordingFrontier()
+    worker = scraper.FrontierScraper(queue, KnownParser(['https://host/1000001/a']))
+
+    worker.process_page_job(page_job(2))
+
+    assert queue.calls == [
+        (PAGE, [scraper.REGIONS['bratislava'] + '3'], 3, 0),
+        (INZERAT, ['https://host/1000002/b'], None, 0),
+        ('done', [7]),
+    ]
+
+
+def test_seen_pages_stop_the_region(page):
+    queue = RecordingFrontier()
+    worker = scraper.FrontierScraper(queue, KnownParser(['https://host/1000001/a', 'https://host/1000002/b']),
+                                     stop_after_seen_pages=2)
+
+    worker.process_page_job(page_job(5, seen_pages=1))
+
+    assert [call[0] for call in queue.calls] == [INZERAT, 'done']
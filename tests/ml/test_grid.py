@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from conftest import load_app_module
+from grid import PriceGrid, box_sum
+
+serving_grid = load_app_module('grid')
+
+LAT, LON = (48.0, 48.3), (16.9, 17.3)
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'latitude': rng.uniform(48.05, 48.25, n),
+        'longitude': rng.uniform(16.95, 17.25, n),
+        'uzit_plocha': rng.uniform(30, 120, n),
+    })
+    y = pd.Series(X['uzit_plocha'] * rng.uniform(2000, 5000, n))
+    return X, y
+
+
+def test_box_sum_matches_brute_force():
+    values = np.random.default_rng(0).random((7, 9))
+    expected = np.zeros_like(values)
+    for i in range(7):
+        for j in range(9):
+            expected[i, j] = values[max(0, i - 2):i + 3, max(0, j - 2):j + 3].sum()
+
+    np.testing.assert_allclose(box_sum(values, 2), expected)
+
+
+def test_training_rows_leave_out_own_price():
+    X, y = make_frame(300)
+    grid = PriceGrid(LAT, LON, 1000, 1, 5).fit(X, y)
+
+    with_own = grid.add_features(X)
+    without_own = grid.add_features(X, y)
+
+    assert (without_own['grid_density'] == with_own['grid_density'] - 1).all()
+    # jediny inzerat v okoli uz nema vlastnu cenu, dostane celkovy priemer
+    alone = without_own['grid_density'] == 0
+    np.testing.assert_allclose(without_own.loc[alone, 'grid_cena_m2'], grid.mean, rtol=1e-6)
+
+
+def test_rows_without_gps_or_outside_get_nan():
+    X, y = make_frame(50)
+    grid = PriceGrid(LAT, LON, 1000, 1, 5).fit(X, y)
+    X.loc[0, 'latitude'] = np.nan
+    X.loc[1, 'longitude'] = 20.0
+
+    features = grid.add_features(X)
+    assert features.loc[[0, 1], 'grid_cena_m2'].isna().all()
+    assert features.loc[2:, 'grid_cena_m2'].notna().all()
+
+
+def test_serving_lookup_matches_training_features(tmp_path):
+    X, y = make_frame(500)
+    grid = PriceGrid(LAT, LON, 800, 2, 5).fit(X, y)
+    path = str(tmp_path / 'grid.npz')
+    grid.save(path)
+
+    Q, _ = make_frame(100, seed=1)
+    Q.loc[0, 'latitude'] = np.nan
+    expected = grid.add_features(Q)
+    values = serving_grid.PriceGrid.load(path).lookup(Q['latitude'], Q['longitude'])
+
+    for f in ('grid_cena_m2', 'grid_density'):
+        np.testing.assert_allclose(values[f], expected[f], rtol=1e-6)
@@ -0,0 +1,105 @@
+import os
+import json
+import logging
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from conftest import make_listings
+import pipeline
+
+log = logging.getLogger(__name__)
+BASE = make_listings(3000)
+
+
+def prepared(data):
+    p = pipeline.Pipeline(None, log)
+    p.data = data.copy()
+    p.synced_to = str(data['updated'].max())
+    p.clean_data()
+    p.make_comparables()
+    p.make_dummies_from_cat()
+    return p
+
+
+def new_listings(n, start, first_id, seed, factor=1.0):
+    "Listings added after base model, factor shifts their prices"
+    data = make_listings(n, start, seed=seed, first_id=first_id)
+    data['cena'] = (data['cena'] * factor).clip(45000, 590000)
+    return data
+
+
+@pytest.fixture
+def base_model(tmp_path, monkeypatch):
+    "Best model trained on BASE the way full search saves it, returns its manifest"
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('model')
+    os.symlink('model_999999', 'model/best')
+
+    p = prepared(BASE)
+    p.make_data_matrix()
+    p.best_params = {'n_estimators': 60, 'max_depth': 4, 'learning_rate': 0.1}
+    p.train_model()
+    p.searched_at = dt.datetime.now().isoformat()
+    p.save_model()
+
+    monkeypatch.setattr(pipeline, 'MAE_DEGRADATION', 5)
+    with open('model/best/manifest.json') as f:
+        return json.load(f)
+
+
+def test_update_keeps_comparable_mae_in_name(base_model):
+    # mierny rast cien, pokracovanie boostingu ho dobehne
+    data = pd.concat([BASE, new_listings(600, dt.datetime(2022, 6, 1), 5000000, 1, 1.06)], ignore_index=True)
+    p = prepared(data)
+
+    assert p.update_model() == (None, None)
+
+    best = os.path.basename(os.path.realpath('model/best'))
+    assert best == 'model_u1_{}'.format(int(base_model['mae']))
+    with open('model/best/manifest.json') as f:
+        manifest = json.load(f)
+    assert manifest['mae'] == base_model['mae']
+    assert manifest['holdout_mae'] > 0
+    assert manifest['updates'] == 1
+    assert manifest['base_model'] == 'model_{}'.format(int(base_model['mae']))
+
+
+def test_replayed_listings_are_not_new(base_model):
+    # replay prepise updated, timestamp ostava z casu stiahnutia
+    replayed = BASE.copy()
+    replayed['updated'] = pd.Timestamp('2022-07-01')
+    p = prepared(replayed)
+
+    assert p.update_model() == (None, None)
+    assert os.readlink('model/best') == 'model_{}'.format(int(base_model['mae']))
+
+
+def test_holdout_prices_are_not_in_grid_used_for_its_evaluation(base_model, monkeypatch):
+    fitted = []
+    fit = pipeline.PriceGrid.fit
+
+    def record_fit(grid, X, y):
+        fitted.append(set(X.index))
+        return fit(grid, X, y)
+
+    monkeypatch.setattr(pipeline.PriceGrid, 'fit', record_fit)
+    data = pd.concat([BASE, new_listings(600, dt.datetime(2022, 6, 1), 5000000, 1)], ignore_index=True)
+    p = prepared(data)
+    p.update_model()
+
+    holdout = set(p.X_test.index)
+    assert holdout
+    assert not fitted[0] & holdout
+    # mriezka ulozena s modelom je zo vsetkych dat
+    assert holdout <= fitted[-1]
+
+
+def test_drift_asks_for_full_search(base_model):
+    drifted = new_listings(600, dt.datetime(2022, 6, 1), 5000000, 1, 1.6)
+    p = prepared(pd.concat([BASE, drifted], ignore_index=True))
+
+    reason, replace = p.update_model()
+    assert reason.startswith('drift of')
+    assert replace is True
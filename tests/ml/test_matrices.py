@@ -0,0 +1,34 @@
+import logging
+
+import pipeline
+from conftest import make_listings
+
+log = logging.getLogger(__name__)
+
+
+def test_search_matrices_are_shared_and_final_ones_built_after_search(monkeypatch):
+    p = pipeline.Pipeline(None, log)
+    p.data = make_listings(800)
+    p.clean_data()
+    p.make_dummies_from_cat()
+
+    built = []
+    make_matrix = pipeline.make_matrix
+    monkeypatch.setattr(pipeline, 'make_matrix', lambda X, *args, **kwargs: built.append(len(X)) or
+                        make_matrix(X, *args, **kwargs))
+
+    p.make_data_matrix()
+    assert built == [len(p.X_fit), len(p.X_valid)]
+    assert not hasattr(p, 'dtrain') and not hasattr(p, 'dall')
+
+    # trialy pouzivaju tie iste matice, nic dalsie sa nestavia
+    for eta in (0.1, 0.3):
+        p.score({'max_depth': 2, 'learning_rate': eta}, 5)
+    assert len(built) == 2
+
+    p.best_params = {'n_estimators': 5, 'max_depth': 2, 'learning_rate': 0.3}
+    p.train_model()
+
+    assert built[2:] == [len(p.X_train), len(p.X_test), len(p.X)]
+    assert p.dfit is None and p.dvalid is None and p.X_fit is None
+    assert p.mae > 0
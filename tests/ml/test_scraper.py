@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+import scraper
+
+
+def fixture_text(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class NoSeen:
+    def add(self, id):
+        pass
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    "InzeratParser reading pages from fixtures instead of network, url is https://host/<id>/<fixture>"
+    parser = scraper.InzeratParser(None, NoSeen())
+
+    def parse_inzerat(url):
+        name = url.split('/')[4]
+        if name == 'bez-mesta':
+            # extraktor presiel, ale chyba povinne pole, create_inzerat_record skonci KeyError
+            info = scraper.extractor.get_info(fixture_text('inzerat.html'))
+            del info['Mesto']
+            return info
+        return scraper.extractor.get_info(fixture_text(name))
+
+    monkeypatch.setattr(parser, 'parse_inzerat', parse_inzerat)
+    return parser
+
+
+def url(id, name):
+    return 'https://www.nehnutelnosti.sk/{}/{}'.format(id, name)
+
+
+def test_parse_errors_skip_only_the_broken_inzerat(parser):
+    urls = [
+        url(9000001, 'inzerat.html'),
+        url(9000002, 'bez-mesta'),
+        url(9000003, 'inzerat_poskodeny.html'),
+        url(9000004, 'inzerat_bez_mapy.html'),
+        url(9000005, 'inzerat_cena_dohodou.html'),
+    ]
+    inzeraty = parser.process_inzeraty(urls)
+
+    assert [inzerat.id for inzerat in inzeraty] == ['9000001', '9000003']
+
+
+def test_process_inzerat_logs_url_of_failed_inzerat(parser, caplog):
+    assert parser.process_inzerat(url(9000002, 'bez-mesta')) is None
+    assert '9000002/bez-mesta' in caplog.text
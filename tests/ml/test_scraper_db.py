@@ -0,0 +1,101 @@
+import pytest
+from mysql.connector import Error as DBError
+
+import scraper
+from db.Database import Database
+from inzerat import Inzerat
+
+
+class FakeCursor:
+    "Records statements, executemany affects every row except ids listed as duplicates"
+
+    def __init__(self, duplicates=(), fail_on=None):
+        self.duplicates = set(duplicates)
+        self.fail_on = fail_on
+        self.batches = []
+        self.rowcount = 0
+
+    def executemany(self, query, rows):
+        self.batches.append((query, list(rows)))
+        if self.fail_on is not None and len(self.batches) == self.fail_on:
+            raise DBError(msg='batch failed')
+        self.rowcount = sum(1 for row in rows if row[5] not in self.duplicates)
+
+    def execute(self, query, args=()):
+        self.batches.append((query, [args]))
+        self.rowcount = 0 if args[5] in self.duplicates else 1
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def make_db(monkeypatch):
+    def init(self):
+        self.cnx = FakeConnection()
+        self.cursor = None
+
+    monkeypatch.setattr(Database, '__init__', init)
+
+    def make(**cursor):
+        db = scraper.ScraperDB()
+        db.cursor = FakeCursor(**cursor)
+        return db
+    return make
+
+
+def inzeraty(n):
+    return [Inzerat(id=str(9000000 + i), mesto='Bratislava I', ulica='Hlavna 1/2') for i in range(n)]
+
+
+def test_insert_is_batched_in_one_transaction(make_db, monkeypatch):
+    monkeypatch.setattr(scraper, 'INSERT_BATCH_SIZE', 2)
+    db = make_db(duplicates={'9000001'})
+
+    assert db.insert_inzeraty(inzeraty(5)) == 4
+    assert [len(rows) for _, rows in db.cursor.batches] == [2, 2, 1]
+    assert db.cnx.commits == 1
+
+
+def test_insert_is_parameterized(make_db):
+    db = make_db()
+    db.insert_inzeraty(inzeraty(1))
+
+    query, [row] = db.cursor.batches[0]
+    assert query.startswith('INSERT IGNORE INTO inzeraty')
+    assert '9000000' not in query
+    assert row[5] == '9000000'
+    assert row[0] == 'Hlavna 1_2'
+
+
+def test_failed_batch_rolls_back_whole_page(make_db, monkeypatch):
+    monkeypatch.setattr(scraper, 'INSERT_BATCH_SIZE', 2)
+    db = make_db(fail_on=2)
+
+    with pytest.raises(DBError):
+        db.insert_inzeraty(inzeraty(4))
+    assert db.cnx.rollbacks == 1 and db.cnx.commits == 0
+
+
+def test_scraper_falls_back_to_single_inserts(make_db):
+    db = make_db(fail_on=1, duplicates={'9000002'})
+
+    class Parser:
+        pass
+
+    parser = Parser()
+    parser.db = db
+    s = scraper.Scraper('https://host/?p=', parser, None)
+    s.save_inzeraty(inzeraty(3))
+
+    assert s.stats.inserted == 2
+    assert s.stats.ignored == 1
@@ -0,0 +1,158 @@
+import logging
+
+import numpy as np
+import pytest
+from hyperopt import hp, base, Trials
+
+import pipeline
+
+
+@pytest.fixture
+def search():
+    p = pipeline.Pipeline(None, logging.getLogger('test'))
+    p.space = {'max_depth': hp.quniform('max_depth', 2, 8, 1), 'eta': hp.uniform('eta', 0.01, 0.3)}
+    domain = base.Domain(lambda params: {'loss': 0, 'status': 'ok'}, p.space)
+    return p, domain
+
+
+def test_suggest_returns_batch_of_params(search):
+    p, domain = search
+    docs, params = p.suggest(domain, Trials(), np.random.default_rng(0), 4)
+
+    assert len(docs) == len(params) == 4
+    assert all(2 <= q['max_depth'] <= 8 for q in params)
+
+
+def test_short_suggestion_raises(search, monkeypatch):
+    p, domain = search
+    monkeypatch.setattr(pipeline.tpe, 'suggest', lambda ids, domain, trials, seed: [])
+
+    with pytest.raises(RuntimeError, match='0 of 3'):
+        p.suggest(domain, Trials(), np.random.default_rng(0), 3)
+
+
+class InlinePool:
+    "Runs pool.map in this process, search worker state is initialized here"
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+def test_pool_results_get_latency_measured_in_parent(search, monkeypatch):
+    p, _ = search
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 4)).astype(np.float32)
+    y = (X @ np.array([1, 2, 3, 4], dtype=np.float32)).astype(np.float32)
+    monkeypatch.setattr(pipeline, 'search_matrices', None)
+    pipeline.init_search_worker(X[:200], y[:200], X[200:], y[200:], ['a', 'b', 'c', 'd'])
+    p.latency_rows = X[200:210]
+
+    measured = []
+    measure_model = pipeline.measure_model
+    monkeypatch.setattr(pipeline, 'measure_model', lambda booster, rows: measured.append(len(rows)) or
+                        measure_model(booster, rows))
+
+    params = [{'max_depth': 2, 'eta': 0.3}, {'max_depth': 4, 'eta': 0.3}]
+    results = p.evaluate(InlinePool(), params, 10)
+
+    # workeri nemeraju, rodic zmeria kazdy model na latency_rows
+    assert measured == [10, 10]
+    for result in results:
+        assert 'model' not in result
+        assert result['latency_ms'] > 0 and result['size_bytes'] > 0
+        assert result['loss'] == pipeline.objective(result['mae'], result['latency_ms'])
+
+
+def fake_result(loss, rounds, stopped=False):
+    return {'loss': loss, 'status': 'ok', 'mae': loss, 'latency_ms': 0.1, 'size_bytes': 1000, 'n_estimators': rounds,
+            'rounds': rounds, 'stopped': stopped}
+
+
+def test_search_resumes_from_saved_trials(search, tmp_path, monkeypatch):
+    p, _ = search
+    monkeypatch.setattr(pipeline, 'BRACKET_SIZE', 3)
+    monkeypatch.setattr(pipeline, 'TRIALS_FILE', str(tmp_path / 'trials.pkl'))
+    monkeypatch.setattr(pipeline, 'SEARCH_WORKERS', 1)
+    monkeypatch.setattr(p, 'score', lambda params, rounds: fake_result(params['eta'], rounds))
+
+    monkeypatch.setattr(pipeline, 'EVALS', 3)
+    p.optimize(pipeline.load_trials(pipeline.TRIALS_FILE), p.space)
+    assert len(pipeline.load_trials(pipeline.TRIALS_FILE).trials) == 3
+
+    monkeypatch.setattr(pipeline, 'EVALS', 7)
+    trials = pipeline.load_trials(pipeline.TRIALS_FILE)
+    p.optimize(trials, p.space)
+
+    assert len(trials.trials) == 7
+    losses = [t['result']['loss'] for t in trials.trials]
+    assert trials.best_trial['result']['loss'] == min(losses)
+
+
+def test_successive_halving_keeps_best_third(search, monkeypatch):
+    p, _ = search
+    monkeypatch.setattr(pipeline, 'MIN_ROUNDS', 10)
+    monkeypatch.setattr(pipeline, 'MAX_ROUNDS', 90)
+    evaluated = []
+
+    def score(params, rounds):
+        evaluated.append((params['eta'], rounds))
+        # kandidat 0.3 konverguje skoro, dalsie kola ho neposunu
+        return fake_result(params['eta'] - rounds / 1000, rounds, stopped=params['eta'] == 0.3)
+
+    monkeypatch.setattr(p, 'score', score)
+    params = [{'eta': eta} for eta in (0.9, 0.1, 0.5, 0.3, 0.7, 0.2, 0.8, 0.4, 0.6)]
+    results = p.halving(None, params)
+
+    rounds = {}
+    for eta, r in evaluated:
+        rounds.setdefault(r, []).append(eta)
+    assert rounds[10] == [0.9, 0.1, 0.5, 0.3, 0.7, 0.2, 0.8, 0.4, 0.6]
+    # z 9 postupia 3 najlepsi, zastaveny 0.3 sa uz netrenuje znova, potom 1 s plnym rozpoctom
+    assert rounds[30] == [0.1, 0.2]
+    assert rounds[90] == [0.1]
+    assert len(results) == 9 and all(r is not None for r in results)
+    assert results[3]['rounds'] == 10
+    assert results[1]['rounds'] == 90
+
+
+def test_single_candidate_gets_full_budget(search, monkeypatch):
+    p, _ = search
+    monkeypatch.setattr(p, 'score', lambda params, rounds: fake_result(0.5, rounds))
+
+    [result] = p.halving(None, [{'eta': 0.5}])
+    assert result['rounds'] == pipeline.MAX_ROUNDS
+
+
+def test_score_params_reports_early_stopping():
+    rng = np.random.default_rng(0)
+    X = rng.random((400, 3)).astype(np.float32)
+    y = (X[:, 0] > 0.5).astype(np.float32) * 1000
+    dfit = pipeline.make_matrix(X[:300], y[:300], ['a', 'b', 'c'])
+    dvalid = pipeline.make_matrix(X[300:], y[300:], ['a', 'b', 'c'], ref=dfit)
+
+    result = pipeline.score_params({'max_depth': 2, 'eta': 0.5}, 500, (dfit, dvalid, X[300:310]))
+
+    assert result['stopped']
+    assert result['n_estimators'] < 500
+    assert result['latency_ms'] > 0
+    assert result['loss'] == pipeline.objective(result['mae'], result['latency_ms'])
+
+
+def test_pareto_front_keeps_only_undominated_fastest_first():
+    results = [
+        {'mae': 10, 'latency_ms': 1.0},
+        {'mae': 8, 'latency_ms': 2.0},
+        {'mae': 9, 'latency_ms': 3.0},
+        {'mae': 12, 'latency_ms': 0.5},
+        {'mae': 7, 'latency_ms': 5.0},
+    ]
+    front = pipeline.pareto_front(results)
+    assert [(r['latency_ms'], r['mae']) for r in front] == [(0.5, 12), (1.0, 10), (2.0, 8), (5.0, 7)]
+
+
+def test_candidate_over_latency_budget_loses(monkeypatch):
+    monkeypatch.setattr(pipeline, 'LATENCY_COST', 100)
+    monkeypatch.setattr(pipeline, 'LATENCY_BUDGET_MS', 1.0)
+
+    assert pipeline.objective(1000, 0.5) == 1050
+    assert pipeline.objective(900, 1.5) > pipeline.objective(1000, 0.9)
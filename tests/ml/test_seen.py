@@ -0,0 +1,65 @@
+import pytest
+
+from seen import BloomFilter, SeenInzeraty
+
+
+class IdsDB:
+    "Stored ids of one zdroj, counts confirming IN queries"
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self.queries = []
+
+    def get_inzerat_ids(self, zdroj):
+        return list(self.ids)
+
+    def get_existing_ids(self, zdroj, ids):
+        self.queries.append(list(ids))
+        return [id for id in ids if id in self.ids]
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_error():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(str(i))
+
+    assert all(str(i) in bloom for i in range(10000))
+    false_positives = sum(str(i) in bloom for i in range(10000, 30000))
+    assert false_positives / 20000 < 0.02
+
+
+@pytest.mark.parametrize('error_rate', [None, 0.01])
+def test_filter_new_keeps_order_and_drops_stored(error_rate):
+    db = IdsDB(['1', '3'])
+    seen = SeenInzeraty(db, 'www.nehnutelnosti.sk', error_rate)
+    assert seen.load() == 2
+
+    assert seen.filter_new(['4', '1', '2', '3']) == ['4', '2']
+
+
+def test_added_ids_are_seen_before_they_are_stored():
+    seen = SeenInzeraty(IdsDB([]), 'www.nehnutelnosti.sk', 0.01)
+    seen.load()
+    seen.add('5')
+
+    assert seen.filter_new(['5', '6']) == ['6']
+
+
+def test_bloom_positives_are_confirmed_with_one_query_per_page(monkeypatch):
+    db = IdsDB(['1'])
+    seen = SeenInzeraty(db, 'www.nehnutelnosti.sk', 0.01)
+    seen.load()
+    # filter odpovie kladne pre kazde id, DB rozhodne
+    monkeypatch.setattr(BloomFilter, '__contains__', lambda self, key: True)
+
+    assert seen.filter_new(['1', '2', '3']) == ['2', '3']
+    assert db.queries == [['1', '2', '3']]
+
+
+def test_exact_set_does_not_query_db():
+    db = IdsDB(['1'])
+    seen = SeenInzeraty(db, 'www.nehnutelnosti.sk')
+    seen.load()
+
+    seen.filter_new(['1', '2'])
+    assert db.queries == []
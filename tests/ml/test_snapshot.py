@@ -0,0 +1,85 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_listings
+from snapshot import Snapshot, COLUMNS, narrow
+
+
+class TableDB:
+    "inzeraty table kept as DataFrame, streamed like pd.read_sql with chunksize"
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_inzeraty_since(self, columns, column, since, chunksize):
+        rows = self.rows
+        if since:
+            rows = rows[rows[column] >= pd.Timestamp(since)]
+        rows = rows.sort_values(column)[columns]
+        for i in range(0, len(rows), chunksize):
+            yield rows.iloc[i:i + chunksize]
+
+
+def test_sync_appends_only_changed_rows(tmp_path):
+    rows = make_listings(50)
+    db = TableDB(rows)
+    snapshot = Snapshot(str(tmp_path), overlap=3600)
+
+    assert snapshot.sync(db, 20) == 50
+    assert snapshot.meta['parts'] == 3
+    # okno overlap sa nacita znova, ale riadky v nom uz v snapshote su
+    assert Snapshot(str(tmp_path), overlap=3600).sync(db, 20) == 0
+
+    later = make_listings(5, start=dt.datetime(2023, 1, 1), first_id=2000000)
+    db.rows = pd.concat([rows, later], ignore_index=True)
+    assert Snapshot(str(tmp_path), overlap=3600).sync(db, 20) == 5
+    assert len(Snapshot(str(tmp_path), overlap=3600).load()) == 55
+
+
+def test_newest_copy_of_updated_row_wins(tmp_path):
+    rows = make_listings(10)
+    db = TableDB(rows)
+    Snapshot(str(tmp_path), overlap=0).sync(db, 100)
+
+    # replay zmeni cenu a updated jedneho inzeratu
+    changed = rows.copy()
+    changed.loc[3, 'cena'] = 123456
+    changed.loc[3, 'updated'] = dt.datetime(2023, 1, 1)
+    db.rows = changed
+    snapshot = Snapshot(str(tmp_path), overlap=0)
+    snapshot.sync(db, 100)
+
+    data = snapshot.load()
+    assert len(data) == 10
+    assert data.loc[data['id'] == rows.loc[3, 'id'], 'cena'].tolist() == [123456]
+    assert sum(len(chunk) for chunk in snapshot.chunks()) == 10
+
+
+def test_load_matches_chunks(tmp_path):
+    snapshot = Snapshot(str(tmp_path), overlap=0)
+    snapshot.sync(TableDB(make_listings(45)), 10)
+
+    loaded = snapshot.load()
+    chunked = pd.concat(list(snapshot.chunks()), ignore_index=True)
+
+    assert list(loaded.columns) == COLUMNS
+    pd.testing.assert_frame_equal(loaded, chunked)
+    assert isinstance(loaded['mesto'].dtype, pd.CategoricalDtype)
+    assert loaded['kurenie'].isna().sum() == (make_listings(45)['kurenie'] == '').sum()
+
+
+def test_narrow_integers_out_of_range_become_missing():
+    values = np.array([3, 200, -129, np.nan, 127])
+    assert narrow(values, np.int8).tolist() == [3, -1, -1, -1, 127]
+    assert narrow(np.array([1.5, np.nan]), np.float32).tolist() == [1.5, -1]
+
+
+def test_podlazie_does_not_wrap(tmp_path):
+    rows = make_listings(3)
+    rows['podlazie'] = [2, 200, -1]
+    snapshot = Snapshot(str(tmp_path), overlap=0)
+    snapshot.sync(TableDB(rows), 10)
+
+    assert sorted(snapshot.load()['podlazie'].tolist()) == [-1, -1, 2]